@@ -1,28 +1,52 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, Field, model_validator
+from typing import Callable, List, Dict, Any, Optional, Tuple
+from rapidfuzz import fuzz, process, utils
 import os
 import tempfile
-import uuid
+import hashlib
 import logging
+import queue
+import atexit
+import time
+import dataclasses
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener
+from functools import lru_cache
+from itertools import chain, islice
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import aiofiles
+import orjson
 
 # Import our enhanced prescription analyzer
 try:
-    from prescription_analyzer import EnhancedPrescriptionAnalyzer
+    from prescription_analyzer import EnhancedPrescriptionAnalyzer, new_prescription_id
 except ImportError as e:
     print(f"Failed to import EnhancedPrescriptionAnalyzer: {e}")
     print("Please ensure prescription_analyzer.py is in the same directory")
     raise
 
+from storage import SQLiteStorage
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
+
+# Hand records to a background thread so formatting and writing to a slow
+# stdout/pipe never block the event loop
+log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+root_logger = logging.getLogger()
+log_listener = QueueListener(log_queue, *root_logger.handlers, respect_handler_level=True)
+root_logger.handlers = [QueueHandler(log_queue)]
+log_listener.start()
+atexit.register(log_listener.stop)
+
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
@@ -30,7 +54,8 @@ app = FastAPI(
     description="Advanced prescription analysis using OCR and NLP",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Enable CORS for frontend integration
@@ -45,6 +70,15 @@ app.add_middleware(
 # Global analyzer instance
 analyzer: Optional[EnhancedPrescriptionAnalyzer] = None
 
+# Executor for the CPU-bound OCR/NLP pipeline so it doesn't block the event loop.
+# OpenCV, Tesseract (subprocess) and EasyOCR (torch) release the GIL, and threads
+# share the already-initialized analyzer instead of reloading OCR models per process.
+analysis_executor: Optional[ThreadPoolExecutor] = None
+
+# Keys always present in nested analysis response objects
+PATIENT_KEYS = ('name', 'age', 'gender')
+DOCTOR_KEYS = ('name', 'specialization', 'registration_number')
+
 # Pydantic models for request/response
 class OrderRequest(BaseModel):
     prescription_id: str
@@ -61,13 +95,30 @@ class OrderResponse(BaseModel):
     total_amount: float = 0.0
     error: str = ""
 
+class MedicineResponse(BaseModel):
+    name: str = Field(default="")
+    dosage: str = Field(default="")
+    quantity: str = Field(default="")
+    frequency: str = Field(default="")
+    duration: str = Field(default="")
+    instructions: str = Field(default="")
+    available: bool = Field(default=True)
+
+    @model_validator(mode="before")
+    @classmethod
+    def drop_null_fields(cls, data: Any) -> Any:
+        """Let None values fall back to field defaults"""
+        if isinstance(data, dict):
+            return {key: value for key, value in data.items() if value is not None}
+        return data
+
 # Fixed AnalysisResponse with proper null handling
 class AnalysisResponse(BaseModel):
     success: bool = Field(default=False)
     prescription_id: str = Field(default="")
     patient: Dict[str, str] = Field(default_factory=dict)
     doctor: Dict[str, str] = Field(default_factory=dict) 
-    medicines: List[Dict[str, Any]] = Field(default_factory=list)
+    medicines: List[MedicineResponse] = Field(default_factory=list)
     diagnosis: List[str] = Field(default_factory=list)
     confidence_score: float = Field(default=0.0)
     patient_name: str = Field(default="")
@@ -82,6 +133,35 @@ class AnalysisResponse(BaseModel):
         # Allow extra fields and handle validation more gracefully
         extra = "ignore"
 
+    @model_validator(mode="before")
+    @classmethod
+    def coerce_null_fields(cls, data: Any) -> Any:
+        """
+        Make analyzer output safe for validation
+        Converts None values to field defaults and fills nested patient/doctor keys
+        """
+        if not isinstance(data, dict):
+            return data
+        
+        data = {key: value for key, value in data.items() if value is not None}
+        
+        # Handle patient_age specially (convert to int)
+        try:
+            data['patient_age'] = int(data.get('patient_age', 0))
+        except (ValueError, TypeError):
+            data['patient_age'] = 0
+        
+        for field, keys in (('patient', PATIENT_KEYS), ('doctor', DOCTOR_KEYS)):
+            nested = data.get(field, {})
+            if isinstance(nested, dict):
+                data[field] = {**nested, **{key: nested.get(key) or "" for key in keys}}
+        
+        medicines = data.get('medicines')
+        if isinstance(medicines, list):
+            data['medicines'] = [med for med in medicines if isinstance(med, dict)]
+        
+        return data
+
 class HealthResponse(BaseModel):
     status: str
     analyzer_ready: bool
@@ -89,93 +169,233 @@ class HealthResponse(BaseModel):
     uptime: str = "N/A"
     cohere_available: bool = False
 
-# In-memory storage for demo purposes (use database in production)
-orders_storage: Dict[str, Dict] = {}
-prescriptions_storage: Dict[str, Any] = {}
+@lru_cache(maxsize=1)
+def _iso_timestamp(second: int) -> str:
+    return datetime.fromtimestamp(second).isoformat()
+
+def current_timestamp() -> str:
+    """ISO timestamp for informational responses, formatted at most once per second"""
+    return _iso_timestamp(int(time.time()))
+
+# Upload limits
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB
+
+# Decode uploads from memory; set IN_MEMORY_UPLOADS=false to go through a temporary file instead
+IN_MEMORY_UPLOADS = os.getenv('IN_MEMORY_UPLOADS', 'true').lower() == 'true'
+
+# Uploads are short-lived and read back immediately by OCR, so keep them on tmpfs when available
+UPLOAD_TMP_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+async def read_upload_chunks(file: UploadFile):
+    """Yield uploaded file contents in 1MB chunks, enforcing the upload size limit"""
+    received = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        received += len(chunk)
+        
+        # Check file size limit (10MB)
+        if received > MAX_UPLOAD_SIZE:
+            raise HTTPException(
+                status_code=413, 
+                detail="File too large. Maximum size is 10MB"
+            )
+        
+        yield chunk
+
+# Accepted upload content types and the temporary file extension for each
+EXTENSION_BY_CONTENT_TYPE = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/png': '.png',
+    'image/tiff': '.tiff',
+    'image/bmp': '.bmp',
+    'image/x-ms-bmp': '.bmp',
+    'image/webp': '.webp',
+}
 
-def ensure_safe_response_data(data: dict) -> dict:
+# Order pricing (demo)
+BASE_PRICE_PER_MEDICINE = 75.0  # ₹75 per medicine
+DELIVERY_CHARGE = 50.0  # ₹50 delivery charge
+
+def calculate_order_total(medicines: List[Dict[str, Any]]) -> float:
+    """Total order amount including delivery, with bulk discounts per medicine"""
+    total_amount = DELIVERY_CHARGE
+    
+    for medicine in medicines:
+        quantity = float(medicine.get('quantity', 1))
+        
+        # Apply discount for bulk orders: 10% for 5+, 5% for 3+
+        discount = 0.9 if quantity >= 5 else 0.95 if quantity >= 3 else 1.0
+        total_amount += BASE_PRICE_PER_MEDICINE * quantity * discount
+    
+    # Round to 2 decimal places
+    return round(total_amount, 2)
+
+# Orders and analyzed prescriptions (orjson-serialized), shared by all worker processes
+STORAGE_PATH = os.getenv('STORAGE_PATH', 'prescription_analyzer.db')
+orders_storage = SQLiteStorage(STORAGE_PATH, 'orders')
+prescriptions_storage = SQLiteStorage(STORAGE_PATH, 'prescriptions')
+
+# Serialized GET payloads and their ETags (stored prescriptions and orders never change)
+payload_cache: Dict[str, Tuple[str, bytes]] = {}
+
+def cached_json_response(request: Request, cache_key: str, build_body: Callable[[], bytes]) -> Response:
     """
-    Ensure all response data is safe for Pydantic validation
-    Converts None values to appropriate defaults
+    Serve a JSON body with a strong ETag, serializing it only on first use
+    Returns 304 Not Modified when the client already holds the current version
+    """
+    cached = payload_cache.get(cache_key)
+    if cached is None:
+        body = build_body()
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        cached = payload_cache[cache_key] = (etag, body)
+    
+    etag, body = cached
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match == "*" or etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+# LRU cache of successful analyses keyed by uploaded image content hash,
+# so re-uploads of the same prescription skip OCR entirely
+ANALYSIS_CACHE_SIZE = int(os.getenv('ANALYSIS_CACHE_SIZE', 512))
+analysis_cache: "OrderedDict[str, Any]" = OrderedDict()
+# Content hash of each cached result by prescription ID, so deleting a prescription drops its analysis
+analysis_cache_hashes: Dict[str, str] = {}
+
+def get_cached_analysis(content_hash: str):
+    """Return cached analysis result for an image hash, if any"""
+    result = analysis_cache.get(content_hash)
+    if result is not None:
+        analysis_cache.move_to_end(content_hash)
+    return result
+
+def cache_analysis(content_hash: str, result) -> None:
+    """Store analysis result, evicting the least recently used entry when full"""
+    previous = analysis_cache.get(content_hash)
+    if previous is not None:
+        analysis_cache_hashes.pop(previous.prescription_id, None)
+    analysis_cache[content_hash] = result
+    analysis_cache.move_to_end(content_hash)
+    analysis_cache_hashes[result.prescription_id] = content_hash
+    while len(analysis_cache) > ANALYSIS_CACHE_SIZE:
+        _, evicted = analysis_cache.popitem(last=False)
+        analysis_cache_hashes.pop(evicted.prescription_id, None)
+
+def discard_cached_analysis(prescription_id: str) -> None:
+    """Drop the cached analysis of a prescription, so a re-upload is analyzed afresh"""
+    content_hash = analysis_cache_hashes.pop(prescription_id, None)
+    if content_hash is not None:
+        analysis_cache.pop(content_hash, None)
+
+class MedicineSearchIndex:
+    """
+    Trigram inverted index over medicine name, generic name and category
+    Narrows substring search to rows containing every trigram of the query
     """
-    safe_data = {}
-    
-    # Handle all possible fields with safe defaults
-    safe_data['success'] = data.get('success', False)
-    safe_data['prescription_id'] = data.get('prescription_id') or ""
-    safe_data['patient'] = data.get('patient') or {}
-    safe_data['doctor'] = data.get('doctor') or {}
-    safe_data['medicines'] = data.get('medicines') or []
-    safe_data['diagnosis'] = data.get('diagnosis') or []
-    safe_data['confidence_score'] = data.get('confidence_score', 0.0)
-    safe_data['message'] = data.get('message') or ""
-    safe_data['error'] = data.get('error') or ""
-    
-    # Legacy fields with null safety
-    safe_data['patient_name'] = data.get('patient_name') or ""
-    safe_data['patient_gender'] = data.get('patient_gender') or ""
-    safe_data['doctor_name'] = data.get('doctor_name') or ""
-    safe_data['doctor_license'] = data.get('doctor_license') or ""
-    
-    # Handle patient_age specially (convert to int)
-    patient_age = data.get('patient_age', 0)
-    try:
-        safe_data['patient_age'] = int(patient_age) if patient_age is not None else 0
-    except (ValueError, TypeError):
-        safe_data['patient_age'] = 0
-    
-    # Ensure nested dictionaries are also safe
-    if isinstance(safe_data['patient'], dict):
-        patient_dict = safe_data['patient']
-        patient_dict['name'] = patient_dict.get('name') or ""
-        patient_dict['age'] = patient_dict.get('age') or ""
-        patient_dict['gender'] = patient_dict.get('gender') or ""
-    
-    if isinstance(safe_data['doctor'], dict):
-        doctor_dict = safe_data['doctor']
-        doctor_dict['name'] = doctor_dict.get('name') or ""
-        doctor_dict['specialization'] = doctor_dict.get('specialization') or ""
-        doctor_dict['registration_number'] = doctor_dict.get('registration_number') or ""
-    
-    # Ensure medicines list is safe
-    if isinstance(safe_data['medicines'], list):
-        safe_medicines = []
-        for med in safe_data['medicines']:
-            if isinstance(med, dict):
-                safe_med = {
-                    'name': med.get('name') or "",
-                    'dosage': med.get('dosage') or "",
-                    'quantity': med.get('quantity') or "",
-                    'frequency': med.get('frequency') or "",
-                    'duration': med.get('duration') or "",
-                    'instructions': med.get('instructions') or "",
-                    'available': med.get('available', True)
-                }
-                safe_medicines.append(safe_med)
-        safe_data['medicines'] = safe_medicines
     
-    return safe_data
+    def __init__(self, medicine_database: Dict[str, Dict]):
+        self.size = len(medicine_database)
+        self.names = tuple(medicine_database)
+        # Names pre-normalized for fuzzy matching so each lookup only processes the query
+        self.fuzzy_names = tuple(utils.default_process(name) for name in self.names)
+        self.rows = []
+        self.trigrams: Dict[str, set] = {}
+        
+        for row_id, (name, info) in enumerate(medicine_database.items()):
+            fields = (
+                name.lower(),
+                info.get('generic', '').lower(),
+                info.get('category', '').lower()
+            )
+            self.rows.append((fields, name, info))
+            for field in fields:
+                for i in range(len(field) - 2):
+                    self.trigrams.setdefault(field[i:i + 3], set()).add(row_id)
+    
+    def _candidates(self, query_lower: str):
+        """Row ids that may contain the query, in database order"""
+        if len(query_lower) < 3:
+            return range(len(self.rows))
+        
+        postings = []
+        for i in range(len(query_lower) - 2):
+            posting = self.trigrams.get(query_lower[i:i + 3])
+            if not posting:
+                return []
+            postings.append(posting)
+        
+        postings.sort(key=len)
+        return sorted(set.intersection(*postings))
+    
+    def search(self, query_lower: str, limit: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Return up to `limit` matching medicines and the total match count
+        Exact name matches come first, then name matches, then generic/category matches
+        """
+        # Rank buckets preserve database order, so no sort is needed
+        exact, in_name, in_other = [], [], []
+        
+        for row_id in self._candidates(query_lower):
+            (name_lower, generic_lower, category_lower), _, _ = self.rows[row_id]
+            if query_lower in name_lower:
+                (exact if query_lower == name_lower else in_name).append(row_id)
+            elif query_lower in generic_lower or query_lower in category_lower:
+                in_other.append(row_id)
+        
+        matches = []
+        for row_id in islice(chain(exact, in_name, in_other), max(limit, 0)):
+            _, name, info = self.rows[row_id]
+            matches.append({
+                "name": name.title(),
+                "generic": info.get('generic', ''),
+                "category": info.get('category', ''),
+                "available": info.get('available', True)
+            })
+        
+        return matches, len(exact) + len(in_name) + len(in_other)
+
+medicine_index: Optional[MedicineSearchIndex] = None
+
+def get_medicine_index() -> MedicineSearchIndex:
+    """Return the medicine search index, rebuilding it if the database changed"""
+    global medicine_index
+    if medicine_index is None or medicine_index.size != len(analyzer.medicine_database):
+        medicine_index = MedicineSearchIndex(analyzer.medicine_database)
+    return medicine_index
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize the analyzer on startup"""
-    global analyzer
+    global analyzer, analysis_executor
     try:
         logger.info("Initializing Enhanced Prescription Analyzer...")
         
         # Get configuration from environment variables
         cohere_api_key = os.getenv('COHERE_API_KEY')
         tesseract_path = os.getenv('TESSERACT_PATH')
+        # Concurrent analyses arriving within this window share one Cohere call; opt-in, since it
+        # delays every analysis by the window and puts several patients' text in one prompt
+        cohere_batch_window = float(os.getenv('COHERE_BATCH_WINDOW_MS', 0)) / 1000
         
         # Initialize analyzer with forced API usage
         analyzer = EnhancedPrescriptionAnalyzer(
             cohere_api_key=cohere_api_key,
             tesseract_path=tesseract_path,
-            force_api=True  # Force API usage
+            force_api=True,  # Force API usage
+            cohere_batch_window=cohere_batch_window
         )
         
         logger.info("Enhanced Prescription Analyzer initialized successfully")
         
+        get_medicine_index()
+        
+        analysis_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('ANALYZER_THREADS', os.cpu_count() or 1)),
+            thread_name_prefix="analyzer"
+        )
+        
         # Log configuration status
         if hasattr(analyzer, 'co') and analyzer.co:
             logger.info("Cohere API key found - Advanced NLP analysis available")
@@ -195,6 +415,8 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down AI Prescription Analyzer API")
+    if analysis_executor:
+        analysis_executor.shutdown(wait=False, cancel_futures=True)
 
 @app.get("/")
 async def root():
@@ -203,7 +425,7 @@ async def root():
         "message": "AI Prescription Analyzer API",
         "status": "running",
         "version": "1.0.0",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": current_timestamp(),
         "endpoints": {
             "health": "/health",
             "docs": "/docs",
@@ -221,18 +443,19 @@ async def health_check():
     return HealthResponse(
         status="healthy" if analyzer is not None else "unhealthy",
         analyzer_ready=analyzer is not None,
-        timestamp=datetime.now().isoformat(),
+        timestamp=current_timestamp(),
         uptime="N/A",  # Would implement proper uptime tracking in production
         cohere_available=cohere_available
     )
 
 @app.post("/api/analyze-prescription", response_model=AnalysisResponse)
-async def analyze_prescription(file: UploadFile = File(...)):
+async def analyze_prescription(file: UploadFile = File(...), force: bool = False):
     """
     Analyze uploaded prescription image
     
     Args:
         file: Uploaded image file (JPEG, PNG, TIFF)
+        force: Re-run analysis even if this exact image was analyzed before
         
     Returns:
         AnalysisResponse with extracted prescription data
@@ -246,104 +469,92 @@ async def analyze_prescription(file: UploadFile = File(...)):
             detail="Analyzer not initialized. Please check server configuration."
         )
     
-    # Validate file type
-    if not file.content_type or not file.content_type.startswith('image/'):
+    # Validate file type (the extension table doubles as the allow-list)
+    file_extension = EXTENSION_BY_CONTENT_TYPE.get((file.content_type or '').lower())
+    if file_extension is None:
         raise HTTPException(
             status_code=400, 
             detail="Invalid file type. Please upload an image file (JPEG, PNG, TIFF, BMP, WEBP)"
         )
     
-    # Check file size (max 10MB)
     temp_file_path = None
     
     try:
-        # Create temporary file with proper extension
-        file_extension = '.jpg'  # Default
-        if file.content_type:
-            if 'png' in file.content_type:
-                file_extension = '.png'
-            elif 'tiff' in file.content_type:
-                file_extension = '.tiff'
-            elif 'bmp' in file.content_type:
-                file_extension = '.bmp'
-            elif 'webp' in file.content_type:
-                file_extension = '.webp'
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-            temp_file_path = temp_file.name
-            
-            # Read and save file
-            content = await file.read()
-            file_size = len(content)
-            
-            # Check file size limit (10MB)
-            if file_size > 10 * 1024 * 1024:
-                raise HTTPException(
-                    status_code=413, 
-                    detail="File too large. Maximum size is 10MB"
-                )
-            
-            if file_size < 1024:  # Less than 1KB
-                raise HTTPException(
-                    status_code=400,
-                    detail="File too small. Please ensure the image is readable"
-                )
+        file_size = 0
+        hasher = hashlib.blake2b(digest_size=32)
+        
+        if IN_MEMORY_UPLOADS:
+            # Keep the image in memory and let the analyzer decode it directly
+            image_data = bytearray()
+            async for chunk in read_upload_chunks(file):
+                hasher.update(chunk)
+                image_data += chunk
+            file_size = len(image_data)
+            analyze, image_source = analyzer.analyze_prescription_bytes, image_data
+        else:
+            # Create temporary file with proper extension
+            fd, temp_file_path = tempfile.mkstemp(suffix=file_extension, dir=UPLOAD_TMP_DIR)
+            os.close(fd)
             
-            temp_file.write(content)
-            temp_file.flush()
+            async with aiofiles.open(temp_file_path, 'wb') as temp_file:
+                async for chunk in read_upload_chunks(file):
+                    hasher.update(chunk)
+                    file_size += len(chunk)
+                    await temp_file.write(chunk)
+            analyze, image_source = analyzer.analyze_prescription, temp_file_path
+        
+        if file_size < 1024:  # Less than 1KB
+            raise HTTPException(
+                status_code=400,
+                detail="File too small. Please ensure the image is readable"
+            )
         
         logger.info(f"Processing prescription file: {file.filename}, Size: {file_size} bytes")
         
-        # Analyze prescription using the enhanced analyzer
-        result = analyzer.analyze_prescription(temp_file_path)
+        content_hash = hasher.hexdigest()
+        result = None if force else get_cached_analysis(content_hash)
+        
+        if result is not None:
+            # Every upload is its own prescription, so the reused analysis gets a new ID
+            logger.info(f"Reusing cached analysis {result.prescription_id} for identical image")
+            result = dataclasses.replace(result, prescription_id=new_prescription_id())
+        else:
+            # Analyze prescription using the enhanced analyzer off the event loop
+            result = await asyncio.get_running_loop().run_in_executor(
+                analysis_executor, analyze, image_source
+            )
+            if result.success:
+                cache_analysis(content_hash, result)
         
         if not result.success:
             logger.warning(f"Analysis failed for prescription {result.prescription_id}: {result.error}")
             # Return safe failure response
-            safe_error_data = ensure_safe_response_data({
+            return AnalysisResponse.model_validate({
                 'success': False,
                 'error': result.error,
                 'message': "Failed to analyze prescription. Please ensure the image is clear and contains readable text."
             })
-            return AnalysisResponse(**safe_error_data)
         
-        # Store result for potential order creation
-        prescriptions_storage[result.prescription_id] = result
+        # Convert to JSON format expected by frontend; to_json already produces the
+        # AnalysisResponse shape, so the serialized payload is returned as-is
+        payload = orjson.dumps(analyzer.to_json(result))
         
-        # Convert to JSON format expected by frontend
-        json_result = analyzer.to_json(result)
+        # Store result for potential order creation
+        prescriptions_storage.put(result.prescription_id, payload)
         
         logger.info(f"Analysis completed successfully for prescription {result.prescription_id} with confidence {result.confidence_score:.2f}")
         
-        # Ensure response data is safe for Pydantic validation
-        safe_data = ensure_safe_response_data(json_result)
-        
-        # Return structured response
-        try:
-            return AnalysisResponse(**safe_data)
-        except Exception as validation_error:
-            logger.error(f"Validation error creating response: {validation_error}")
-            logger.error(f"Response data: {safe_data}")
-            
-            # Fall back to minimal safe response
-            fallback_data = ensure_safe_response_data({
-                'success': result.success,
-                'prescription_id': result.prescription_id,
-                'message': 'Analysis completed but response formatting had issues',
-                'confidence_score': result.confidence_score
-            })
-            return AnalysisResponse(**fallback_data)
+        return Response(content=payload, media_type="application/json")
         
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error analyzing prescription: {str(e)}")
-        safe_error_data = ensure_safe_response_data({
+        return AnalysisResponse.model_validate({
             'success': False,
             'error': str(e),
             'message': "An unexpected error occurred during analysis. Please try again."
         })
-        return AnalysisResponse(**safe_error_data)
     finally:
         # Clean up temporary file
         if temp_file_path and os.path.exists(temp_file_path):
@@ -394,31 +605,17 @@ async def create_order(order_request: OrderRequest):
             if not isinstance(quantity, (int, float)) or quantity <= 0:
                 raise HTTPException(status_code=400, detail="All medicines must have valid quantities")
         
-        # Generate order ID
-        order_id = f"ORD-{uuid.uuid4().hex[:8].upper()}"
+        # Generate order ID (32 random bits, retried on the rare collision)
+        order_id = f"ORD-{os.urandom(4).hex().upper()}"
+        while order_id in orders_storage:
+            order_id = f"ORD-{os.urandom(4).hex().upper()}"
         
         # Calculate estimated delivery (2-3 days from now)
         estimated_delivery = (datetime.now() + timedelta(days=2)).strftime("%Y-%m-%d")
         
         # Calculate total amount (mock calculation based on medicines)
-        base_price_per_medicine = 75.0  # ₹75 per medicine (demo)
-        delivery_charge = 50.0  # ₹50 delivery charge
-        total_amount = delivery_charge
-        
-        for medicine in order_request.medicines:
-            quantity = float(medicine.get('quantity', 1))
-            medicine_cost = base_price_per_medicine * quantity
-            
-            # Apply discount for bulk orders
-            if quantity >= 5:
-                medicine_cost *= 0.9  # 10% discount
-            elif quantity >= 3:
-                medicine_cost *= 0.95  # 5% discount
-            
-            total_amount += medicine_cost
-        
-        # Round to 2 decimal places
-        total_amount = round(total_amount, 2)
+        delivery_charge = DELIVERY_CHARGE
+        total_amount = calculate_order_total(order_request.medicines)
         
         # Store order
         order_data = {
@@ -435,11 +632,12 @@ async def create_order(order_request: OrderRequest):
             "delivery_charge": delivery_charge
         }
         
-        orders_storage[order_id] = order_data
+        orders_storage.put(order_id, orjson.dumps(order_data))
         
         logger.info(f"Order created successfully: {order_id} for prescription {order_request.prescription_id}")
         
-        return OrderResponse(
+        # Every field was built above, so skip re-validating them
+        return OrderResponse.model_construct(
             success=True,
             order_id=order_id,
             message=f"Order placed successfully! Your order ID is {order_id}",
@@ -458,15 +656,16 @@ async def create_order(order_request: OrderRequest):
         )
 
 @app.get("/api/order/{order_id}")
-async def get_order(order_id: str):
+async def get_order(order_id: str, request: Request):
     """
     Get order details by ID
     
     Args:
         order_id: The order ID to retrieve
+        request: Incoming request (checked for If-None-Match)
         
     Returns:
-        Order details dictionary
+        Order details dictionary, or 304 if the client's ETag is current
         
     Raises:
         HTTPException: If order not found
@@ -474,13 +673,13 @@ async def get_order(order_id: str):
     if order_id not in orders_storage:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    order_data = orders_storage[order_id]
     logger.info(f"Retrieved order details for {order_id}")
     
-    return {
-        "success": True,
-        "order": order_data
-    }
+    return cached_json_response(
+        request,
+        f"order:{order_id}",
+        lambda: b'{"success":true,"order":' + orders_storage.get(order_id) + b'}'
+    )
 
 @app.get("/api/orders")
 async def list_orders(limit: int = 50, offset: int = 0):
@@ -494,33 +693,31 @@ async def list_orders(limit: int = 50, offset: int = 0):
     Returns:
         Dictionary with orders list and pagination info
     """
-    all_orders = list(orders_storage.values())
-    
-    # Sort by creation date (newest first)
-    all_orders.sort(key=lambda x: x['created_at'], reverse=True)
+    total_count = len(orders_storage)
     
-    # Apply pagination
-    paginated_orders = all_orders[offset:offset + limit]
+    # Newest first, sorted and paginated by SQLite on the created_at index
+    paginated_orders = [orjson.loads(order) for order in orders_storage.list_recent(limit, offset)]
     
     return {
         "success": True,
         "orders": paginated_orders,
-        "total_count": len(all_orders),
+        "total_count": total_count,
         "limit": limit,
         "offset": offset,
-        "has_more": offset + limit < len(all_orders)
+        "has_more": offset + limit < total_count
     }
 
 @app.get("/api/prescription/{prescription_id}")
-async def get_prescription(prescription_id: str):
+async def get_prescription(prescription_id: str, request: Request):
     """
     Get prescription analysis by ID
     
     Args:
         prescription_id: The prescription ID to retrieve
+        request: Incoming request (checked for If-None-Match)
         
     Returns:
-        Prescription analysis data
+        Prescription analysis data, or 304 if the client's ETag is current
         
     Raises:
         HTTPException: If prescription not found
@@ -528,13 +725,14 @@ async def get_prescription(prescription_id: str):
     if prescription_id not in prescriptions_storage:
         raise HTTPException(status_code=404, detail="Prescription not found")
     
-    result = prescriptions_storage[prescription_id]
     logger.info(f"Retrieved prescription details for {prescription_id}")
     
-    return {
-        "success": True,
-        "prescription": analyzer.to_json(result)
-    }
+    # Wrap the already-serialized analysis instead of re-encoding it
+    return cached_json_response(
+        request,
+        f"prescription:{prescription_id}",
+        lambda: b'{"success":true,"prescription":' + prescriptions_storage.get(prescription_id) + b'}'
+    )
 
 @app.delete("/api/prescription/{prescription_id}")
 async def delete_prescription(prescription_id: str):
@@ -550,10 +748,12 @@ async def delete_prescription(prescription_id: str):
     Raises:
         HTTPException: If prescription not found
     """
-    if prescription_id not in prescriptions_storage:
+    # Patient details must not survive a delete in memory either, even if storage has no record
+    discard_cached_analysis(prescription_id)
+    if not prescriptions_storage.delete(prescription_id):
         raise HTTPException(status_code=404, detail="Prescription not found")
     
-    del prescriptions_storage[prescription_id]
+    payload_cache.pop(f"prescription:{prescription_id}", None)
     logger.info(f"Deleted prescription {prescription_id}")
     
     return {
@@ -579,7 +779,7 @@ async def search_medicines(query: str = "", limit: int = 20):
     try:
         if not query.strip():
             # Return first 20 medicines if no query
-            medicines = list(analyzer.medicine_database.keys())[:limit]
+            medicines = list(get_medicine_index().names[:limit])
             return {
                 "success": True,
                 "medicines": medicines,
@@ -587,32 +787,14 @@ async def search_medicines(query: str = "", limit: int = 20):
                 "query": ""
             }
         
-        # Simple search in medicine database
+        # Indexed search in medicine database (sorted by relevance)
         query_lower = query.lower().strip()
-        matches = []
-        
-        for name, info in analyzer.medicine_database.items():
-            # Search in name and generic name
-            if (query_lower in name.lower() or 
-                query_lower in info.get('generic', '').lower() or
-                query_lower in info.get('category', '').lower()):
-                matches.append({
-                    "name": name.title(),
-                    "generic": info.get('generic', ''),
-                    "category": info.get('category', ''),
-                    "available": info.get('available', True)
-                })
-        
-        # Sort by relevance (exact matches first)
-        matches.sort(key=lambda x: (
-            0 if query_lower == x['name'].lower() else
-            1 if query_lower in x['name'].lower() else 2
-        ))
+        matches, total_found = get_medicine_index().search(query_lower, limit)
         
         return {
             "success": True,
-            "medicines": matches[:limit],
-            "total_found": len(matches),
+            "medicines": matches,
+            "total_found": total_found,
             "query": query
         }
         
@@ -652,21 +834,22 @@ async def get_medicine_info(medicine_name: str):
             }
         
         # Fuzzy search
-        from fuzzywuzzy import process
+        index = get_medicine_index()
         best_match = process.extractOne(
-            medicine_lower, 
-            analyzer.medicine_database.keys(),
+            utils.default_process(medicine_lower), 
+            index.fuzzy_names,
+            scorer=fuzz.WRatio,
             score_cutoff=70
         )
         
         if best_match:
-            matched_name = best_match[0]
+            matched_name = index.names[best_match[2]]
             info = analyzer.medicine_database[matched_name]
             return {
                 "success": True,
                 "medicine": {
                     "name": matched_name.title(),
-                    "match_score": best_match[1],
+                    "match_score": round(best_match[1]),
                     **info
                 },
                 "message": f"Found close match: {matched_name.title()}"
@@ -696,7 +879,7 @@ async def get_stats():
             "medicines_in_database": len(analyzer.medicine_database) if analyzer else 0,
             "analyzer_status": "ready" if analyzer else "not_initialized",
             "cohere_available": (hasattr(analyzer, 'co') and analyzer.co is not None) if analyzer else False,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": current_timestamp()
         }
     }
 
@@ -706,13 +889,13 @@ async def general_exception_handler(request, exc):
     """Handle unexpected exceptions"""
     logger.error(f"Unhandled exception in {request.url.path}: {str(exc)}", exc_info=True)
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "success": False,
             "error": "Internal server error",
             "message": "An unexpected error occurred. Please try again later.",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": current_timestamp()
         }
     )
 
@@ -721,13 +904,13 @@ async def value_error_handler(request, exc):
     """Handle value errors"""
     logger.warning(f"Value error in {request.url.path}: {str(exc)}")
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=400,
         content={
             "success": False,
             "error": "Invalid input",
             "message": str(exc),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": current_timestamp()
         }
     )
 
@@ -739,9 +922,19 @@ if __name__ == "__main__":
     PORT = int(os.getenv('PORT', 8000))
     RELOAD = os.getenv('RELOAD', 'true').lower() == 'true'
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'info').lower()
+    # Storage is shared through SQLite, but every worker loads its own OCR models
+    WORKERS = int(os.getenv('WORKERS', 1))
+    # uvloop/httptools are the C-accelerated event loop and HTTP parser (uvloop has no Windows build)
+    LOOP = os.getenv('UVICORN_LOOP', 'asyncio' if os.name == 'nt' else 'uvloop')
+    HTTP = os.getenv('UVICORN_HTTP', 'httptools')
+    
+    if WORKERS > 1 and RELOAD:
+        logger.warning("Reload mode only supports a single worker, disabling reload")
+        RELOAD = False
     
     logger.info(f"Starting AI Prescription Analyzer API on {HOST}:{PORT}")
     logger.info(f"Reload mode: {RELOAD}")
+    logger.info(f"Workers: {WORKERS}, loop: {LOOP}, http: {HTTP}")
     logger.info(f"Log level: {LOG_LEVEL}")
     
     uvicorn.run(
@@ -749,6 +942,9 @@ if __name__ == "__main__":
         host=HOST,
         port=PORT,
         reload=RELOAD,
+        workers=WORKERS,
+        loop=LOOP,
+        http=HTTP,
         log_level=LOG_LEVEL,
-        access_log=True
+        access_log=os.getenv('ACCESS_LOG', 'false').lower() == 'true'
     )
\ No newline at end of file
@@ -1,45 +1,293 @@
 from __future__ import annotations
-import base64
 import cv2
 import numpy as np
-import easyocr
 import re
-import json
-from typing import List, Dict, Tuple, Optional
+from typing import TYPE_CHECKING, Any, List, Dict, Tuple, Optional
 import logging
-from dataclasses import dataclass, asdict
+import sys
+from dataclasses import dataclass
 from datetime import datetime
-import tempfile
 import os
-import pickle
-from PIL import Image
-import pytesseract
-from fuzzywuzzy import fuzz, process
-import cohere
-import uuid
-from pydantic import BaseModel, Field
+import hashlib
+import orjson
+import threading
+import time
+from rapidfuzz import fuzz, process, utils
+import ahocorasick
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Fix PIL.Image.ANTIALIAS deprecation issue
-if not hasattr(Image, "ANTIALIAS"):
-    Image.ANTIALIAS = Image.LANCZOS
+# easyocr (and torch behind it), cohere, pytesseract and PIL are imported where
+# first needed, so importing this module for its dataclasses stays cheap
+if TYPE_CHECKING:
+    import easyocr
+    from PIL import Image
+
+# Tesseract runs are spread over cores by the OCR pool, so keep each one single-threaded.
+# Only Tesseract: torch (behind EasyOCR) and OpenCV keep every core, so the limit is not left
+# in the process environment but handed to Tesseract's OpenMP runtime and subprocesses alone
+TESSERACT_OMP_THREAD_LIMIT = '1'
+
+# tesserocr keeps the Tesseract model loaded in-process; without it we fall back
+# to pytesseract, which starts a tesseract process per call. OpenMP reads its limit when
+# the runtime is loaded, so it is set only while tesserocr loads libtesseract
+_omp_limit_preset = 'OMP_THREAD_LIMIT' in os.environ
+os.environ.setdefault('OMP_THREAD_LIMIT', TESSERACT_OMP_THREAD_LIMIT)
+try:
+    from tesserocr import OEM, PyTessBaseAPI
+except ImportError:
+    PyTessBaseAPI = None
+finally:
+    if not _omp_limit_preset:
+        del os.environ['OMP_THREAD_LIMIT']
+
+def _load_pytesseract():
+    """pytesseract, with the Tesseract thread limit in the environment of the processes it starts"""
+    import pytesseract
+    # run_tesseract passes this module-level mapping as every subprocess's environment
+    pytesseract.pytesseract.environ = {'OMP_THREAD_LIMIT': TESSERACT_OMP_THREAD_LIMIT, **os.environ}
+    return pytesseract
+
+# Tesseract page segmentation modes tried on every preprocessed image; these two
+# cover nearly all prescription layouts
+TESSERACT_PSMS = [
+    6,   # Uniform text block
+    11,  # Sparse text
+]
+
+# Longest image side handed to OCR; phone photos are downscaled to roughly 300 DPI text,
+# since OCR cost grows with pixel count
+MAX_OCR_DIMENSION = 2000
+
+# A Tesseract result this confident is accepted without waiting for the other configs
+FAST_OCR_THRESHOLD = 0.8
+
+# EasyOCR reader shared by every analyzer in the process, loaded on first use
+_EASYOCR_SINGLETON = None
+_EASYOCR_LOCK = threading.Lock()
+
+
+def get_easyocr_reader() -> easyocr.Reader:
+    """Return the process-wide EasyOCR reader, loading its models only once"""
+    global _EASYOCR_SINGLETON
+    with _EASYOCR_LOCK:
+        if _EASYOCR_SINGLETON is None:
+            import easyocr
+            from PIL import Image
+
+            # Fix PIL.Image.ANTIALIAS deprecation issue
+            if not hasattr(Image, "ANTIALIAS"):
+                Image.ANTIALIAS = Image.LANCZOS
+
+            # quantize=True runs the CPU models with dynamically quantized INT8 weights
+            _EASYOCR_SINGLETON = easyocr.Reader(['en'], gpu=False, quantize=True)
+        return _EASYOCR_SINGLETON
+
+# Persisted medicine database (name -> category/generic/availability)
+MEDICINE_DATABASE_PATH = "medicine_database.json"
+# Pickle the database was kept in before; read once to migrate it to JSON
+LEGACY_MEDICINE_DATABASE_PATH = "medicine_database.pkl"
+
+# Bounded number of remembered medicine-name -> database-name resolutions
+NAME_MATCH_CACHE_SIZE = 4096
+
+# Bounded number of remembered OCR results, keyed by a hash of the encoded image
+OCR_CACHE_SIZE = 512
+
+
+class _LRUCache:
+    """Small thread-safe LRU mapping; get() returns default on a miss"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[Any, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+_MISSING = object()
+
+
+class _CohereBatcher:
+    """
+    Coalesces Cohere extraction requests arriving from concurrent analyses
+    The first caller in a window waits `window` seconds, then sends everything queued meanwhile as one batch
+    """
+
+    def __init__(self, analyzer: "EnhancedPrescriptionAnalyzer", window: float):
+        self.analyzer = analyzer
+        self.window = window
+        self._pending: List[Tuple[str, float, Future]] = []
+        self._lock = threading.Lock()
+
+    def submit(self, extracted_text: str, ocr_confidence: float) -> Dict:
+        future: Future = Future()
+        with self._lock:
+            self._pending.append((extracted_text, ocr_confidence, future))
+            is_leader = len(self._pending) == 1
+
+        if is_leader:
+            time.sleep(self.window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+            try:
+                results = self.analyzer.analyze_with_cohere_batch([(text, conf) for text, conf, _ in batch])
+                for (_, _, pending), result in zip(batch, results):
+                    pending.set_result(result)
+            except Exception as e:
+                for _, _, pending in batch:
+                    pending.set_exception(e)
+
+        return future.result()
+
+# Pieces of the Cohere extraction prompt shared by the single and batched requests
+COHERE_INSTRUCTIONS = """CRITICAL INSTRUCTIONS:
+        1. Carefully distinguish between DOCTOR and PATIENT information
+        2. Doctor names often have titles (Dr., Prof.) or qualifications (MBBS, MD, etc.)
+        3. Patient names are usually simpler, without medical titles
+        4. Look for context clues like "Patient:", "Name:", age indicators, gender markers"""
 
-@dataclass
+COHERE_RESULT_FORMAT = """{
+            "patient_name": "",
+            "patient_age": null,
+            "patient_gender": "",
+            "doctor_name": "",
+            "doctor_license": "",
+            "doctor_specialization": "",
+            "prescription_date": "YYYY-MM-DD",
+            "medications": [
+                {
+                    "name": "",
+                    "dosage": "",
+                    "frequency": "",
+                    "duration": ""
+                }
+            ],
+            "diagnosis": "",
+            "additional_notes": ""
+        }"""
+
+COHERE_RULES = """- Use null for patient_age if not found or unclear
+        - Use empty strings for missing text fields
+        - Extract ALL medications found
+        - Be precise with dosages, frequencies, and durations
+        - Include both generic and brand names when available
+        - Distinguish clearly between doctor and patient names"""
+
+# Prescriptions sent to Cohere in one batched chat call at most
+COHERE_MAX_BATCH = 8
+
+# Text-cleanup patterns, compiled once at import
+WHITESPACE_RE = re.compile(r'\s+')
+UNWANTED_CHARS_RE = re.compile(r'[^\w\s\.\,\:\(\)\-\/\+\&\'\"]')
+HAS_LETTER_RE = re.compile(r'[A-Za-z]')
+NAME_LINE_RE = re.compile(r'^[A-Za-z\s\.]+$')
+LINE_KEY_STRIP_RE = re.compile(r'[^a-z0-9]+')
+JSON_FENCE_RE = re.compile(r'^```[^\n]*\n|\n?```$')
+# Lines mentioning these are not taken as patient names / medicine names respectively
+NON_PATIENT_LINE_RE = re.compile(r'dr\.|doctor|clinic|hospital|prescription|medicine', re.IGNORECASE)
+NON_MEDICINE_LINE_RE = re.compile(r'dr\.|patient|age|date', re.IGNORECASE)
+
+# OCR lines whose normalized forms are at least this similar count as duplicates
+LINE_DEDUP_RATIO = 90
+
+# Fix common OCR mistakes for medical prescriptions. The constant replacements
+# run as one alternation in a single pass, so fixes that used to apply in
+# sequence are spelled out: '.rng' becomes ' mg' directly, and Dr/Mr do not
+# claim the 'r' of an 'rng'/'rnl' that is fixed first
+OCR_WORD_FIXES = [
+    (r'\b0\b', 'O'), (r'\b1\b', 'I'), (r'\.(?:mg|rng)', ' mg'), (r'rng', 'mg'),
+    (r'Tab\b', 'Tab'), (r'Cap\b', 'Cap'), (r'\bBd\b', 'bd'), (r'\bOd\b', 'od'),
+    (r'\bSyp\b', 'Syp'), (r'\bInj\b', 'Inj'), (r'rnl', 'ml'), (r'gm\b', 'gm'),
+    (r'D(?!rn[gl])r\s*\.?', 'Dr.'), (r'M(?!rn[gl])rs?\s*\.?', 'Mr.'), (r'Mis+\s*\.?', 'Miss'),
+]
+OCR_WORD_FIXES_RE = re.compile(
+    '|'.join(f'(?P<fix{i}>{pattern})' for i, (pattern, _) in enumerate(OCR_WORD_FIXES)),
+    re.IGNORECASE
+)
+OCR_WORD_FIX_REPLACEMENTS = {f'fix{i}': repl for i, (_, repl) in enumerate(OCR_WORD_FIXES)}
+
+# Common prescription format fixes (these use backreferences, so they stay separate)
+OCR_FORMAT_FIXES = [(re.compile(pattern, re.IGNORECASE), repl) for pattern, repl in [
+    (r'(\d+)\s*x\s*(\d+)', r'\1 x \2'),  # Fix dosage format
+    (r'(\d+)\s*mg', r'\1 mg'),  # Ensure space before mg
+    (r'(\d+)\s*ml', r'\1 ml'),  # Ensure space before ml
+]]
+
+# Common medicine patterns
+MEDICINE_PATTERNS = [
+    r'(\w+(?:\s+\w+)*)\s+(\d+\s*(?:mg|ml|gm|g))\s+(\w+)\s*(?:x\s*(\d+))?',  # Name Dosage Frequency x Duration
+    r'(\w+(?:\s+\w+)*)\s+(\d+)\s*(?:mg|ml|gm|g)\s+(\w+)',  # Name Dosage Frequency
+    r'(\w+(?:\s+\w+)*)\s+(?:Tab|Cap|Syp)\s+(\d+)\s*(?:mg|ml)',  # Name Tab/Cap/Syp Dosage
+    r'(\w+)\s+(\d+)\s*(od|bd|tid|qid|sos)',  # Simple Name Dosage Frequency
+]
+
+# All medicine patterns as one alternation (earlier patterns win at the same position),
+# scanned once over the whole text; whitespace may not cross a line break
+MEDICINE_RE = re.compile(
+    '|'.join(f'({pattern})' for pattern in MEDICINE_PATTERNS).replace(r'\s', r'[^\S\n]'),
+    re.IGNORECASE
+)
+
+# Wrapping group index of each alternative -> number of groups inside it
+MEDICINE_PATTERN_GROUPS = {}
+_group_index = 1
+for _pattern in MEDICINE_PATTERNS:
+    MEDICINE_PATTERN_GROUPS[_group_index] = re.compile(_pattern).groups
+    _group_index += MEDICINE_PATTERN_GROUPS[_group_index] + 1
+
+# Text fields of an extraction result that must never be None
+SANITIZED_STRING_FIELDS = ('patient_name', 'patient_gender', 'doctor_name', 'doctor_license',
+                           'doctor_specialization', 'additional_notes', 'diagnosis')
+
+# Fields kept for each extracted medication
+MEDICATION_FIELDS = ('name', 'dosage', 'frequency', 'duration')
+
+def parse_age(age: Optional[str]) -> Optional[int]:
+    """Age as an int, or None when it is missing or not a plain number"""
+    if not age:
+        return None
+    try:
+        return int(age)
+    except ValueError:
+        return None
+
+# Result objects are created per medicine and per analysis; drop their __dict__ where supported
+DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**DATACLASS_OPTIONS)
 class Patient:
     name: str = ""
     age: str = ""
     gender: str = ""
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class Doctor:
     name: str = ""
     specialization: str = ""
     registration_number: str = ""
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class Medicine:
     name: str = ""
     dosage: str = ""
@@ -49,7 +297,7 @@ class Medicine:
     instructions: str = ""
     available: bool = True
 
-@dataclass
+@dataclass(**DATACLASS_OPTIONS)
 class AnalysisResult:
     prescription_id: str
     patient: Patient
@@ -61,29 +309,53 @@ class AnalysisResult:
     success: bool = True
     error: str = ""
 
-@dataclass
-class MedicationItem(BaseModel):
-    name: str = Field(default="", description="Medication name")
-    dosage: str = Field(default="", description="Medication dosage")
-    frequency: str = Field(default="", description="Frequency of medication")
-    duration: str = Field(default="", description="Duration of medication")
+def new_prescription_id() -> str:
+    """Fresh prescription ID: RX<timestamp><8 hex>, from one localtime call and 4 random bytes"""
+    return f"RX{time.strftime('%Y%m%d%H%M%S')}{os.urandom(4).hex()}"
+
+# Per-process analyzer used by analyze_batch workers; the analyzer itself holds
+# thread pools and locks, so each worker builds its own instead of unpickling one
+_BATCH_WORKER_ANALYZER = None
+
+def _init_batch_worker(init_args: Tuple[Optional[str], Optional[str], bool]) -> None:
+    global _BATCH_WORKER_ANALYZER
+    _BATCH_WORKER_ANALYZER = EnhancedPrescriptionAnalyzer(*init_args)
+
+def _analyze_in_batch_worker(image_path: str) -> AnalysisResult:
+    return _BATCH_WORKER_ANALYZER.analyze_prescription(image_path)
 
 class EnhancedPrescriptionAnalyzer:
-    def __init__(self, cohere_api_key: str = None, tesseract_path: str = None, force_api: bool = True):
+    def __init__(self, cohere_api_key: str = None, tesseract_path: str = None, force_api: bool = True,
+                 cohere_batch_window: float = 0.0):
         """
         Initialize the analyzer with enhanced doctor/patient detection
+        A positive cohere_batch_window (seconds) batches Cohere calls from concurrent analyses
         """
+        # Kept so analyze_batch can rebuild an equivalent analyzer in each worker process
+        self._init_args = (cohere_api_key, tesseract_path, force_api)
+        
         # Initialize Cohere API
         self._init_cohere_api(cohere_api_key, force_api)
+        self._cohere_batcher = _CohereBatcher(self, cohere_batch_window) if cohere_batch_window > 0 else None
         
         # Initialize OCR readers
         self._init_ocr_readers()
+
+        # The preprocessing variants are independent OpenCV calls that release the GIL
+        self._preprocess_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="preprocess")
+        # Tesseract releases the GIL (tesserocr) or runs as a subprocess (pytesseract),
+        # so threads are enough to keep every core busy
+        self._ocr_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="tesseract")
+        self._tesseract_local = threading.local()
         
         # Load medicine database
         self.medicine_database = self._load_medicine_database()
         if not self.medicine_database:
             self.medicine_database = self._create_default_medicine_database()
             self._save_medicine_database()
+        self._name_match_cache = _LRUCache(NAME_MATCH_CACHE_SIZE)
+        self._ocr_cache = _LRUCache(OCR_CACHE_SIZE)
+        self._refresh_medicine_lookups()
 
         # Enhanced medical patterns for better doctor/patient identification
         self.doctor_patterns = {
@@ -120,6 +392,11 @@ class EnhancedPrescriptionAnalyzer:
             ]
         }
 
+        # Compile every pattern once instead of on each extraction call
+        for patterns in (self.doctor_patterns, self.patient_patterns):
+            for key, group in patterns.items():
+                patterns[key] = [re.compile(pattern, re.IGNORECASE) for pattern in group]
+
         # Medical abbreviations mapping
         self.medical_abbreviations = {
             'bd': 'twice daily', 'bid': 'twice daily', 'tid': 'three times daily',
@@ -145,6 +422,7 @@ class EnhancedPrescriptionAnalyzer:
         self.co = None
         if api_key:
             try:
+                import cohere
                 self.co = cohere.Client(api_key)
                 logger.info("Cohere API client initialized successfully 🎉")
             except Exception as e:
@@ -160,7 +438,7 @@ class EnhancedPrescriptionAnalyzer:
     def _init_ocr_readers(self):
         """Initialize OCR readers with error handling"""
         try:
-            self.easyocr_reader = easyocr.Reader(['en'], gpu=False)
+            self.easyocr_reader = get_easyocr_reader()
             logger.info("EasyOCR initialized successfully")
         except Exception as e:
             logger.warning(f"EasyOCR initialization failed: {e}")
@@ -169,16 +447,32 @@ class EnhancedPrescriptionAnalyzer:
     def _load_medicine_database(self):
         """Load medicine database from file or create new one"""
         try:
-            with open("medicine_database.pkl", "rb") as f:
-                return pickle.load(f)
+            with open(MEDICINE_DATABASE_PATH, "rb") as f:
+                return orjson.loads(f.read())
+        except FileNotFoundError:
+            return self._migrate_legacy_medicine_database()
+        except orjson.JSONDecodeError:
+            return None
+
+    def _migrate_legacy_medicine_database(self):
+        """Load a database saved as a pickle by earlier versions and rewrite it as JSON"""
+        import pickle
+        try:
+            with open(LEGACY_MEDICINE_DATABASE_PATH, "rb") as f:
+                medicine_database = pickle.load(f)
         except (FileNotFoundError, pickle.PickleError):
             return None
+        
+        self.medicine_database = medicine_database
+        self._save_medicine_database()
+        logger.info(f"Migrated {len(medicine_database)} medicines from {LEGACY_MEDICINE_DATABASE_PATH} to {MEDICINE_DATABASE_PATH}")
+        return medicine_database
 
     def _save_medicine_database(self):
         """Save medicine database to file"""
         try:
-            with open("medicine_database.pkl", "wb") as f:
-                pickle.dump(self.medicine_database, f)
+            with open(MEDICINE_DATABASE_PATH, "wb") as f:
+                f.write(orjson.dumps(self.medicine_database, option=orjson.OPT_INDENT_2))
             logger.info("Medicine database saved successfully")
         except Exception as e:
             logger.warning(f"Failed to save medicine database: {e}")
@@ -236,57 +530,57 @@ class EnhancedPrescriptionAnalyzer:
 
     def preprocess_image(self, image_path: str) -> List[np.ndarray]:
         """Enhanced image preprocessing for better OCR results"""
+        data = self._read_image_file(image_path)
+        return self._decode_and_preprocess(data) if data is not None else []
+
+    def preprocess_image_bytes(self, data: bytes) -> List[np.ndarray]:
+        """Preprocess an encoded image held in memory (JPEG, PNG, TIFF, ...)"""
+        return self._decode_and_preprocess(np.frombuffer(data, dtype=np.uint8))
+
+    @staticmethod
+    def _read_image_file(image_path: str) -> Optional[np.ndarray]:
+        """Raw bytes of an image file (np.fromfile + imdecode also copes with non-ASCII paths)"""
         try:
-            # Read image
-            image = cv2.imread(image_path)
-            if image is None:
-                pil_image = Image.open(image_path)
-                image = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
+            return np.fromfile(image_path, dtype=np.uint8)
         except Exception as e:
             logger.error(f"Failed to read image: {e}")
+            return None
+
+    def _decode_and_preprocess(self, buffer: np.ndarray) -> List[np.ndarray]:
+        """Decode an encoded image buffer with OpenCV and preprocess it"""
+        try:
+            image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        except Exception as e:
+            logger.error(f"Failed to decode image: {e}")
             return []
+        if image is None:
+            logger.error("Failed to decode image: unsupported or corrupt image data")
+            return []
+
+        return self._preprocess_loaded_image(image)
 
+    def _preprocess_loaded_image(self, image: np.ndarray) -> List[np.ndarray]:
+        """Build the OCR-ready variants of a decoded BGR image"""
         try:
             # Convert to grayscale
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-            # Resize if too small
+            # Resize once: upscale if too small, and keep the longer side within MAX_OCR_DIMENSION
             height, width = gray.shape
+            scale_factor = 1.0
             if height < 800 or width < 600:
                 scale_factor = max(800/height, 600/width)
+            scale_factor = min(scale_factor, MAX_OCR_DIMENSION / max(height, width))
+            if scale_factor != 1.0:
                 new_width = int(width * scale_factor)
                 new_height = int(height * scale_factor)
-                gray = cv2.resize(gray, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
+                interpolation = cv2.INTER_CUBIC if scale_factor > 1 else cv2.INTER_AREA
+                gray = cv2.resize(gray, (new_width, new_height), interpolation=interpolation)
 
-            processed_images = []
-
-            # Method 1: CLAHE + Adaptive Threshold
-            try:
-                clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-                contrast_enhanced = clahe.apply(gray)
-                denoised = cv2.bilateralFilter(contrast_enhanced, 9, 75, 75)
-                adaptive_thresh = cv2.adaptiveThreshold(
-                    denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-                )
-                processed_images.append(adaptive_thresh)
-            except Exception as e:
-                logger.warning(f"Method 1 preprocessing failed: {e}")
-
-            # Method 2: Otsu's Thresholding
-            try:
-                blur = cv2.GaussianBlur(gray, (3,3), 0)
-                _, otsu_thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                processed_images.append(otsu_thresh)
-            except Exception as e:
-                logger.warning(f"Method 2 preprocessing failed: {e}")
-
-            # Method 3: Edge-preserving filter + threshold
-            try:
-                filtered = cv2.edgePreservingFilter(gray, flags=2, sigma_s=50, sigma_r=0.4)
-                _, edge_thresh = cv2.threshold(filtered, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                processed_images.append(edge_thresh)
-            except Exception as e:
-                logger.warning(f"Method 3 preprocessing failed: {e}")
+            # Run the three methods concurrently, keeping their order
+            methods = (self._clahe_adaptive_threshold, self._otsu_threshold, self._edge_preserving_threshold)
+            results = self._preprocess_executor.map(lambda method: method(gray), methods)
+            processed_images = [image for image in results if image is not None]
 
             return processed_images if processed_images else [gray]
 
@@ -294,11 +588,60 @@ class EnhancedPrescriptionAnalyzer:
             logger.error(f"Image preprocessing failed: {e}")
             return []
 
+    @staticmethod
+    def _clahe_adaptive_threshold(gray: np.ndarray) -> Optional[np.ndarray]:
+        """Method 1: CLAHE + Adaptive Threshold"""
+        # The CLAHE buffer is reused for the threshold output once it has been filtered
+        try:
+            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+            contrast_enhanced = clahe.apply(gray)
+            denoised = cv2.bilateralFilter(contrast_enhanced, 9, 75, 75)
+            return cv2.adaptiveThreshold(
+                denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2,
+                dst=contrast_enhanced
+            )
+        except Exception as e:
+            logger.warning(f"Method 1 preprocessing failed: {e}")
+            return None
+
+    @staticmethod
+    def _otsu_threshold(gray: np.ndarray) -> Optional[np.ndarray]:
+        """Method 2: Otsu's Thresholding"""
+        try:
+            blur = cv2.GaussianBlur(gray, (3,3), 0)
+            _, otsu_thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=blur)
+            return otsu_thresh
+        except Exception as e:
+            logger.warning(f"Method 2 preprocessing failed: {e}")
+            return None
+
+    @staticmethod
+    def _edge_preserving_threshold(gray: np.ndarray) -> Optional[np.ndarray]:
+        """Method 3: Edge-preserving filter + threshold"""
+        try:
+            filtered = cv2.edgePreservingFilter(gray, flags=2, sigma_s=50, sigma_r=0.4)
+            _, edge_thresh = cv2.threshold(filtered, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=filtered)
+            return edge_thresh
+        except Exception as e:
+            logger.warning(f"Method 3 preprocessing failed: {e}")
+            return None
+
     def extract_text(self, processed_images: List[np.ndarray]) -> Tuple[str, float]:
         """Extract text using multiple OCR methods with enhanced results"""
         all_results = []
         all_confidences = []
 
+        # Start every (image, config) Tesseract run up front; EasyOCR runs here meanwhile
+        # The OCR threads share the arrays directly; each image is wrapped once as a PIL
+        # view over the same uint8 buffer instead of being converted again per run
+        from PIL import Image
+        tesseract_jobs = []
+        for image in processed_images:
+            pil_image = Image.fromarray(np.ascontiguousarray(image, dtype=np.uint8))
+            tesseract_jobs.append(
+                [self._ocr_executor.submit(self._run_tesseract, pil_image, psm) for psm in TESSERACT_PSMS]
+            )
+
         for i, image in enumerate(processed_images):
             # EasyOCR
             if self.easyocr_reader:
@@ -306,34 +649,33 @@ class EnhancedPrescriptionAnalyzer:
                     easyocr_results = self.easyocr_reader.readtext(image, detail=1)
                     if easyocr_results:
                         text = " ".join([r[1] for r in easyocr_results])
-                        confidence = np.mean([r[2] for r in easyocr_results])
+                        confidence = float(np.fromiter(
+                            (r[2] for r in easyocr_results), dtype=np.float64, count=len(easyocr_results)
+                        ).mean())
                         all_results.append(("EasyOCR", text, confidence))
                         all_confidences.append(confidence)
                 except Exception as e:
                     logger.warning(f"EasyOCR failed for image {i+1}: {e}")
 
-            # Tesseract with multiple configurations
-            tesseract_configs = [
-                '--oem 3 --psm 6',  # Uniform text block
-                '--oem 3 --psm 3',  # Fully automatic page segmentation
-                '--oem 3 --psm 4',  # Single column text
-                '--oem 3 --psm 11', # Sparse text
-                '--oem 3 --psm 12'  # Single text line
-            ]
-
-            for j, config in enumerate(tesseract_configs):
-                try:
-                    text = pytesseract.image_to_string(image, config=config)
-                    data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
-                    conf_scores = [int(conf) for conf in data['conf'] if int(conf) > 0]
-                    if conf_scores and len(text.strip()) > 10:
-                        confidence = np.mean(conf_scores) / 100
-                        all_results.append((f"Tesseract_c{j+1}", text, confidence))
-                        all_confidences.append(confidence)
-                        if confidence > 0.8:
-                            break
-                except Exception as e:
-                    logger.warning(f"Tesseract config {j+1} failed: {e}")
+            # Tesseract configurations, collected as they finish until one is confident enough
+            pending = {job: j for j, job in enumerate(tesseract_jobs[i])}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                confident = False
+                for job in done:
+                    j = pending.pop(job)
+                    try:
+                        text, confidence = job.result()
+                        if confidence is not None and len(text.strip()) > 10:
+                            all_results.append((f"Tesseract_c{j+1}", text, confidence))
+                            all_confidences.append(confidence)
+                            confident = confident or confidence > FAST_OCR_THRESHOLD
+                    except Exception as e:
+                        logger.warning(f"Tesseract config {j+1} failed: {e}")
+                if confident:
+                    for job in pending:
+                        job.cancel()
+                    break
 
         if not all_results:
             return "", 0.0
@@ -343,7 +685,8 @@ class EnhancedPrescriptionAnalyzer:
         
         # Combine top results with deduplication
         combined_texts = []
-        seen_lines = set()
+        # Normalized line keys, bucketed by prefix for the near-duplicate comparison
+        seen_lines: Dict[str, List[str]] = {}
         
         for _, text, conf in sorted_results[:4]:  # Use top 4 results
             if conf > 0.3:
@@ -353,9 +696,8 @@ class EnhancedPrescriptionAnalyzer:
                     lines = cleaned.split('\n')
                     for line in lines:
                         line = line.strip()
-                        if line and line not in seen_lines and len(line) > 2:
+                        if line and len(line) > 2 and not self._is_duplicate_line(line, seen_lines):
                             combined_texts.append(line)
-                            seen_lines.add(line)
 
         if not combined_texts:
             return "", 0.0
@@ -365,30 +707,58 @@ class EnhancedPrescriptionAnalyzer:
 
         return final_text, overall_confidence
 
+    @staticmethod
+    def _is_duplicate_line(line: str, seen_lines: Dict[str, List[str]]) -> bool:
+        """Check a line against those already kept, ignoring case, spacing and punctuation, and record it if new"""
+        key = LINE_KEY_STRIP_RE.sub('', line.lower())
+        bucket = seen_lines.setdefault(key[:6], [])
+        if key in bucket or any(fuzz.ratio(key, seen, score_cutoff=LINE_DEDUP_RATIO) for seen in bucket):
+            return True
+        bucket.append(key)
+        return False
+
+    def _run_tesseract(self, image: Image.Image, psm: int) -> Tuple[str, Optional[float]]:
+        """Text and mean positive word confidence (0-1, None if no word scored) from one Tesseract page segmentation mode"""
+        if PyTessBaseAPI is None:
+            pytesseract = _load_pytesseract()
+            config = f'--oem 3 --psm {psm}'
+            text = pytesseract.image_to_string(image, config=config)
+            data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+            conf_values = data['conf']
+        else:
+            api = self._tesseract_api(psm)
+            api.SetImage(image)
+            text = api.GetUTF8Text()
+            conf_values = api.AllWordConfidences()
+
+        # Tesseract reports -1 for non-word boxes; average the rest in one vectorized pass
+        conf_scores = np.asarray(conf_values, dtype=np.float32)
+        conf_scores = conf_scores[conf_scores > 0]
+        confidence = float(conf_scores.mean()) / 100 if conf_scores.size else None
+        return text, confidence
+
+    def _tesseract_api(self, psm: int) -> PyTessBaseAPI:
+        """Tesseract handle for this OCR thread, created once per page segmentation mode"""
+        apis = getattr(self._tesseract_local, 'apis', None)
+        if apis is None:
+            apis = self._tesseract_local.apis = {}
+        if psm not in apis:
+            apis[psm] = PyTessBaseAPI(psm=psm, oem=OEM.DEFAULT)
+        return apis[psm]
+
     def _clean_text(self, text: str) -> str:
         """Clean and normalize OCR text with enhanced corrections"""
         if not text:
             return ""
 
         # Remove extra whitespace and unwanted characters
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'[^\w\s\.\,\:\(\)\-\/\+\&\'\"]', '', text)
+        text = WHITESPACE_RE.sub(' ', text)
+        text = UNWANTED_CHARS_RE.sub('', text)
 
         # Fix common OCR mistakes for medical prescriptions
-        fixes = {
-            r'\b0\b': 'O', r'\b1\b': 'I', r'rng': 'mg', r'\.mg': ' mg',
-            r'Tab\b': 'Tab', r'Cap\b': 'Cap', r'\bBd\b': 'bd', r'\bOd\b': 'od',
-            r'\bSyp\b': 'Syp', r'\bInj\b': 'Inj', r'rnl': 'ml', r'gm\b': 'gm',
-            r'\b5rng\b': '5mg', r'\b10rng\b': '10mg', r'\b25rng\b': '25mg',
-            r'Dr\s*\.?': 'Dr.', r'Mrs?\s*\.?': 'Mr.', r'Mis+\s*\.?': 'Miss',
-            # Common prescription format fixes
-            r'(\d+)\s*x\s*(\d+)': r'\1 x \2',  # Fix dosage format
-            r'(\d+)\s*mg': r'\1 mg',  # Ensure space before mg
-            r'(\d+)\s*ml': r'\1 ml',  # Ensure space before ml
-        }
-
-        for pattern, repl in fixes.items():
-            text = re.sub(pattern, repl, text, flags=re.IGNORECASE)
+        text = OCR_WORD_FIXES_RE.sub(lambda m: OCR_WORD_FIX_REPLACEMENTS[m.lastgroup], text)
+        for pattern, repl in OCR_FORMAT_FIXES:
+            text = pattern.sub(repl, text)
 
         return text.strip()
 
@@ -397,23 +767,33 @@ class EnhancedPrescriptionAnalyzer:
         doctor_info = {'name': '', 'specialization': '', 'registration_number': ''}
         patient_info = {'name': '', 'age': '', 'gender': ''}
         
-        # Extract doctor information
+        # Patterns are tried in priority order and skipped once their field is filled
+        
+        # Extract doctor information (only titles with a name group can set it)
         for pattern in self.doctor_patterns['titles']:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                if len(match.groups()) >= 2 and not doctor_info['name']:
-                    doctor_info['name'] = match.group(2).strip()
+            if doctor_info['name']:
+                break
+            if pattern.groups < 2:
+                continue
+            for match in pattern.finditer(text):
+                doctor_info['name'] = match.group(2).strip()
+                if doctor_info['name']:
+                    break
         
         # Extract specializations
         for pattern in self.doctor_patterns['specializations']:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match and not doctor_info['specialization']:
+            if doctor_info['specialization']:
+                break
+            match = pattern.search(text)
+            if match:
                 doctor_info['specialization'] = match.group(0).strip()
         
         # Extract registration numbers
         for pattern in self.doctor_patterns['registration']:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match and not doctor_info['registration_number']:
+            if doctor_info['registration_number']:
+                break
+            match = pattern.search(text)
+            if match:
                 if len(match.groups()) >= 2:
                     doctor_info['registration_number'] = match.group(2).strip()
                 else:
@@ -422,8 +802,10 @@ class EnhancedPrescriptionAnalyzer:
         # Extract patient information
         # Patient age
         for pattern in self.patient_patterns['age_indicators']:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match and not patient_info['age']:
+            if patient_info['age']:
+                break
+            match = pattern.search(text)
+            if match:
                 # Find the group that contains the age number
                 for group in match.groups():
                     if group and group.isdigit():
@@ -432,8 +814,10 @@ class EnhancedPrescriptionAnalyzer:
         
         # Patient gender
         for pattern in self.patient_patterns['gender_indicators']:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match and not patient_info['gender']:
+            if patient_info['gender']:
+                break
+            match = pattern.search(text)
+            if match:
                 gender_text = match.group(0).lower()
                 if 'male' in gender_text or 'm' in gender_text:
                     patient_info['gender'] = 'Male' if 'female' not in gender_text else 'Female'
@@ -442,12 +826,14 @@ class EnhancedPrescriptionAnalyzer:
         
         # Patient name - more sophisticated extraction
         for pattern in self.patient_patterns['name_patterns']:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match and not patient_info['name']:
+            if patient_info['name']:
+                break
+            match = pattern.search(text)
+            if match:
                 if len(match.groups()) >= 2:
                     name_candidate = match.group(2).strip()
                     # Validate name (should be reasonable length and contain letters)
-                    if 2 <= len(name_candidate) <= 50 and re.search(r'[A-Za-z]', name_candidate):
+                    if 2 <= len(name_candidate) <= 50 and HAS_LETTER_RE.search(name_candidate):
                         patient_info['name'] = name_candidate
         
         # If no explicit patient name found, try to infer from lines that might contain names
@@ -456,9 +842,9 @@ class EnhancedPrescriptionAnalyzer:
             for line in lines:
                 line = line.strip()
                 # Look for lines that might contain patient names
-                if len(line) > 2 and len(line) < 50 and re.match(r'^[A-Za-z\s\.]+$', line):
+                if len(line) > 2 and len(line) < 50 and NAME_LINE_RE.match(line):
                     # Skip if it looks like a doctor's name or medical term
-                    if not any(term in line.lower() for term in ['dr.', 'doctor', 'clinic', 'hospital', 'prescription', 'medicine']):
+                    if not NON_PATIENT_LINE_RE.search(line):
                         if not patient_info['name']:  # Take first reasonable candidate
                             patient_info['name'] = line
         
@@ -480,86 +866,36 @@ class EnhancedPrescriptionAnalyzer:
         prompt = f"""
         You are an expert medical transcriptionist. Extract prescription information from this text and return ONLY valid JSON.
 
-        CRITICAL INSTRUCTIONS:
-        1. Carefully distinguish between DOCTOR and PATIENT information
-        2. Doctor names often have titles (Dr., Prof.) or qualifications (MBBS, MD, etc.)
-        3. Patient names are usually simpler, without medical titles
-        4. Look for context clues like "Patient:", "Name:", age indicators, gender markers
+        {COHERE_INSTRUCTIONS}
         
         Pre-identified information to verify/correct:
         Doctor: {doctor_info}
         Patient: {patient_info}
 
         Return ONLY this JSON structure:
-        {{
-            "patient_name": "",
-            "patient_age": null,
-            "patient_gender": "",
-            "doctor_name": "",
-            "doctor_license": "",
-            "doctor_specialization": "",
-            "prescription_date": "YYYY-MM-DD",
-            "medications": [
-                {{
-                    "name": "",
-                    "dosage": "",
-                    "frequency": "",
-                    "duration": ""
-                }}
-            ],
-            "diagnosis": "",
-            "additional_notes": ""
-        }}
+        {COHERE_RESULT_FORMAT}
 
         Rules:
-        - Use null for patient_age if not found or unclear
-        - Use empty strings for missing text fields
-        - Extract ALL medications found
-        - Be precise with dosages, frequencies, and durations
-        - Include both generic and brand names when available
-        - Distinguish clearly between doctor and patient names
+        {COHERE_RULES}
 
         Prescription text:
         {extracted_text}
         """
 
+        raw_text = ""
         try:
-            response = self.co.chat(
-                model="command-r",
-                message="Return ONLY valid JSON. Do not add json blocks, backticks, or any explanation.\n\n" + prompt
+            raw_text = self._stream_cohere_chat(
+                "Return ONLY valid JSON. Do not add json blocks, backticks, or any explanation.\n\n" + prompt
             )
 
-            # Handle different Cohere SDK response formats
-            raw_text = ""
-            if hasattr(response, 'text'):
-                raw_text = response.text
-            elif hasattr(response, 'message'):
-                raw_text = response.message
-            elif hasattr(response, 'content'):
-                raw_text = response.content
-            else:
-                if isinstance(response, dict):
-                    raw_text = response.get('text', '') or response.get('message', '') or response.get('content', '')
-                else:
-                    raw_text = str(response)
-
             if not raw_text:
                 raise ValueError("Empty response from Cohere API")
 
-            raw_text = raw_text.strip()
-
             # Clean JSON fences if present
-            if raw_text.startswith("```"):
-                lines = raw_text.split('\n')
-                if lines[0].startswith("```") and lines[-1].strip() == "```":
-                    raw_text = '\n'.join(lines[1:-1])
-                elif lines[0].startswith("```json"):
-                    raw_text = '\n'.join(lines[1:])
-                    if raw_text.endswith("```"):
-                        raw_text = raw_text[:-3]
+            raw_text = JSON_FENCE_RE.sub('', raw_text.strip())
 
             # Parse JSON
-            data = json.loads(raw_text)
+            data = orjson.loads(raw_text)
 
             # Validate and enhance the extracted data
             data = self._validate_and_enhance_extraction(data, doctor_info, patient_info)
@@ -569,7 +905,7 @@ class EnhancedPrescriptionAnalyzer:
             data['raw_text'] = extracted_text
             return data
 
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"JSON decode error: {e}")
             logger.error(f"Raw response: {raw_text}")
             # Fallback to pattern-based extraction
@@ -579,6 +915,96 @@ class EnhancedPrescriptionAnalyzer:
             # Fallback to pattern-based extraction
             return self._fallback_extraction(extracted_text, ocr_confidence, doctor_info, patient_info)
 
+    def analyze_with_cohere_batch(self, items: List[Tuple[str, float]]) -> List[Dict]:
+        """Analyze several (extracted_text, ocr_confidence) pairs, up to COHERE_MAX_BATCH per Cohere call"""
+        if not self.co:
+            raise ValueError("Cohere API client not initialized. Please provide a valid API key.")
+
+        results = []
+        for start in range(0, len(items), COHERE_MAX_BATCH):
+            chunk = items[start:start + COHERE_MAX_BATCH]
+            if len(chunk) == 1:
+                results.append(self._analyze_with_cohere_api(*chunk[0]))
+            else:
+                results.extend(self._analyze_batch_with_cohere_api(chunk))
+        return results
+
+    def _analyze_batch_with_cohere_api(self, items: List[Tuple[str, float]]) -> List[Dict]:
+        """
+        One Cohere call for several prescriptions, answered as a JSON array in the same order
+        Each entry echoes its prescription number; the batch is rejected unless they come back
+        exactly 1..n, so one patient's data can never be attached to another prescription
+        """
+        pre_identified = [self.extract_doctor_patient_info(text) for text, _ in items]
+
+        sections = "\n\n".join(
+            f"""        === PRESCRIPTION {i} ===
+        Pre-identified information to verify/correct:
+        Doctor: {doctor_info}
+        Patient: {patient_info}
+
+        Prescription text:
+        {text}"""
+            for i, ((text, _), (doctor_info, patient_info)) in enumerate(zip(items, pre_identified), 1)
+        )
+
+        prompt = f"""
+        You are an expert medical transcriptionist. Extract the information of each of the {len(items)} prescriptions below and return ONLY valid JSON.
+
+        {COHERE_INSTRUCTIONS}
+
+        Return ONLY this JSON structure, with one entry in "results" per prescription, in the same order.
+        Each entry must also have a "prescription" field holding the number from its "=== PRESCRIPTION n ===" header:
+        {{"results": [{COHERE_RESULT_FORMAT}]}}
+
+        Rules:
+        {COHERE_RULES}
+
+{sections}
+        """
+
+        raw_text = ""
+        try:
+            raw_text = self._stream_cohere_chat(
+                "Return ONLY valid JSON. Do not add json blocks, backticks, or any explanation.\n\n" + prompt
+            )
+            if not raw_text:
+                raise ValueError("Empty response from Cohere API")
+
+            parsed = orjson.loads(JSON_FENCE_RE.sub('', raw_text.strip()))
+            entries = parsed.get('results') if isinstance(parsed, dict) else None
+            if not isinstance(entries, list) or len(entries) != len(items):
+                raise ValueError(f"Expected {len(items)} results from Cohere API")
+            indices = [entry.pop('prescription', None) if isinstance(entry, dict) else None for entry in entries]
+            if indices != list(range(1, len(items) + 1)):
+                raise ValueError(f"Cohere API results are not numbered 1..{len(items)} in order: {indices}")
+        except Exception as e:
+            logger.error(f"Batched Cohere analysis failed: {e}, retrying prescriptions individually")
+            return [self._analyze_with_cohere_api(text, conf) for text, conf in items]
+
+        results = []
+        for (text, conf), (doctor_info, patient_info), data in zip(items, pre_identified, entries):
+            try:
+                data = self._validate_and_enhance_extraction(data, doctor_info, patient_info)
+                data['ocr_confidence'] = conf
+                data['raw_text'] = text
+            except Exception as e:
+                logger.error(f"Invalid batched Cohere result: {e}")
+                data = self._fallback_extraction(text, conf, doctor_info, patient_info)
+            results.append(data)
+        return results
+
+    def _stream_cohere_chat(self, message: str) -> str:
+        """Collect the generated text of a streamed Cohere chat as it arrives"""
+        if hasattr(self.co, 'chat_stream'):  # cohere >= 5
+            events = self.co.chat_stream(model="command-r", message=message)
+        else:
+            events = self.co.chat(model="command-r", message=message, stream=True)
+        return ''.join(
+            event.text for event in events
+            if getattr(event, 'event_type', None) == 'text-generation'
+        )
+
     def _validate_and_enhance_extraction(self, data: Dict, doctor_info: Dict, patient_info: Dict) -> Dict:
         """Validate and enhance the extracted data using pattern-based results"""
         
@@ -614,7 +1040,7 @@ class EnhancedPrescriptionAnalyzer:
         
         data = {
             'patient_name': patient_info.get('name', ''),
-            'patient_age': int(patient_info['age']) if patient_info.get('age') and patient_info['age'].isdigit() else None,
+            'patient_age': parse_age(patient_info.get('age')),
             'patient_gender': patient_info.get('gender', ''),
             'doctor_name': doctor_info.get('name', ''),
             'doctor_license': doctor_info.get('registration_number', ''),
@@ -632,40 +1058,29 @@ class EnhancedPrescriptionAnalyzer:
     def _extract_medicines_pattern_based(self, text: str) -> List[Dict]:
         """Extract medicines using pattern matching"""
         medicines = []
+        seen = set()
         lines = text.split('\n')
         
-        # Common medicine patterns
-        medicine_patterns = [
-            r'(\w+(?:\s+\w+)*)\s+(\d+\s*(?:mg|ml|gm|g))\s+(\w+)\s*(?:x\s*(\d+))?',  # Name Dosage Frequency x Duration
-            r'(\w+(?:\s+\w+)*)\s+(\d+)\s*(?:mg|ml|gm|g)\s+(\w+)',  # Name Dosage Frequency
-            r'(\w+(?:\s+\w+)*)\s+(?:Tab|Cap|Syp)\s+(\d+)\s*(?:mg|ml)',  # Name Tab/Cap/Syp Dosage
-            r'(\w+)\s+(\d+)\s*(od|bd|tid|qid|sos)',  # Simple Name Dosage Frequency
-        ]
-        
-        for line in lines:
-            line = line.strip()
-            if len(line) < 3:
-                continue
+        for match in MEDICINE_RE.finditer(text):
+            # Inner groups of whichever alternative matched
+            start = match.lastindex
+            groups = match.groups()[start:start + MEDICINE_PATTERN_GROUPS[start]]
+            medicine = {
+                'name': groups[0].strip() if groups[0] else '',
+                'dosage': f"{groups[1]} {groups[2] if len(groups) > 2 else ''}" if len(groups) > 1 else '',
+                'frequency': groups[2] if len(groups) > 2 else '',
+                'duration': groups[3] if len(groups) > 3 and groups[3] else ''
+            }
+            
+            # Clean up the medicine entry, skipping repeats
+            key = (medicine['name'].lower(), medicine['dosage'])
+            if medicine['name'] and len(medicine['name']) > 1 and key not in seen:
+                seen.add(key)
+                # Expand abbreviations
+                if medicine['frequency'].lower() in self.medical_abbreviations:
+                    medicine['frequency'] = self.medical_abbreviations[medicine['frequency'].lower()]
                 
-            for pattern in medicine_patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    groups = match.groups()
-                    medicine = {
-                        'name': groups[0].strip() if groups[0] else '',
-                        'dosage': f"{groups[1]} {groups[2] if len(groups) > 2 else ''}" if len(groups) > 1 else '',
-                        'frequency': groups[2] if len(groups) > 2 else '',
-                        'duration': groups[3] if len(groups) > 3 and groups[3] else ''
-                    }
-                    
-                    # Clean up the medicine entry
-                    if medicine['name'] and len(medicine['name']) > 1:
-                        # Expand abbreviations
-                        if medicine['frequency'].lower() in self.medical_abbreviations:
-                            medicine['frequency'] = self.medical_abbreviations[medicine['frequency'].lower()]
-                        
-                        medicines.append(medicine)
-                    break
+                medicines.append(medicine)
         
         # If no medicines found with patterns, try simple word extraction
         if not medicines:
@@ -673,8 +1088,8 @@ class EnhancedPrescriptionAnalyzer:
                 line = line.strip()
                 # Look for lines that might contain medicine names
                 if (len(line) > 2 and len(line) < 50 and 
-                    not any(keyword in line.lower() for keyword in ['dr.', 'patient', 'age', 'date']) and
-                    re.search(r'[A-Za-z]', line)):
+                    not NON_MEDICINE_LINE_RE.search(line) and
+                    HAS_LETTER_RE.search(line)):
                     
                     medicine = {
                         'name': line,
@@ -692,11 +1107,7 @@ class EnhancedPrescriptionAnalyzer:
     def sanitize_prescription_data(self, data: dict) -> dict:
         """Clean data before Pydantic validation to prevent None errors"""
         # Ensure all string fields have safe defaults
-        string_fields = ['patient_name', 'patient_gender', 'doctor_name', 'doctor_license', 
-                        'doctor_specialization', 'additional_notes', 'diagnosis']
-        for field in string_fields:
-            if data.get(field) is None:
-                data[field] = ""
+        data.update({field: "" for field in SANITIZED_STRING_FIELDS if data.get(field) is None})
         
         # Handle age - convert to int if possible, otherwise None
         age = data.get('patient_age')
@@ -711,32 +1122,26 @@ class EnhancedPrescriptionAnalyzer:
             data['medications'] = []
         
         # Clean each medication item
-        medications = []
-        for med in data.get('medications', []):
-            if isinstance(med, dict):
-                cleaned_med = {
-                    'name': med.get('name') or "",
-                    'dosage': med.get('dosage') or "",
-                    'frequency': med.get('frequency') or "",
-                    'duration': med.get('duration') or ""
-                }
-                medications.append(cleaned_med)
-        data['medications'] = medications
+        data['medications'] = [
+            {field: med.get(field) or "" for field in MEDICATION_FIELDS}
+            for med in data['medications'] if isinstance(med, dict)
+        ]
         
         return data
 
     def enhance_medicine_info(self, medicines: List[Dict]) -> List[Medicine]:
         """Enhance medicine information with database lookup"""
         enhanced_medicines = []
+        availability = self._check_availability_batch([med_dict.get('name', '') for med_dict in medicines])
         
-        for med_dict in medicines:
+        for med_dict, available in zip(medicines, availability):
             medicine = Medicine(
                 name=med_dict.get('name', ''),
                 dosage=med_dict.get('dosage', ''),
                 frequency=med_dict.get('frequency', ''),
                 duration=med_dict.get('duration', ''),
                 quantity=str(med_dict.get('quantity', 1)),
-                available=self._check_availability(med_dict.get('name', ''))
+                available=available
             )
             enhanced_medicines.append(medicine)
         
@@ -744,53 +1149,164 @@ class EnhancedPrescriptionAnalyzer:
 
     def _check_availability(self, medicine_name: str) -> bool:
         """Check medicine availability using fuzzy matching"""
-        if not medicine_name:
-            return True
-            
-        medicine_lower = medicine_name.lower().strip()
-        
-        # Direct match
-        if medicine_lower in self.medicine_database:
-            return self.medicine_database[medicine_lower]['available']
+        return self._check_availability_batch([medicine_name])[0]
+
+    def _check_availability_batch(self, medicine_names: List[str]) -> List[bool]:
+        """Availability of several medicines, fuzzy matching all unresolved names in one call"""
+        matched_names: List[Optional[str]] = [None] * len(medicine_names)
+        unresolved: Dict[str, List[int]] = {}
         
-        # Fuzzy match
-        best_match = process.extractOne(medicine_lower, self.medicine_database.keys(), scorer=fuzz.ratio)
+        for i, medicine_name in enumerate(medicine_names):
+            if not medicine_name:
+                continue
+            medicine_lower = medicine_name.lower().strip()
+            
+            # Direct match
+            if medicine_lower in self.medicine_database:
+                matched_names[i] = medicine_lower
+                continue
+            
+            # Names seen before resolve from the memo, whichever way they were matched
+            cached = self._name_match_cache.get(medicine_lower, _MISSING)
+            if cached is not _MISSING:
+                matched_names[i] = cached
+                continue
+            
+            # Known name contained in the text (e.g. "tab crocin 500")
+            matched_names[i] = self._find_known_medicine(medicine_lower)
+            if matched_names[i] is not None:
+                self._name_match_cache.put(medicine_lower, matched_names[i])
+            else:
+                unresolved.setdefault(medicine_lower, []).append(i)
         
-        if best_match and best_match[1] > 75:
-            return self.medicine_database[best_match[0]]['available']
+        # Fuzzy match what is left
+        if unresolved:
+            queries = list(unresolved)
+            for query, matched_name in zip(queries, self._fuzzy_match_medicines(queries)):
+                for i in unresolved[query]:
+                    matched_names[i] = matched_name
         
-        return True  # Default to available
+        return [
+            self.medicine_database[name]['available'] if name else True  # Default to available
+            for name in matched_names
+        ]
+
+    def _refresh_medicine_lookups(self) -> None:
+        """Rebuild the name lists and Aho-Corasick automaton after the medicine database changes"""
+        self._medicine_names = list(self.medicine_database.keys())
+        # Fuzzy-matching form of each name (aligned with _medicine_names), computed once
+        self._processed_medicine_names = [utils.default_process(name) for name in self._medicine_names]
+        # Exact processed-form lookup; the first name wins, as argmax would pick it on a 100 score
+        self._processed_name_index: Dict[str, str] = {}
+        for name, processed in zip(self._medicine_names, self._processed_medicine_names):
+            self._processed_name_index.setdefault(processed, name)
+        automaton = ahocorasick.Automaton()
+        for name in self._medicine_names:
+            automaton.add_word(name, name)
+        automaton.make_automaton()
+        self._medicine_automaton = automaton
+        self._name_match_cache.clear()
+
+    def _find_known_medicine(self, text_lower: str) -> Optional[str]:
+        """Longest database name occurring as whole words in the text, found in one linear pass"""
+        best = None
+        if not self._medicine_names:
+            return best
+        for end, name in self._medicine_automaton.iter(text_lower):
+            start = end - len(name) + 1
+            if start > 0 and text_lower[start - 1].isalnum():
+                continue
+            if end + 1 < len(text_lower) and text_lower[end + 1].isalnum():
+                continue
+            if best is None or len(name) > len(best):
+                best = name
+        return best
+
+    def _fuzzy_match_medicines(self, queries: List[str]) -> List[Optional[str]]:
+        """Best database name for each medicine token, scored as one query x name matrix and memoized"""
+        if not self._medicine_names:
+            return [None] * len(queries)
+
+        # Names that only differ by case or punctuation score 100; resolve them by set lookup
+        processed_queries = [utils.default_process(query) for query in queries]
+        matched_names = [self._processed_name_index.get(processed) if processed else None
+                         for processed in processed_queries]
+        remaining = [i for i, name in enumerate(matched_names) if name is None]
+
+        if remaining:
+            scores = process.cdist(
+                [processed_queries[i] for i in remaining], self._processed_medicine_names,
+                scorer=fuzz.ratio, score_cutoff=75
+            )
+            for i, row, j in zip(remaining, scores, scores.argmax(axis=1)):
+                matched_names[i] = self._medicine_names[j] if row[j] > 75 else None
+
+        for query, matched_name in zip(queries, matched_names):
+            self._name_match_cache.put(query, matched_name)
+        return matched_names
 
     def analyze_prescription(self, image_path: str) -> AnalysisResult:
         """Main method to analyze prescription image with enhanced doctor/patient detection"""
+        return self._analyze(self._read_image_file(image_path))
+
+    def analyze_prescription_bytes(self, data: bytes) -> AnalysisResult:
+        """Analyze an encoded prescription image held in memory, without a temporary file"""
+        return self._analyze(np.frombuffer(data, dtype=np.uint8))
+
+    def analyze_batch(self, image_paths: List[str], workers: Optional[int] = None) -> List[AnalysisResult]:
+        """
+        Analyze several prescription images across worker processes, one analyzer per process
+        Results come back in the order of image_paths
+        """
+        workers = min(workers or os.cpu_count() or 1, len(image_paths))
+        if workers <= 1:
+            return [self.analyze_prescription(path) for path in image_paths]
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                 initargs=(self._init_args,)) as executor:
+            return list(executor.map(_analyze_in_batch_worker, image_paths))
+
+    def _analyze(self, buffer: Optional[np.ndarray]) -> AnalysisResult:
+        """Run the OCR and extraction pipeline on an encoded image buffer"""
         try:
-            prescription_id = f"RX{datetime.now().strftime('%Y%m%d%H%M%S')}{str(uuid.uuid4())[:8]}"
+            prescription_id = new_prescription_id()
             
             logger.info(f"Starting enhanced analysis for prescription {prescription_id}")
             
-            # Preprocess image
-            processed_images = self.preprocess_image(image_path)
-            if not processed_images:
-                return AnalysisResult(
-                    prescription_id=prescription_id,
-                    patient=Patient(), doctor=Doctor(), medicines=[],
-                    diagnosis=[], confidence_score=0.0, raw_text="",
-                    success=False, error="Failed to preprocess image"
-                )
-            
-            # Extract text
-            extracted_text, ocr_confidence = self.extract_text(processed_images)
-            if not extracted_text.strip():
-                return AnalysisResult(
-                    prescription_id=prescription_id,
-                    patient=Patient(), doctor=Doctor(), medicines=[],
-                    diagnosis=[], confidence_score=0.0, raw_text="",
-                    success=False, error="No text could be extracted"
-                )
+            # Identical uploads reuse the OCR output of an earlier run
+            ocr_key = hashlib.blake2b(buffer, digest_size=16).hexdigest() if buffer is not None else None
+            cached_ocr = self._ocr_cache.get(ocr_key) if ocr_key else None
+            if cached_ocr:
+                logger.info(f"Reusing cached OCR text for prescription {prescription_id}")
+                extracted_text, ocr_confidence = cached_ocr
+            else:
+                # Preprocess image
+                processed_images = self._decode_and_preprocess(buffer) if buffer is not None else []
+                if not processed_images:
+                    return AnalysisResult(
+                        prescription_id=prescription_id,
+                        patient=Patient(), doctor=Doctor(), medicines=[],
+                        diagnosis=[], confidence_score=0.0, raw_text="",
+                        success=False, error="Failed to preprocess image"
+                    )
+                
+                # Extract text
+                extracted_text, ocr_confidence = self.extract_text(processed_images)
+                if not extracted_text.strip():
+                    return AnalysisResult(
+                        prescription_id=prescription_id,
+                        patient=Patient(), doctor=Doctor(), medicines=[],
+                        diagnosis=[], confidence_score=0.0, raw_text="",
+                        success=False, error="No text could be extracted"
+                    )
+                self._ocr_cache.put(ocr_key, (extracted_text, ocr_confidence))
             
             # Analyze with Cohere API (or fallback to pattern matching)
             try:
-                cohere_result = self.analyze_with_cohere(extracted_text, ocr_confidence)
+                if self._cohere_batcher:
+                    cohere_result = self._cohere_batcher.submit(extracted_text, ocr_confidence)
+                else:
+                    cohere_result = self.analyze_with_cohere(extracted_text, ocr_confidence)
             except Exception as e:
                 logger.warning(f"Cohere API analysis failed: {e}, using pattern-based fallback")
                 doctor_info, patient_info = self.extract_doctor_patient_info(extracted_text)
@@ -834,7 +1350,7 @@ class EnhancedPrescriptionAnalyzer:
         except Exception as e:
             logger.error(f"Error in enhanced analyze_prescription: {e}")
             return AnalysisResult(
-                prescription_id=f"RX{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                prescription_id=f"RX{time.strftime('%Y%m%d%H%M%S')}",
                 patient=Patient(), doctor=Doctor(), medicines=[],
                 diagnosis=[], confidence_score=0.0, raw_text="",
                 success=False, error=str(e)
@@ -843,75 +1359,40 @@ class EnhancedPrescriptionAnalyzer:
     def _calculate_confidence(self, ocr_confidence: float, medicines_count: int, 
                             patient: Patient, doctor: Doctor) -> float:
         """Calculate overall confidence score with enhanced weighting"""
-        weights = {
-            'ocr': 0.3, 
-            'medicines': 0.3, 
-            'patient_info': 0.2, 
-            'doctor_info': 0.2
-        }
-        
-        # Medicine score based on count and quality
-        medicine_score = 0.0
-        if medicines_count > 0:
-            medicine_score = min(1.0, medicines_count / 3.0)
-            medicine_score = min(1.0, medicine_score + 0.3)  # Bonus for having medicines
-        
-        # Patient score based on available information
-        patient_score = 0.0
-        if patient.name: patient_score += 0.5
-        if patient.age: patient_score += 0.25
-        if patient.gender: patient_score += 0.25
-        patient_score = min(1.0, patient_score)
-        
-        # Doctor score based on available information
-        doctor_score = 0.0
-        if doctor.name: doctor_score += 0.6
-        if doctor.specialization: doctor_score += 0.2
-        if doctor.registration_number: doctor_score += 0.2
-        doctor_score = min(1.0, doctor_score)
+        # Medicine count plus a bonus for having any; field presence scores
+        # use bool arithmetic so each adds its weight only when filled
+        medicine_score = min(1.0, medicines_count / 3.0 + 0.3) if medicines_count > 0 else 0.0
+        patient_score = 0.5 * bool(patient.name) + 0.25 * bool(patient.age) + 0.25 * bool(patient.gender)
+        doctor_score = min(1.0, 0.6 * bool(doctor.name) + 0.2 * bool(doctor.specialization)
+                           + 0.2 * bool(doctor.registration_number))
         
+        # Weighted blend: OCR 0.3, medicines 0.3, patient 0.2, doctor 0.2
         total_score = (
-            weights['ocr'] * ocr_confidence +
-            weights['medicines'] * medicine_score +
-            weights['patient_info'] * patient_score +
-            weights['doctor_info'] * doctor_score
+            0.3 * ocr_confidence +
+            0.3 * medicine_score +
+            0.2 * patient_score +
+            0.2 * doctor_score
         )
         
         return min(1.0, max(0.0, total_score))
 
     def to_json(self, result: AnalysisResult) -> Dict:
-        """Convert AnalysisResult to JSON format expected by FastAPI"""
+        """Convert AnalysisResult to the orjson-serializable shape expected by FastAPI"""
         return {
             "success": result.success,
             "prescription_id": result.prescription_id,
-            "patient": {
-                "name": result.patient.name,
-                "age": result.patient.age,
-                "gender": result.patient.gender
-            },
-            "doctor": {
-                "name": result.doctor.name,
-                "specialization": result.doctor.specialization,
-                "registration_number": result.doctor.registration_number
-            },
-            "medicines": [
-                {
-                    "name": med.name,
-                    "dosage": med.dosage,
-                    "quantity": med.quantity,
-                    "frequency": med.frequency,
-                    "duration": med.duration,
-                    "instructions": med.instructions,
-                    "available": med.available
-                } for med in result.medicines
-            ],
+            # Nested records stay dataclasses; orjson serializes them natively
+            # with the same keys, skipping a per-medicine dict build
+            "patient": result.patient,
+            "doctor": result.doctor,
+            "medicines": result.medicines,
             "diagnosis": result.diagnosis,
             "confidence_score": result.confidence_score,
             "message": "Analysis completed successfully" if result.success else result.error,
             "error": result.error if not result.success else "",
             # Legacy fields for backward compatibility
             "patient_name": result.patient.name,
-            "patient_age": int(result.patient.age) if result.patient.age and result.patient.age.isdigit() else 0,
+            "patient_age": parse_age(result.patient.age) or 0,
             "patient_gender": result.patient.gender,
             "doctor_name": result.doctor.name,
             "doctor_license": result.doctor.registration_number
@@ -926,23 +1407,24 @@ class EnhancedPrescriptionAnalyzer:
         """
         logger.info("Training analyzer on sample prescription data...")
         
-        # Update medicine database with new medicines found in samples
-        new_medicines = {}
+        # Add medicines found in samples straight into the database, keeping existing entries
+        database_size = len(self.medicine_database)
         
         for sample in sample_prescriptions:
             if 'medicines' in sample:
                 for medicine in sample['medicines']:
                     medicine_name = medicine.get('name', '').lower().strip()
-                    if medicine_name and medicine_name not in self.medicine_database:
-                        new_medicines[medicine_name] = {
+                    if medicine_name:
+                        self.medicine_database.setdefault(medicine_name, {
                             'category': 'unknown',
                             'generic': medicine_name,
                             'available': True
-                        }
+                        })
         
-        if new_medicines:
-            self.medicine_database.update(new_medicines)
+        added = len(self.medicine_database) - database_size
+        if added:
+            self._refresh_medicine_lookups()
             self._save_medicine_database()
-            logger.info(f"Added {len(new_medicines)} new medicines to database")
+            logger.info(f"Added {added} new medicines to database")
         
         logger.info("Training completed successfully")
\ No newline at end of file
@@ -0,0 +1,71 @@
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+
+class SQLiteStorage:
+    """
+    Key/value store for serialized records, shared by all API worker processes
+    Backed by a single SQLite file in WAL mode so readers never block the writer
+    """
+
+    def __init__(self, db_path: str, table: str):
+        self.db_path = db_path
+        self.table = table
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Open the connection lazily so each worker process gets its own"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "id TEXT PRIMARY KEY, created_at REAL NOT NULL, data BLOB NOT NULL)"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{self.table}_created_at ON {self.table} (created_at)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def put(self, key: str, data: bytes) -> None:
+        """Insert or replace a record"""
+        self._execute(
+            f"INSERT OR REPLACE INTO {self.table} (id, created_at, data) VALUES (?, ?, ?)",
+            (key, time.time(), data)
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the stored record, or None if missing"""
+        rows = self._execute(f"SELECT data FROM {self.table} WHERE id = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def delete(self, key: str) -> bool:
+        """Delete a record, returning whether it existed"""
+        with self._lock:
+            return self.conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (key,)).rowcount > 0
+
+    def list_recent(self, limit: int, offset: int = 0) -> List[bytes]:
+        """Records ordered newest first"""
+        rows = self._execute(
+            f"SELECT data FROM {self.table} ORDER BY created_at DESC, rowid DESC LIMIT ? OFFSET ?",
+            (limit, offset)
+        )
+        return [row[0] for row in rows]
+
+    def __contains__(self, key: str) -> bool:
+        return bool(self._execute(f"SELECT 1 FROM {self.table} WHERE id = ?", (key,)))
+
+    def __len__(self) -> int:
+        return self._execute(f"SELECT COUNT(*) FROM {self.table}")[0][0]
@@ -5,28 +5,185 @@ Run this script to train and evaluate your analyzer on sample prescription data
 """
 
 import os
-import json
+import re
+import argparse
+import orjson
+import hashlib
 import logging
-from typing import List, Dict
+from typing import TYPE_CHECKING, List, Dict, Optional
 from datetime import datetime
 
-# Make sure to import your enhanced analyzer
-try:
+# The analyzer pulls in OpenCV/OCR, so it is imported in main() only once images were found
+if TYPE_CHECKING:
     from prescription_analyzer import EnhancedPrescriptionAnalyzer
-except ImportError as e:
-    print(f"Error importing EnhancedPrescriptionAnalyzer: {e}")
-    print("Make sure prescription_analyzer.py is in the same directory")
-    exit(1)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+ANALYZER_VERSION = "Enhanced Prescription Analyzer v1.0"
+ANALYZER_VERSION_TAG = ANALYZER_VERSION.rsplit(' ', 1)[-1]
+# Cached analyses are keyed by image content, this tag and a hash of the analyzer source,
+# so any change to the analyzer invalidates them
+ANALYZER_SOURCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prescription_analyzer.py")
+OCR_CACHE_DIR = os.path.join("outputs", "ocr_cache")
+
+# Extensions recognized as prescription images
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tiff', '.bmp')
+# Image files elsewhere count as samples only if their name mentions a prescription
+PRESCRIPTION_IMAGE_NAME_RE = re.compile(r'(?:prescription|rx).*\.(?:jpe?g|png|tiff|bmp)\Z', re.IGNORECASE)
+
+# Characters of OCR text kept per result in the report
+RAW_TEXT_PREVIEW_CHARS = 500
+
+def _truncate_text(text: str, limit: int) -> str:
+    """Text cut to limit characters, with an ellipsis when anything was dropped"""
+    return text if len(text) <= limit else text[:limit] + "..."
+
+def _file_hash(path: str, digest_size: int = 16) -> str:
+    """Hex blake2b digest of a file's contents, read in 1 MiB chunks"""
+    hasher = hashlib.blake2b(digest_size=digest_size)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+# Expected doctor/patient/medicine details for the provided sample prescriptions;
+# static, so built once at import
+SAMPLE_TRAINING_DATA = [
+    {
+        "sample_id": "prescription_1",
+        "description": "Dr. Mandal prescription with patient details",
+        "expected_doctor": {
+            "name": "Dr. (Prof.) D.K. Mandal",
+            "specialization": "Professor", 
+            "registration_number": "MBBS, O.O.O+ HD"
+        },
+        "expected_patient": {
+            "name": "Sunita Mehta",
+            "age": None,
+            "gender": ""
+        },
+        "expected_medicines": [
+            {
+                "name": "Medicine from prescription",
+                "dosage": "As prescribed",
+                "frequency": "As prescribed", 
+                "duration": "As prescribed"
+            }
+        ],
+        "notes": "Formal prescription pad with clear doctor credentials"
+    },
+    {
+        "sample_id": "prescription_2",
+        "description": "Handwritten prescription with neurologist header",
+        "expected_doctor": {
+            "name": "Neurologist name from letterhead",
+            "specialization": "Neurologist",
+            "registration_number": ""
+        },
+        "expected_patient": {
+            "name": "Patient name if visible",
+            "age": None,
+            "gender": ""
+        },
+        "expected_medicines": [
+            {
+                "name": "Handwritten medicine names",
+                "dosage": "",
+                "frequency": "",
+                "duration": ""
+            }
+        ],
+        "notes": "Handwritten prescription, challenging OCR case"
+    },
+    {
+        "sample_id": "prescription_3", 
+        "description": "Clinical prescription with doctor information",
+        "expected_doctor": {
+            "name": "Dr. Sachin Mehta",
+            "specialization": "Consultant",
+            "registration_number": ""
+        },
+        "expected_patient": {
+            "name": "Patient name from prescription",
+            "age": None,
+            "gender": ""
+        },
+        "expected_medicines": [
+            {
+                "name": "Gan Vi",
+                "dosage": "32",
+                "frequency": "bd",
+                "duration": "as prescribed"
+            }
+        ],
+        "notes": "Mixed handwritten and printed elements"
+    },
+    {
+        "sample_id": "prescription_4",
+        "description": "Dr. Abhishek Dubey prescription",
+        "expected_doctor": {
+            "name": "Dr. Abhishek Dubey",
+            "specialization": "M.B.B.S., M.D.",
+            "registration_number": ""
+        },
+        "expected_patient": {
+            "name": "Patient name if visible",
+            "age": None,
+            "gender": ""
+        },
+        "expected_medicines": [
+            {
+                "name": "Multiple medications from prescription",
+                "dosage": "",
+                "frequency": "",
+                "duration": ""
+            }
+        ],
+        "notes": "Professional letterhead with clear doctor credentials"
+    },
+    {
+        "sample_id": "prescription_5",
+        "description": "Additional prescription sample",
+        "expected_doctor": {
+            "name": "Doctor name from prescription",
+            "specialization": "",
+            "registration_number": ""
+        },
+        "expected_patient": {
+            "name": "Patient name if visible", 
+            "age": None,
+            "gender": ""
+        },
+        "expected_medicines": [
+            {
+                "name": "Medicine names from prescription",
+                "dosage": "",
+                "frequency": "",
+                "duration": ""
+            }
+        ],
+        "notes": "Additional sample for comprehensive training"
+    }
+]
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Write the file in one call through a temporary sibling, so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
 class PrescriptionTrainer:
-    def __init__(self, analyzer: EnhancedPrescriptionAnalyzer):
+    def __init__(self, analyzer: "EnhancedPrescriptionAnalyzer", use_cache: bool = True):
         self.analyzer = analyzer
+        # Without the cache every image is analyzed again; results are still stored for later runs
+        self.use_cache = use_cache
+        self._analyzer_source_hash = None
         
-    def get_sample_image_paths(self) -> List[str]:
+    @staticmethod
+    def get_sample_image_paths() -> List[str]:
         """
         Get paths to sample prescription images
         """
@@ -36,31 +193,26 @@ class PrescriptionTrainer:
         # Create the directory if it doesn't exist
         if not os.path.exists(samples_dir):
             os.makedirs(samples_dir)
-            logger.info(f"Created directory: {samples_dir}")
+            logger.info("Created directory: %s", samples_dir)
             
         # Look for prescription images
-        image_extensions = ['.jpg', '.jpeg', '.png', '.tiff', '.bmp']
-        image_paths = []
-        
-        if os.path.exists(samples_dir):
-            for filename in os.listdir(samples_dir):
-                if any(filename.lower().endswith(ext) for ext in image_extensions):
-                    image_paths.append(os.path.join(samples_dir, filename))
+        with os.scandir(samples_dir) as entries:
+            image_paths = [entry.path for entry in entries
+                           if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file()]
         
         # If no images found, check current directory
         if not image_paths:
             logger.info("No images found in sample_prescriptions/, checking current directory...")
-            for filename in os.listdir('.'):
-                if any(filename.lower().endswith(ext) for ext in image_extensions):
-                    if 'prescription' in filename.lower() or 'rx' in filename.lower():
-                        image_paths.append(filename)
+            with os.scandir('.') as entries:
+                image_paths = [entry.name for entry in entries
+                               if PRESCRIPTION_IMAGE_NAME_RE.search(entry.name) and entry.is_file()]
         
         # Sort the paths for consistent ordering
         image_paths.sort()
         
-        logger.info(f"Found {len(image_paths)} prescription images")
+        logger.info("Found %d prescription images", len(image_paths))
         for path in image_paths:
-            logger.info(f"  - {path}")
+            logger.info("  - %s", path)
             
         return image_paths
         
@@ -69,125 +221,7 @@ class PrescriptionTrainer:
         Create training data based on the prescription images you provided
         This includes expected doctor/patient information
         """
-        training_data = [
-            {
-                "sample_id": "prescription_1",
-                "description": "Dr. Mandal prescription with patient details",
-                "expected_doctor": {
-                    "name": "Dr. (Prof.) D.K. Mandal",
-                    "specialization": "Professor", 
-                    "registration_number": "MBBS, O.O.O+ HD"
-                },
-                "expected_patient": {
-                    "name": "Sunita Mehta",
-                    "age": None,
-                    "gender": ""
-                },
-                "expected_medicines": [
-                    {
-                        "name": "Medicine from prescription",
-                        "dosage": "As prescribed",
-                        "frequency": "As prescribed", 
-                        "duration": "As prescribed"
-                    }
-                ],
-                "notes": "Formal prescription pad with clear doctor credentials"
-            },
-            {
-                "sample_id": "prescription_2",
-                "description": "Handwritten prescription with neurologist header",
-                "expected_doctor": {
-                    "name": "Neurologist name from letterhead",
-                    "specialization": "Neurologist",
-                    "registration_number": ""
-                },
-                "expected_patient": {
-                    "name": "Patient name if visible",
-                    "age": None,
-                    "gender": ""
-                },
-                "expected_medicines": [
-                    {
-                        "name": "Handwritten medicine names",
-                        "dosage": "",
-                        "frequency": "",
-                        "duration": ""
-                    }
-                ],
-                "notes": "Handwritten prescription, challenging OCR case"
-            },
-            {
-                "sample_id": "prescription_3", 
-                "description": "Clinical prescription with doctor information",
-                "expected_doctor": {
-                    "name": "Dr. Sachin Mehta",
-                    "specialization": "Consultant",
-                    "registration_number": ""
-                },
-                "expected_patient": {
-                    "name": "Patient name from prescription",
-                    "age": None,
-                    "gender": ""
-                },
-                "expected_medicines": [
-                    {
-                        "name": "Gan Vi",
-                        "dosage": "32",
-                        "frequency": "bd",
-                        "duration": "as prescribed"
-                    }
-                ],
-                "notes": "Mixed handwritten and printed elements"
-            },
-            {
-                "sample_id": "prescription_4",
-                "description": "Dr. Abhishek Dubey prescription",
-                "expected_doctor": {
-                    "name": "Dr. Abhishek Dubey",
-                    "specialization": "M.B.B.S., M.D.",
-                    "registration_number": ""
-                },
-                "expected_patient": {
-                    "name": "Patient name if visible",
-                    "age": None,
-                    "gender": ""
-                },
-                "expected_medicines": [
-                    {
-                        "name": "Multiple medications from prescription",
-                        "dosage": "",
-                        "frequency": "",
-                        "duration": ""
-                    }
-                ],
-                "notes": "Professional letterhead with clear doctor credentials"
-            },
-            {
-                "sample_id": "prescription_5",
-                "description": "Additional prescription sample",
-                "expected_doctor": {
-                    "name": "Doctor name from prescription",
-                    "specialization": "",
-                    "registration_number": ""
-                },
-                "expected_patient": {
-                    "name": "Patient name if visible", 
-                    "age": None,
-                    "gender": ""
-                },
-                "expected_medicines": [
-                    {
-                        "name": "Medicine names from prescription",
-                        "dosage": "",
-                        "frequency": "",
-                        "duration": ""
-                    }
-                ],
-                "notes": "Additional sample for comprehensive training"
-            }
-        ]
-        
-        return training_data
+        return list(SAMPLE_TRAINING_DATA)
 
     def analyze_sample_images(self, image_paths: List[str]) -> List[Dict]:
         """
@@ -199,66 +233,121 @@ class PrescriptionTrainer:
             logger.warning("No image paths provided for analysis")
             return results
         
-        for i, image_path in enumerate(image_paths):
-            logger.info(f"Analyzing sample prescription {i+1}/{len(image_paths)}: {image_path}")
+        existing_paths = []
+        for image_path in image_paths:
+            if os.path.exists(image_path):
+                existing_paths.append(image_path)
+            else:
+                logger.warning("Image not found: %s", image_path)
+        
+        # Reuse results cached from earlier runs on byte-identical images
+        cached_results = {}
+        cache_keys = {}
+        for image_path in existing_paths:
+            cache_keys[image_path] = self._image_cache_key(image_path)
+            cached = self._load_cached_result(cache_keys[image_path]) if self.use_cache else None
+            if cached is not None:
+                cached_results[image_path] = {**cached, "image_path": image_path}
+        
+        # Images are independent and OCR-bound, so they are analyzed across worker processes
+        pending_paths = [image_path for image_path in existing_paths if image_path not in cached_results]
+        try:
+            analyses = dict(zip(pending_paths, self.analyzer.analyze_batch(pending_paths))) if pending_paths else {}
+        except Exception as e:
+            logger.error("❌ Error analyzing sample images: %s", e)
+            analyses = {}
+            for image_path in pending_paths:
+                cached_results[image_path] = {"image_path": image_path, "success": False, "error": str(e)}
+        
+        log_info = logger.info
+        info_enabled = logger.isEnabledFor(logging.INFO)
+        for i, image_path in enumerate(existing_paths):
+            if image_path in cached_results:
+                analysis_result = cached_results[image_path]
+                log_info("Reused cached analysis %d/%d: %s", i + 1, len(existing_paths), image_path)
+            else:
+                analysis_result = self._build_analysis_result(image_path, analyses[image_path])
+                log_info("Analyzed sample prescription %d/%d: %s", i + 1, len(existing_paths), image_path)
+                if analysis_result["success"]:
+                    self._store_cached_result(cache_keys[image_path], analysis_result)
             
-            if not os.path.exists(image_path):
-                logger.warning(f"Image not found: {image_path}")
+            results.append(analysis_result)
+            
+            if not analysis_result.get("success"):
+                logger.error("❌ Error analyzing %s: %s", image_path, analysis_result.get('error'))
                 continue
-                
-            try:
-                # Analyze the prescription
-                result = self.analyzer.analyze_prescription(image_path)
-                
-                analysis_result = {
-                    "image_path": image_path,
-                    "success": result.success,
-                    "prescription_id": result.prescription_id,
-                    "extracted_doctor": {
-                        "name": result.doctor.name,
-                        "specialization": result.doctor.specialization,
-                        "registration_number": result.doctor.registration_number
-                    },
-                    "extracted_patient": {
-                        "name": result.patient.name,
-                        "age": result.patient.age,
-                        "gender": result.patient.gender
-                    },
-                    "extracted_medicines": [
-                        {
-                            "name": med.name,
-                            "dosage": med.dosage,
-                            "frequency": med.frequency,
-                            "duration": med.duration
-                        } for med in result.medicines
-                    ],
-                    "confidence_score": result.confidence_score,
-                    "raw_text": result.raw_text[:500] + "..." if len(result.raw_text) > 500 else result.raw_text,
-                    "error": result.error if not result.success else None
-                }
-                
-                results.append(analysis_result)
-                
-                # Log key findings
-                logger.info(f"✓ Doctor detected: '{result.doctor.name}'")
-                logger.info(f"✓ Patient detected: '{result.patient.name}'")
-                logger.info(f"✓ Medicines count: {len(result.medicines)}")
-                if result.medicines:
-                    for med in result.medicines[:3]:  # Show first 3 medicines
-                        logger.info(f"  - {med.name} ({med.dosage})")
-                logger.info(f"✓ Confidence: {result.confidence_score:.2f}")
-                logger.info("-" * 60)
-                
-            except Exception as e:
-                logger.error(f"❌ Error analyzing {image_path}: {e}")
-                results.append({
-                    "image_path": image_path,
-                    "success": False,
-                    "error": str(e)
-                })
+            
+            # Log key findings, skipped entirely when INFO is silenced
+            if not info_enabled:
+                continue
+            medicines = analysis_result["extracted_medicines"]
+            log_info("✓ Doctor detected: '%s'", analysis_result['extracted_doctor']['name'])
+            log_info("✓ Patient detected: '%s'", analysis_result['extracted_patient']['name'])
+            log_info("✓ Medicines count: %d", len(medicines))
+            for med in medicines[:3]:  # Show first 3 medicines
+                log_info("  - %s (%s)", med['name'], med['dosage'])
+            log_info("✓ Confidence: %.2f", analysis_result['confidence_score'])
+            log_info("-" * 60)
         
         return results
 
+    def _build_analysis_result(self, image_path: str, result) -> Dict:
+        """
+        Report entry for one analyzed image
+        """
+        doctor, patient = result.doctor, result.patient
+        return {
+            "image_path": image_path,
+            "success": result.success,
+            "prescription_id": result.prescription_id,
+            "extracted_doctor": {
+                "name": doctor.name,
+                "specialization": doctor.specialization,
+                "registration_number": doctor.registration_number
+            },
+            "extracted_patient": {
+                "name": patient.name,
+                "age": patient.age,
+                "gender": patient.gender
+            },
+            "extracted_medicines": [
+                {
+                    "name": med.name,
+                    "dosage": med.dosage,
+                    "frequency": med.frequency,
+                    "duration": med.duration
+                } for med in result.medicines
+            ],
+            "confidence_score": result.confidence_score,
+            "raw_text": _truncate_text(result.raw_text, RAW_TEXT_PREVIEW_CHARS),
+            "error": result.error if not result.success else None
+        }
+
+    def _image_cache_key(self, image_path: str) -> str:
+        """
+        Cache key for an image: content hash tagged with the analyzer version and source hash
+        """
+        if self._analyzer_source_hash is None:
+            self._analyzer_source_hash = _file_hash(ANALYZER_SOURCE_PATH, digest_size=8)
+        return f"{ANALYZER_VERSION_TAG}_{self._analyzer_source_hash}_{_file_hash(image_path)}"
+
+    def _load_cached_result(self, cache_key: str) -> Optional[Dict]:
+        """
+        Cached analysis for the key, or None on a miss or unreadable entry
+        """
+        try:
+            with open(os.path.join(OCR_CACHE_DIR, f"{cache_key}.json"), 'rb') as f:
+                return orjson.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _store_cached_result(self, cache_key: str, analysis_result: Dict) -> None:
+        """
+        Save an analysis for reuse by later runs
+        """
+        os.makedirs(OCR_CACHE_DIR, exist_ok=True)
+        _write_atomic(os.path.join(OCR_CACHE_DIR, f"{cache_key}.json"), orjson.dumps(analysis_result, default=str))
+
     def generate_training_report(self, results: List[Dict], expected_data: List[Dict]) -> Dict:
         """
         Generate a comprehensive training report
@@ -267,110 +356,140 @@ class PrescriptionTrainer:
         if not os.path.exists("outputs"):
             os.makedirs("outputs")
             
-        successful_results = [r for r in results if r.get("success", False)]
+        stats = self._collect_stats(results)
+        successful = stats["successful"]
         
         report = {
             "timestamp": datetime.now().isoformat(),
-            "analyzer_version": "Enhanced Prescription Analyzer v1.0",
+            "analyzer_version": ANALYZER_VERSION,
             "summary": {
-                "total_samples": len(results),
-                "successful_analyses": len(successful_results),
-                "success_rate": len(successful_results) / len(results) if results else 0,
-                "average_confidence": sum(r.get("confidence_score", 0) for r in successful_results) / len(successful_results) if successful_results else 0,
-                "total_medicines_detected": sum(len(r.get("extracted_medicines", [])) for r in successful_results),
-                "average_medicines_per_prescription": sum(len(r.get("extracted_medicines", [])) for r in successful_results) / len(successful_results) if successful_results else 0
+                "total_samples": stats["total"],
+                "successful_analyses": successful,
+                "success_rate": successful / stats["total"] if stats["total"] else 0,
+                "average_confidence": stats["confidence_sum"] / successful if successful else 0,
+                "total_medicines_detected": stats["medicines"],
+                "average_medicines_per_prescription": stats["medicines"] / successful if successful else 0
             },
             "detailed_results": results,
-            "doctor_patient_analysis": self._analyze_doctor_patient_detection(results),
-            "medicine_analysis": self._analyze_medicine_detection(results),
-            "recommendations": self._generate_recommendations(results)
+            "doctor_patient_analysis": self._analyze_doctor_patient_detection(stats),
+            "medicine_analysis": self._analyze_medicine_detection(stats),
+            "recommendations": self._generate_recommendations(stats)
         }
         
         # Save report
         output_file = os.path.join("outputs", f"training_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, default=str, ensure_ascii=False)
+        _write_atomic(output_file, orjson.dumps(report, default=str, option=orjson.OPT_INDENT_2))
             
-        logger.info(f"Training report saved to: {output_file}")
+        logger.info("Training report saved to: %s", output_file)
         return report
 
-    def _analyze_doctor_patient_detection(self, results: List[Dict]) -> Dict:
+    def _collect_stats(self, results: List[Dict]) -> Dict:
+        """
+        Detection counters for all report sections, gathered in one pass over the successful results
+        """
+        stats = {
+            "total": len(results), "successful": 0, "confidence_sum": 0,
+            "doctors_detected": 0, "doctors_with_specialization": 0, "doctors_with_license": 0,
+            "patients_detected": 0, "patients_with_age": 0, "patients_with_gender": 0,
+            "medicines": 0, "medicines_with_dosage": 0, "medicines_with_frequency": 0,
+            "medicines_with_duration": 0
+        }
+        unique_medicines = set()
+        
+        for r in results:
+            if not r.get("success", False):
+                continue
+            stats["successful"] += 1
+            stats["confidence_sum"] += r.get("confidence_score", 0)
+            
+            doctor = r.get("extracted_doctor", {})
+            stats["doctors_detected"] += bool(doctor.get("name"))
+            stats["doctors_with_specialization"] += bool(doctor.get("specialization"))
+            stats["doctors_with_license"] += bool(doctor.get("registration_number"))
+            
+            patient = r.get("extracted_patient", {})
+            stats["patients_detected"] += bool(patient.get("name"))
+            stats["patients_with_age"] += bool(patient.get("age"))
+            stats["patients_with_gender"] += bool(patient.get("gender"))
+            
+            medicines = r.get("extracted_medicines", [])
+            stats["medicines"] += len(medicines)
+            for med in medicines:
+                stats["medicines_with_dosage"] += bool(med.get("dosage"))
+                stats["medicines_with_frequency"] += bool(med.get("frequency"))
+                stats["medicines_with_duration"] += bool(med.get("duration"))
+                name = med.get("name")
+                if name:
+                    unique_medicines.add(name.lower())
+        
+        stats["unique_medicines"] = unique_medicines
+        return stats
+
+    def _analyze_doctor_patient_detection(self, stats: Dict) -> Dict:
         """
         Analyze doctor and patient detection performance
         """
-        successful_results = [r for r in results if r.get("success", False)]
+        successful = stats["successful"]
         
         doctor_detection = {
-            "doctors_detected": sum(1 for r in successful_results if r.get("extracted_doctor", {}).get("name")),
-            "doctors_with_specialization": sum(1 for r in successful_results if r.get("extracted_doctor", {}).get("specialization")),
-            "doctors_with_license": sum(1 for r in successful_results if r.get("extracted_doctor", {}).get("registration_number")),
-            "detection_rate": 0
+            "doctors_detected": stats["doctors_detected"],
+            "doctors_with_specialization": stats["doctors_with_specialization"],
+            "doctors_with_license": stats["doctors_with_license"],
+            "detection_rate": stats["doctors_detected"] / successful if successful else 0
         }
         
         patient_detection = {
-            "patients_detected": sum(1 for r in successful_results if r.get("extracted_patient", {}).get("name")),
-            "patients_with_age": sum(1 for r in successful_results if r.get("extracted_patient", {}).get("age")),
-            "patients_with_gender": sum(1 for r in successful_results if r.get("extracted_patient", {}).get("gender")),
-            "detection_rate": 0
+            "patients_detected": stats["patients_detected"],
+            "patients_with_age": stats["patients_with_age"],
+            "patients_with_gender": stats["patients_with_gender"],
+            "detection_rate": stats["patients_detected"] / successful if successful else 0
         }
         
-        if successful_results:
-            doctor_detection["detection_rate"] = doctor_detection["doctors_detected"] / len(successful_results)
-            patient_detection["detection_rate"] = patient_detection["patients_detected"] / len(successful_results)
-        
         return {
             "doctor_detection": doctor_detection,
             "patient_detection": patient_detection
         }
 
-    def _analyze_medicine_detection(self, results: List[Dict]) -> Dict:
+    def _analyze_medicine_detection(self, stats: Dict) -> Dict:
         """
         Analyze medicine detection performance
         """
-        successful_results = [r for r in results if r.get("success", False)]
-        
-        all_medicines = []
-        for result in successful_results:
-            all_medicines.extend(result.get("extracted_medicines", []))
+        successful = stats["successful"]
         
         medicine_analysis = {
-            "total_medicines": len(all_medicines),
-            "medicines_with_dosage": sum(1 for med in all_medicines if med.get("dosage")),
-            "medicines_with_frequency": sum(1 for med in all_medicines if med.get("frequency")),
-            "medicines_with_duration": sum(1 for med in all_medicines if med.get("duration")),
-            "average_per_prescription": len(all_medicines) / len(successful_results) if successful_results else 0,
-            "unique_medicines": list(set(med.get("name", "").lower() for med in all_medicines if med.get("name")))
+            "total_medicines": stats["medicines"],
+            "medicines_with_dosage": stats["medicines_with_dosage"],
+            "medicines_with_frequency": stats["medicines_with_frequency"],
+            "medicines_with_duration": stats["medicines_with_duration"],
+            "average_per_prescription": stats["medicines"] / successful if successful else 0,
+            "unique_medicines": list(stats["unique_medicines"])
         }
         
         return medicine_analysis
 
-    def _generate_recommendations(self, results: List[Dict]) -> List[str]:
+    def _generate_recommendations(self, stats: Dict) -> List[str]:
         """
         Generate recommendations based on results
         """
         recommendations = []
-        successful_results = [r for r in results if r.get("success", False)]
+        successful = stats["successful"]
         
-        success_rate = len(successful_results) / len(results) if results else 0
+        success_rate = successful / stats["total"] if stats["total"] else 0
         
         if success_rate < 0.8:
             recommendations.append("Consider improving image preprocessing for better OCR accuracy")
             
-        if successful_results:
-            avg_confidence = sum(r.get("confidence_score", 0) for r in successful_results) / len(successful_results)
-            if avg_confidence < 0.6:
+        if successful:
+            if stats["confidence_sum"] / successful < 0.6:
                 recommendations.append("Low confidence scores indicate need for better text extraction methods")
                 
-            doctor_detection_rate = sum(1 for r in successful_results if r.get("extracted_doctor", {}).get("name")) / len(successful_results)
-            if doctor_detection_rate < 0.7:
+            if stats["doctors_detected"] / successful < 0.7:
                 recommendations.append("Improve doctor name detection patterns and medical title recognition")
                 
-            patient_detection_rate = sum(1 for r in successful_results if r.get("extracted_patient", {}).get("name")) / len(successful_results)
-            if patient_detection_rate < 0.5:
+            if stats["patients_detected"] / successful < 0.5:
                 recommendations.append("Enhance patient name extraction and context recognition")
                 
-            avg_medicines = sum(len(r.get("extracted_medicines", [])) for r in successful_results) / len(successful_results)
-            if avg_medicines < 1.5:
+            if stats["medicines"] / successful < 1.5:
                 recommendations.append("Improve medicine name extraction from handwritten prescriptions")
         
         if not recommendations:
@@ -378,24 +497,23 @@ class PrescriptionTrainer:
             
         return recommendations
 
-
 def main():
     """
     Main training and evaluation function
     """
+    parser = argparse.ArgumentParser(description="Train and evaluate the prescription analyzer on sample images")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="analyze every image again instead of reusing results cached in " + OCR_CACHE_DIR)
+    args = parser.parse_args()
+    
     print("\n" + "="*80)
     print("ENHANCED PRESCRIPTION ANALYZER TRAINING")
     print("="*80)
     
     try:
-        # Initialize the analyzer (allowing fallback if no API key)
-        logger.info("Initializing Enhanced Prescription Analyzer...")
-        analyzer = EnhancedPrescriptionAnalyzer(force_api=False)
-        trainer = PrescriptionTrainer(analyzer)
-        
         # Get sample image paths
         logger.info("Looking for sample prescription images...")
-        image_paths = trainer.get_sample_image_paths()
+        image_paths = PrescriptionTrainer.get_sample_image_paths()
         
         if not image_paths:
             print("\n❌ NO PRESCRIPTION IMAGES FOUND!")
@@ -406,6 +524,19 @@ def main():
             print("\nAlternatively, place images with 'prescription' in the filename in the current directory.")
             return
         
+        # Make sure to import your enhanced analyzer
+        try:
+            from prescription_analyzer import EnhancedPrescriptionAnalyzer
+        except ImportError as e:
+            print(f"Error importing EnhancedPrescriptionAnalyzer: {e}")
+            print("Make sure prescription_analyzer.py is in the same directory")
+            exit(1)
+        
+        # Initialize the analyzer (allowing fallback if no API key)
+        logger.info("Initializing Enhanced Prescription Analyzer...")
+        analyzer = EnhancedPrescriptionAnalyzer(force_api=False)
+        trainer = PrescriptionTrainer(analyzer, use_cache=not args.no_cache)
+        
         # Create expected training data
         expected_data = trainer.create_training_data_from_samples()
         
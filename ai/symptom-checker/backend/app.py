@@ -1,31 +1,118 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, abort
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
-import json
+import gzip
+import hashlib
+import hmac
+import orjson
 import os
 import joblib
-import numpy as np
 import pandas as pd
-from ml_symptom_analysis import MLSymptomAnalyzer
+from ml_symptom_analysis import MLSymptomAnalyzer, ONNXModel, top_k_indices
 import traceback
 
+# Same key ordering as Flask's default provider, plus numpy values and non-string keys
+ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider encoding with orjson; jsonify() responses skip the str round trip"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=ORJSON_OPTIONS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=ORJSON_OPTIONS), mimetype="application/json")
+
+class CachedJSONResponse:
+    """
+    JSON body for data that only changes on reload, serialized and gzipped once
+    Answers conditional requests with 304 and sends the gzipped bytes to clients accepting them
+    """
+    
+    CACHE_CONTROL = 'public, max-age=3600'
+    
+    def __init__(self, payload):
+        self.body = orjson.dumps(payload, option=ORJSON_OPTIONS)
+        self.etag = hashlib.blake2b(self.body, digest_size=8).hexdigest()
+        self.gzip_body = gzip.compress(self.body, compresslevel=6, mtime=0)
+        # The gzipped bytes are a different representation, so they get their own validator
+        self.gzip_etag = f'{self.etag}-gzip'
+    
+    def respond(self):
+        use_gzip = 'gzip' in request.accept_encodings
+        etag = self.gzip_etag if use_gzip else self.etag
+        
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(self.gzip_body if use_gzip else self.body, mimetype='application/json')
+            if use_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+        
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = self.CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+# Symptom requests are a few hundred bytes; bound what the JSON parser is ever handed
+app.config['MAX_CONTENT_LENGTH'] = 64 * 1024
 CORS(app)  # Enable CORS for React frontend
 
 # Model and data paths
 MODEL_DIR = 'models'
 BEST_MODEL_PATH = f'{MODEL_DIR}/best_model.pkl'
+BEST_MODEL_ONNX_PATH = f'{MODEL_DIR}/best_model.onnx'
 SYMPTOM_COLUMNS_PATH = f'{MODEL_DIR}/symptom_columns.json'
 DISEASE_LIST_PATH = f'{MODEL_DIR}/disease_list.json'
 DATASET_PATH = 'database/disease-symptom_dataset.json'
+DESCRIPTIONS_PATH = f'{MODEL_DIR}/symptom_descriptions.json'
+PRECAUTIONS_PATH = f'{MODEL_DIR}/precautions.json'
+SEVERITY_PATH = f'{MODEL_DIR}/symptom_severity.json'
+
+# Shared secret for POST /reload, sent as "Authorization: Bearer <token>"; unset disables the endpoint
+RELOAD_TOKEN = os.environ.get('RELOAD_TOKEN')
+
+# Memory-map the model's numpy arrays instead of copying them into each process;
+# with gunicorn --preload the workers share the same page-cache pages
+MODEL_MMAP_MODE = 'r'
+
+def prefetch_file(path):
+    """Ask the kernel to start reading a file into the page cache ahead of use"""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+def read_json_file(path):
+    """Parsed contents of a JSON file, or None if it does not exist"""
+    try:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
 
 class MedicalSymptomChecker:
     def __init__(self):
         self.model = None
+        self.inference_model = None
         self.symptom_columns = []
         self.disease_list = []
         self.dataset = {}
         self.analyzer = None
         self.model_info = {}
+        self.descriptions = {}
+        self.precautions = {}
+        self.severity = {}
+        self.build_cached_responses()
         
         self.load_all_data()
     
@@ -34,46 +121,69 @@ class MedicalSymptomChecker:
         try:
             # Load trained model
             if os.path.exists(BEST_MODEL_PATH):
-                self.model = joblib.load(BEST_MODEL_PATH)
+                prefetch_file(BEST_MODEL_PATH)
+                self.model = joblib.load(BEST_MODEL_PATH, mmap_mode=MODEL_MMAP_MODE)
                 print(f"✅ Loaded trained model from {BEST_MODEL_PATH}")
             else:
                 print(f"❌ Model not found at {BEST_MODEL_PATH}")
                 return False
             
+            # Compiled copy of the model for serving, skipped if older than the pickle it was exported from
+            self.inference_model = None
+            if (os.path.exists(BEST_MODEL_ONNX_PATH)
+                    and os.path.getmtime(BEST_MODEL_ONNX_PATH) >= os.path.getmtime(BEST_MODEL_PATH)):
+                try:
+                    self.inference_model = ONNXModel(BEST_MODEL_ONNX_PATH)
+                    print(f"✅ Loaded ONNX model from {BEST_MODEL_ONNX_PATH}")
+                except ImportError:
+                    print("⚠️ onnxruntime not installed, predicting with scikit-learn")
+            
             # Load symptom columns
-            if os.path.exists(SYMPTOM_COLUMNS_PATH):
-                with open(SYMPTOM_COLUMNS_PATH, 'r') as f:
-                    self.symptom_columns = json.load(f)
+            symptom_columns = read_json_file(SYMPTOM_COLUMNS_PATH)
+            if symptom_columns is not None:
+                self.symptom_columns = symptom_columns
                 print(f"✅ Loaded {len(self.symptom_columns)} symptom columns")
             
             # Load disease list
-            if os.path.exists(DISEASE_LIST_PATH):
-                with open(DISEASE_LIST_PATH, 'r') as f:
-                    self.disease_list = json.load(f)
+            disease_list = read_json_file(DISEASE_LIST_PATH)
+            if disease_list is not None:
+                self.disease_list = disease_list
                 print(f"✅ Loaded {len(self.disease_list)} diseases")
             
             # Load JSON dataset
-            if os.path.exists(DATASET_PATH):
-                with open(DATASET_PATH, 'r') as f:
-                    self.dataset = json.load(f)
+            dataset = read_json_file(DATASET_PATH)
+            if dataset is not None:
+                self.dataset = dataset
                 print(f"✅ Loaded dataset with {len(self.dataset)} diseases")
             
             # Load model info
-            model_info_path = f'{MODEL_DIR}/model_info.json'
-            if os.path.exists(model_info_path):
-                with open(model_info_path, 'r') as f:
-                    self.model_info = json.load(f)
+            model_info = read_json_file(f'{MODEL_DIR}/model_info.json')
+            if model_info is not None:
+                self.model_info = model_info
                 print(f"✅ Loaded model info")
             
-            # Initialize ML analyzer
+            # Load disease details served by the info endpoints
+            for attr, path in (('descriptions', DESCRIPTIONS_PATH), ('precautions', PRECAUTIONS_PATH),
+                               ('severity', SEVERITY_PATH)):
+                data = read_json_file(path)
+                if data is not None:
+                    setattr(self, attr, data)
+                    print(f"✅ Loaded {len(data)} {attr} entries")
+            
+            # Initialize ML analyzer; the one it replaces on reload has its worker stopped
+            previous_analyzer = self.analyzer
             self.analyzer = MLSymptomAnalyzer(
                 model=self.model,
                 symptom_columns=self.symptom_columns,
                 disease_list=self.disease_list,
                 dataset=self.dataset,
-                model_dir=MODEL_DIR
+                model_dir=MODEL_DIR,
+                inference_model=self.inference_model
             )
+            if previous_analyzer is not None:
+                previous_analyzer.close()
             
+            self.build_cached_responses()
             return True
             
         except Exception as e:
@@ -81,9 +191,53 @@ class MedicalSymptomChecker:
             traceback.print_exc()
             return False
 
+    def build_cached_responses(self):
+        """Serialize the symptom and disease listings, which only change when data is reloaded"""
+        symptoms_data = []
+        for i, symptom in enumerate(self.symptom_columns):
+            clean_symptom = symptom.replace('_', ' ')
+            symptoms_data.append({
+                "id": i + 1,
+                "symptom_name": clean_symptom,
+                "original_name": symptom,
+                "category": "medical"
+            })
+        
+        self.symptoms_response = CachedJSONResponse({
+            "symptoms": symptoms_data,
+            "total": len(symptoms_data)
+        })
+        
+        diseases_data = []
+        for i, disease in enumerate(self.disease_list):
+            disease_info = {
+                "id": i + 1,
+                "disease_name": disease,
+                "description": self.descriptions.get(disease, "No description available"),
+                "has_precautions": disease in self.precautions
+            }
+            
+            # Add symptoms if available in dataset
+            if disease in self.dataset:
+                disease_info["common_symptoms"] = self.dataset[disease][:5]  # Top 5 symptoms
+                disease_info["total_symptoms"] = len(self.dataset[disease])
+            
+            diseases_data.append(disease_info)
+        
+        self.diseases_response = CachedJSONResponse({
+            "diseases": diseases_data,
+            "total": len(diseases_data)
+        })
+
 # Initialize the medical system
 medical_system = MedicalSymptomChecker()
 
+@app.before_request
+def reject_oversized_body():
+    """Answer 413 before reading a body declared larger than the limit"""
+    if request.content_length is not None and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        abort(413)
+
 @app.route('/')
 def home():
     """Home endpoint with system information"""
@@ -101,7 +255,8 @@ def home():
             "symptoms": "/symptoms",
             "diseases": "/diseases",
             "disease_info": "/disease/<disease_name>",
-            "health": "/health"
+            "health": "/health",
+            "reload": "/reload"
         }
     })
 
@@ -164,29 +319,30 @@ def predict_disease():
         # Create feature vector
         feature_vector = medical_system.analyzer.create_feature_vector(symptoms)
         
-        # Get prediction and probabilities
-        prediction = medical_system.model.predict([feature_vector])[0]
+        # Get prediction and probabilities, batched with concurrent requests
+        prediction, proba = medical_system.analyzer.predictor.predict(feature_vector)
         
         # Get prediction probabilities if available
         probabilities = None
-        if hasattr(medical_system.model, 'predict_proba'):
-            proba = medical_system.model.predict_proba([feature_vector])[0]
+        confidence = None
+        if proba is not None:
             # Get top 5 predictions with probabilities
-            top_indices = np.argsort(proba)[-5:][::-1]
+            top_indices = top_k_indices(proba)
+            confidence = float(proba[top_indices[0]])
             probabilities = [
                 {
                     "disease": medical_system.disease_list[i],
                     "probability": float(proba[i])
                 }
-                for i in top_indices
+                for i in top_indices.tolist()
             ]
         
         return jsonify({
             "prediction": prediction,
-            "confidence": float(max(proba)) if probabilities else None,
+            "confidence": confidence,
             "top_predictions": probabilities,
             "input_symptoms": symptoms,
-            "matched_features": sum(feature_vector)
+            "matched_features": int(feature_vector.sum())
         })
         
     except Exception as e:
@@ -197,20 +353,7 @@ def predict_disease():
 def get_symptoms():
     """Get all available symptoms"""
     try:
-        symptoms_data = []
-        for i, symptom in enumerate(medical_system.symptom_columns):
-            clean_symptom = symptom.replace('_', ' ')
-            symptoms_data.append({
-                "id": i + 1,
-                "symptom_name": clean_symptom,
-                "original_name": symptom,
-                "category": "medical"
-            })
-        
-        return jsonify({
-            "symptoms": symptoms_data,
-            "total": len(symptoms_data)
-        })
+        return medical_system.symptoms_response.respond()
         
     except Exception as e:
         print(f"❌ Error in get_symptoms: {str(e)}")
@@ -220,41 +363,7 @@ def get_symptoms():
 def get_diseases():
     """Get all available diseases with basic information"""
     try:
-        diseases_data = []
-        
-        # Load additional info if available
-        descriptions = {}
-        precautions = {}
-        
-        desc_path = f'{MODEL_DIR}/symptom_descriptions.json'
-        if os.path.exists(desc_path):
-            with open(desc_path, 'r') as f:
-                descriptions = json.load(f)
-        
-        prec_path = f'{MODEL_DIR}/precautions.json'
-        if os.path.exists(prec_path):
-            with open(prec_path, 'r') as f:
-                precautions = json.load(f)
-        
-        for i, disease in enumerate(medical_system.disease_list):
-            disease_info = {
-                "id": i + 1,
-                "disease_name": disease,
-                "description": descriptions.get(disease, "No description available"),
-                "has_precautions": disease in precautions
-            }
-            
-            # Add symptoms if available in dataset
-            if disease in medical_system.dataset:
-                disease_info["common_symptoms"] = medical_system.dataset[disease][:5]  # Top 5 symptoms
-                disease_info["total_symptoms"] = len(medical_system.dataset[disease])
-            
-            diseases_data.append(disease_info)
-        
-        return jsonify({
-            "diseases": diseases_data,
-            "total": len(diseases_data)
-        })
+        return medical_system.diseases_response.respond()
         
     except Exception as e:
         print(f"❌ Error in get_diseases: {str(e)}")
@@ -269,21 +378,16 @@ def get_disease_info(disease_name):
         
         disease_info = {"disease_name": disease_name}
         
-        # Load all available information
-        info_files = {
-            'description': f'{MODEL_DIR}/symptom_descriptions.json',
-            'precautions': f'{MODEL_DIR}/precautions.json',
-            'severity': f'{MODEL_DIR}/symptom_severity.json'
+        # Add all available information, loaded once at startup
+        info_sources = {
+            'description': medical_system.descriptions,
+            'precautions': medical_system.precautions,
+            'severity': medical_system.severity
         }
         
-        for key, file_path in info_files.items():
-            if os.path.exists(file_path):
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
-                    if key == 'precautions' and disease_name in data:
-                        disease_info[key] = data[disease_name]
-                    elif key != 'precautions' and disease_name in data:
-                        disease_info[key] = data[disease_name]
+        for key, data in info_sources.items():
+            if disease_name in data:
+                disease_info[key] = data[disease_name]
         
         # Add symptoms from dataset
         if disease_name in medical_system.dataset:
@@ -327,6 +431,30 @@ def health_check():
             "error": str(e)
         }), 500
 
+@app.route('/reload', methods=['POST'])
+def reload_data():
+    """
+    Re-read the model and disease data files without restarting the server
+    Only the process handling the request reloads: under gunicorn each worker must be reloaded
+    on its own, or the server restarted (a HUP re-forks workers from the --preload master, which
+    still holds the data it loaded at startup)
+    """
+    if not RELOAD_TOKEN:
+        abort(404)
+    scheme, _, supplied = request.headers.get('Authorization', '').partition(' ')
+    if scheme != 'Bearer' or not hmac.compare_digest(supplied.strip().encode(), RELOAD_TOKEN.encode()):
+        abort(403)
+    
+    try:
+        loaded = medical_system.load_all_data()
+        return jsonify({
+            "reloaded": bool(loaded),
+            "total_diseases": len(medical_system.disease_list),
+            "total_symptoms": len(medical_system.symptom_columns)
+        }), 200 if loaded else 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/retrain', methods=['POST'])
 def retrain_model():
     """Endpoint to trigger model retraining (if needed)"""
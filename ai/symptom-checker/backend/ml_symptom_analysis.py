@@ -2,19 +2,230 @@ import numpy as np
 import pandas as pd
 import json
 import re
-from typing import List, Dict, Any, Optional
+import functools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Dict, Any, Optional, Tuple
 from difflib import SequenceMatcher
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
 import logging
 
+# Minimum similarity for a user symptom to count as a model symptom
+SIMILARITY_THRESHOLD = 0.7
+
+# Distinct (symptoms, age, gender, duration) analyses kept for repeated queries
+ANALYSIS_CACHE_SIZE = 4096
+# Distinct user symptom strings whose matching model columns are remembered
+SYMPTOM_MATCH_CACHE_SIZE = 10000
+
+# Concurrent predictions are coalesced into batches of at most this many rows,
+# waiting at most this long for a batch to fill
+PREDICT_MAX_BATCH = 64
+PREDICT_MAX_WAIT = 0.005
+
+def _phrase_pattern(phrases: List[str]) -> "re.Pattern":
+    """Regex finding any of the phrases (lowercased) in one pass; matches nothing for no phrases"""
+    return re.compile('|'.join(re.escape(phrase.lower()) for phrase in phrases) or r'(?!)')
+
+# Symptom text splitting and cleanup patterns
+SYMPTOM_SPLIT_RE = re.compile(r'[,;]|(?:\s+and\s+)|(?:\s+&\s+)|(?:\s+\+\s+)')
+SYMPTOM_PREFIX_RE = re.compile(r'^(?:i\s+have\s+|i\s+am\s+|experiencing\s+|feeling\s+|my\s+|the\s+)')
+SYMPTOM_SUFFIX_RE = re.compile(r'\s+(?:for\s+|since\s+|lasting\s+).*$')
+
+# Keyword groups checked against lowercased symptom and duration text
+AGE_RISK_SYMPTOMS_RE = _phrase_pattern(['fever', 'difficulty breathing', 'chest pain'])
+LONG_DURATION_RE = _phrase_pattern(['week', 'weeks', 'month', 'months'])
+SEVERITY_WORDS_RE = _phrase_pattern(['severe', 'intense', 'unbearable', 'worsening'])
+FEVER_TERMS_RE = _phrase_pattern(['fever', 'temperature', 'hot'])
+COUGH_TERMS_RE = _phrase_pattern(['cough', 'throat'])
+HEADACHE_TERMS_RE = _phrase_pattern(['headache', 'head pain'])
+NAUSEA_TERMS_RE = _phrase_pattern(['nausea', 'stomach', 'vomiting'])
+PAIN_TERMS_RE = _phrase_pattern(['pain', 'ache'])
+
+# Recommendation texts, built once instead of on every generate_recommendations call
+URGENCY_RECOMMENDATIONS = {
+    "EMERGENCY": (
+        "🚨 Call emergency services (911/108) immediately",
+        "🏥 Go to the nearest emergency room",
+        "👥 Have someone accompany you if possible",
+        "📝 Bring a list of current medications"
+    ),
+    "HIGH": (
+        "📞 Contact your doctor or urgent care center today",
+        "📋 Monitor symptoms closely and note any changes",
+        "🚨 Seek immediate care if symptoms worsen",
+        "💊 Bring current medications list to appointment"
+    )
+}
+# General health recommendations for every other urgency level
+GENERAL_RECOMMENDATIONS = (
+    "💧 Stay well hydrated with water",
+    "😴 Get adequate rest and sleep",
+    "🌡️ Monitor symptoms and keep a symptom diary"
+)
+SYMPTOM_RECOMMENDATIONS = (
+    (FEVER_TERMS_RE, (
+        "🌡️ Monitor temperature regularly",
+        "🧊 Apply cool compresses to reduce fever",
+        "💊 Consider acetaminophen or ibuprofen as directed"
+    )),
+    (COUGH_TERMS_RE, (
+        "🍯 Try warm honey and lemon for throat relief",
+        "💨 Use a humidifier to add moisture to air",
+        "🚭 Avoid smoke and irritants"
+    )),
+    (HEADACHE_TERMS_RE, (
+        "🧊 Apply cold compress to forehead",
+        "😌 Rest in a quiet, dark room",
+        "💧 Stay hydrated and avoid triggers"
+    )),
+    (NAUSEA_TERMS_RE, (
+        "🍞 Try bland foods like toast or crackers",
+        "🥤 Sip clear fluids slowly",
+        "🚫 Avoid spicy, fatty, or dairy foods"
+    ))
+)
+
+def top_k_indices(proba: np.ndarray, k: int = 5) -> np.ndarray:
+    """Indices of the k largest probabilities, highest first, without sorting every class"""
+    k = min(k, len(proba))
+    top = np.argpartition(proba, -k)[-k:]
+    return top[np.argsort(proba[top])[::-1]]
+
+class BatchPredictor:
+    """Coalesces concurrent single-sample predictions into one vectorized model call"""
+    
+    def __init__(self, model, max_batch: int = PREDICT_MAX_BATCH, max_wait: float = PREDICT_MAX_WAIT):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+    
+    def predict(self, feature_vector: np.ndarray) -> Tuple[Any, Optional[np.ndarray]]:
+        """Prediction and class probabilities (None without predict_proba) for one feature vector"""
+        future = Future()
+        with self._lock:
+            queued = not self._closed
+            if queued:
+                self._queue.put((feature_vector, future))
+                self._ensure_worker()
+        if not queued:
+            # Requests still holding a replaced analyzer are answered without restarting the worker
+            self._predict_batch([(feature_vector, future)])
+        return future.result()
+    
+    def close(self):
+        """Stop the worker once it has answered the requests already queued"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(None)
+    
+    def _ensure_worker(self):
+        # Started on first use so a process forked after import gets its own worker; caller holds the lock
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="batch-predictor", daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            closing = False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            
+            self._predict_batch(batch)
+            if closing:
+                return
+    
+    def _predict_batch(self, batch):
+        """Run the model once over (feature vector, future) pairs and resolve their futures"""
+        try:
+            features = np.stack([feature_vector for feature_vector, _ in batch])
+            if hasattr(self.model, 'predict_and_proba'):
+                predictions, probabilities = self.model.predict_and_proba(features)
+            elif hasattr(self.model, 'predict_proba'):
+                predictions = self.model.predict(features)
+                probabilities = self.model.predict_proba(features)
+            else:
+                predictions = self.model.predict(features)
+                probabilities = [None] * len(batch)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        
+        for (_, future), prediction, proba in zip(batch, predictions, probabilities):
+            future.set_result((prediction, proba))
+
+class ONNXModel:
+    """
+    Classifier exported by model_trainer.py to ONNX, run with onnxruntime
+    Exposes the predict/predict_proba interface of the scikit-learn model it was converted from
+    """
+    
+    def __init__(self, path: str):
+        import onnxruntime
+        
+        options = onnxruntime.SessionOptions()
+        # Each batch is small and server workers already use every core
+        options.intra_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+    
+    def predict_and_proba(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Labels and class probabilities from a single session run"""
+        labels, probabilities = self.session.run(None, {self.input_name: features.astype(np.float32)})
+        return labels, probabilities
+    
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return self.predict_and_proba(features)[0]
+    
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        return self.predict_and_proba(features)[1]
+
 class MLSymptomAnalyzer:
     """Enhanced ML-powered symptom analysis system"""
     
-    def __init__(self, model=None, symptom_columns=None, disease_list=None, dataset=None, model_dir='models'):
+    def __init__(self, model=None, symptom_columns=None, disease_list=None, dataset=None, model_dir='models',
+                 inference_model=None):
         self.model = model
         self.symptom_columns = symptom_columns or []
         self.disease_list = disease_list or []
         self.dataset = dataset or {}
         self.model_dir = model_dir
+        # Predictions go through the compiled inference model when one was loaded alongside the model
+        self.predictor = BatchPredictor(inference_model or model) if model is not None else None
+        # Per-instance and thread-safe, so a reloaded analyzer starts with an empty cache
+        self._cached_analysis = functools.lru_cache(maxsize=ANALYSIS_CACHE_SIZE)(self._analyze_symptom_list)
+        self._matching_columns = functools.lru_cache(maxsize=SYMPTOM_MATCH_CACHE_SIZE)(self._match_symptom)
+        
+        # Model symptom names in the form user input is compared against, with their
+        # lengths for bounding SequenceMatcher scores; computed once
+        self._clean_symptom_columns = [column.replace('_', ' ').lower() for column in self.symptom_columns]
+        self._clean_symptom_lengths = np.array([len(column) for column in self._clean_symptom_columns])
+        # SequenceMatcher caches its second sequence, so each thread reuses one matcher per model symptom
+        self._matchers = threading.local()
         
         # Emergency and high-risk symptoms
         self.emergency_symptoms = [
@@ -30,6 +241,10 @@ class MLSymptomAnalyzer:
             'rapid weight loss', 'persistent cough with blood', 'severe diarrhea'
         ]
         
+        # Each list scanned in a single regex pass instead of one substring test per phrase
+        self._emergency_re = _phrase_pattern(self.emergency_symptoms)
+        self._high_risk_re = _phrase_pattern(self.high_risk_symptoms)
+        
         # Age and gender risk factors
         self.age_risk_factors = {
             'elderly': ['heart disease', 'stroke', 'diabetes complications', 'pneumonia'],
@@ -49,39 +264,71 @@ class MLSymptomAnalyzer:
         symptom_text = symptom_text.lower().strip()
         
         # Split by common separators
-        symptoms = re.split(r'[,;]|(?:\s+and\s+)|(?:\s+&\s+)|(?:\s+\+\s+)', symptom_text)
+        symptoms = SYMPTOM_SPLIT_RE.split(symptom_text)
         
         cleaned_symptoms = []
         for symptom in symptoms:
             # Remove common prefixes and suffixes
-            symptom = re.sub(r'^(?:i\s+have\s+|i\s+am\s+|experiencing\s+|feeling\s+|my\s+|the\s+)', '', symptom.strip())
-            symptom = re.sub(r'\s+(?:for\s+|since\s+|lasting\s+).*$', '', symptom)
+            symptom = SYMPTOM_PREFIX_RE.sub('', symptom.strip())
+            symptom = SYMPTOM_SUFFIX_RE.sub('', symptom)
             
             if symptom and len(symptom.strip()) > 2:
                 cleaned_symptoms.append(symptom.strip())
         
-        return list(set(cleaned_symptoms))  # Remove duplicates
+        return list(dict.fromkeys(cleaned_symptoms))  # Remove duplicates, keeping input order
     
-    def create_feature_vector(self, user_symptoms: List[str]) -> List[int]:
-        """Create binary feature vector for ML model"""
+    def create_feature_vector(self, user_symptoms: List[str]) -> np.ndarray:
+        """Create binary int8 feature vector for ML model"""
+        feature_vector = np.zeros(len(self.symptom_columns), dtype=np.int8)
         if not self.symptom_columns:
-            return []
+            return feature_vector
         
-        feature_vector = [0] * len(self.symptom_columns)
-        
-        for i, model_symptom in enumerate(self.symptom_columns):
-            # Clean model symptom for comparison
-            clean_model_symptom = model_symptom.replace('_', ' ').lower()
-            
-            # Check if any user symptom matches
-            for user_symptom in user_symptoms:
-                similarity = self.calculate_similarity(user_symptom.lower(), clean_model_symptom)
-                if similarity > 0.7:  # Threshold for match
-                    feature_vector[i] = 1
-                    break
+        # Matches depend only on the symptom text, and users keep naming the same few symptoms
+        for user_symptom in user_symptoms:
+            feature_vector[self._matching_columns(user_symptom.lower())] = 1
         
         return feature_vector
     
+    def close(self):
+        """Stop the prediction worker, releasing the model once this analyzer is replaced"""
+        if self.predictor is not None:
+            self.predictor.close()
+    
+    def _match_symptom(self, user_symptom: str) -> np.ndarray:
+        """Indices of the model columns a lowercased user symptom matches"""
+        columns = self._clean_symptom_columns
+        lengths = self._clean_symptom_lengths
+        matchers = getattr(self._matchers, 'columns', None)
+        if matchers is None:
+            matchers = self._matchers.columns = [None] * len(columns)
+        
+        # SequenceMatcher's matching blocks form a common subsequence, so its ratio never exceeds
+        # 2*LCS/(total length), and a substring match needs the whole shorter string as the LCS.
+        # One native cdist call gives the LCS against every column, leaving only the few that can match
+        distances = process.cdist([user_symptom], columns, scorer=Indel.distance, dtype=np.int32)[0]
+        shared = (lengths + len(user_symptom) - distances) // 2
+        within_bound = 2 * shared >= SIMILARITY_THRESHOLD * (lengths + len(user_symptom))
+        contained = (shared == lengths) | (shared == len(user_symptom))
+        
+        candidates = np.flatnonzero(within_bound | contained)
+        matched = []
+        for i, bounded in zip(candidates.tolist(), within_bound[candidates].tolist()):
+            clean_model_symptom = columns[i]
+            if user_symptom in clean_model_symptom or clean_model_symptom in user_symptom:
+                matched.append(i)
+            elif bounded:
+                matcher = matchers[i]
+                if matcher is None:
+                    matcher = matchers[i] = SequenceMatcher(None, '', clean_model_symptom)
+                matcher.set_seq1(user_symptom)
+                if matcher.ratio() > SIMILARITY_THRESHOLD:
+                    matched.append(i)
+        
+        # Shared between callers through the cache
+        matched = np.array(matched, dtype=np.intp)
+        matched.flags.writeable = False
+        return matched
+    
     def calculate_similarity(self, symptom1: str, symptom2: str) -> float:
         """Calculate similarity between two symptoms"""
         # Direct substring match
@@ -100,29 +347,29 @@ class MLSymptomAnalyzer:
             # Create feature vector
             feature_vector = self.create_feature_vector(user_symptoms)
             
-            if sum(feature_vector) == 0:
+            matched_count = int(feature_vector.sum())
+            if matched_count == 0:
                 return {"error": "No matching symptoms found in model"}
             
-            # Get prediction
-            prediction = self.model.predict([feature_vector])[0]
+            # Get prediction, batched with concurrent requests
+            prediction, proba = self.predictor.predict(feature_vector)
             
             # Get prediction probabilities if available
             probabilities = None
             confidence = 0.0
             
-            if hasattr(self.model, 'predict_proba'):
-                proba = self.model.predict_proba([feature_vector])[0]
-                confidence = float(max(proba))
-                
+            if proba is not None:
                 # Get top 5 predictions
-                top_indices = np.argsort(proba)[-5:][::-1]
+                top_indices = top_k_indices(proba)
+                confidence = float(proba[top_indices[0]])
+                top_indices = top_indices[proba[top_indices] > 0.01]  # Only show predictions > 1%
                 probabilities = [
                     {
                         "disease": self.disease_list[i] if i < len(self.disease_list) else f"Disease_{i}",
                         "probability": float(proba[i]),
                         "percentage": round(float(proba[i]) * 100, 2)
                     }
-                    for i in top_indices if proba[i] > 0.01  # Only show predictions > 1%
+                    for i in top_indices.tolist()
                 ]
             
             return {
@@ -130,7 +377,7 @@ class MLSymptomAnalyzer:
                 "confidence": confidence,
                 "confidence_percentage": round(confidence * 100, 2),
                 "top_predictions": probabilities or [],
-                "matched_symptoms_count": sum(feature_vector),
+                "matched_symptoms_count": matched_count,
                 "total_symptoms_checked": len(self.symptom_columns)
             }
             
@@ -145,24 +392,22 @@ class MLSymptomAnalyzer:
         symptoms_text = ' '.join(symptoms).lower()
         
         # Check for emergency symptoms
-        for emergency in self.emergency_symptoms:
-            if emergency.lower() in symptoms_text:
-                return {
-                    "level": "EMERGENCY",
-                    "color": "#DC2626",
-                    "action": "SEEK IMMEDIATE MEDICAL ATTENTION",
-                    "description": "These symptoms may indicate a life-threatening condition. Call emergency services or go to the emergency room immediately."
-                }
+        if self._emergency_re.search(symptoms_text):
+            return {
+                "level": "EMERGENCY",
+                "color": "#DC2626",
+                "action": "SEEK IMMEDIATE MEDICAL ATTENTION",
+                "description": "These symptoms may indicate a life-threatening condition. Call emergency services or go to the emergency room immediately."
+            }
         
         # Check for high-risk symptoms
-        for high_risk in self.high_risk_symptoms:
-            if high_risk.lower() in symptoms_text:
-                return {
-                    "level": "HIGH",
-                    "color": "#EA580C", 
-                    "action": "CONSULT DOCTOR TODAY",
-                    "description": "These symptoms require prompt medical evaluation. Contact your healthcare provider or urgent care center today."
-                }
+        if self._high_risk_re.search(symptoms_text):
+            return {
+                "level": "HIGH",
+                "color": "#EA580C", 
+                "action": "CONSULT DOCTOR TODAY",
+                "description": "These symptoms require prompt medical evaluation. Contact your healthcare provider or urgent care center today."
+            }
         
         # Age-based risk assessment
         age_num = 0
@@ -173,7 +418,7 @@ class MLSymptomAnalyzer:
         
         if age_num > 65 or age_num < 2:
             # Check for age-specific risks
-            if any(symptom in symptoms_text for symptom in ['fever', 'difficulty breathing', 'chest pain']):
+            if AGE_RISK_SYMPTOMS_RE.search(symptoms_text):
                 return {
                     "level": "HIGH",
                     "color": "#EA580C",
@@ -183,7 +428,7 @@ class MLSymptomAnalyzer:
         
         # Duration-based assessment
         if duration.lower():
-            if any(word in duration.lower() for word in ['week', 'weeks', 'month', 'months']):
+            if LONG_DURATION_RE.search(duration.lower()):
                 return {
                     "level": "MEDIUM",
                     "color": "#D97706",
@@ -192,7 +437,7 @@ class MLSymptomAnalyzer:
                 }
         
         # Severity keywords
-        if any(word in symptoms_text for word in ['severe', 'intense', 'unbearable', 'worsening']):
+        if SEVERITY_WORDS_RE.search(symptoms_text):
             return {
                 "level": "MEDIUM", 
                 "color": "#D97706",
@@ -210,73 +455,36 @@ class MLSymptomAnalyzer:
     def generate_recommendations(self, symptoms: List[str], urgency_level: str, 
                                age: str = "", predictions: Dict = None) -> List[str]:
         """Generate personalized recommendations"""
-        recommendations = []
         symptoms_text = ' '.join(symptoms).lower()
         
         # Urgency-based recommendations
-        if urgency_level == "EMERGENCY":
-            recommendations.extend([
-                "🚨 Call emergency services (911/108) immediately",
-                "🏥 Go to the nearest emergency room",
-                "👥 Have someone accompany you if possible",
-                "📝 Bring a list of current medications"
-            ])
-        elif urgency_level == "HIGH":
-            recommendations.extend([
-                "📞 Contact your doctor or urgent care center today",
-                "📋 Monitor symptoms closely and note any changes",
-                "🚨 Seek immediate care if symptoms worsen",
-                "💊 Bring current medications list to appointment"
-            ])
-        else:
-            # General health recommendations
-            recommendations.extend([
-                "💧 Stay well hydrated with water",
-                "😴 Get adequate rest and sleep",
-                "🌡️ Monitor symptoms and keep a symptom diary"
-            ])
+        groups = [URGENCY_RECOMMENDATIONS.get(urgency_level, GENERAL_RECOMMENDATIONS)]
         
         # Symptom-specific recommendations
-        if any(term in symptoms_text for term in ['fever', 'temperature', 'hot']):
-            recommendations.extend([
-                "🌡️ Monitor temperature regularly",
-                "🧊 Apply cool compresses to reduce fever",
-                "💊 Consider acetaminophen or ibuprofen as directed"
-            ])
-        
-        if any(term in symptoms_text for term in ['cough', 'throat']):
-            recommendations.extend([
-                "🍯 Try warm honey and lemon for throat relief",
-                "💨 Use a humidifier to add moisture to air",
-                "🚭 Avoid smoke and irritants"
-            ])
-        
-        if any(term in symptoms_text for term in ['headache', 'head pain']):
-            recommendations.extend([
-                "🧊 Apply cold compress to forehead",
-                "😌 Rest in a quiet, dark room",
-                "💧 Stay hydrated and avoid triggers"
-            ])
-        
-        if any(term in symptoms_text for term in ['nausea', 'stomach', 'vomiting']):
-            recommendations.extend([
-                "🍞 Try bland foods like toast or crackers",
-                "🥤 Sip clear fluids slowly",
-                "🚫 Avoid spicy, fatty, or dairy foods"
-            ])
+        groups.extend(symptom_recommendations for terms_re, symptom_recommendations in SYMPTOM_RECOMMENDATIONS
+                      if terms_re.search(symptoms_text))
         
         # Age-specific recommendations
         try:
             age_num = int(age) if age else 0
             if age_num > 65:
-                recommendations.append("👴 Consider having a family member assist with care")
+                groups.append(["👴 Consider having a family member assist with care"])
             elif age_num < 18:
-                recommendations.append("👶 Ensure adequate supervision and hydration")
+                groups.append(["👶 Ensure adequate supervision and hydration"])
         except ValueError:
             pass
         
-        # Remove duplicates and limit
-        return list(dict.fromkeys(recommendations))[:10]
+        # Skip duplicates as they are appended and stop at the limit
+        recommendations = []
+        seen = set()
+        for group in groups:
+            for recommendation in group:
+                if recommendation not in seen:
+                    seen.add(recommendation)
+                    recommendations.append(recommendation)
+                    if len(recommendations) == 10:
+                        return recommendations
+        return recommendations
     
     def comprehensive_analysis(self, symptoms: str, age: str = "", gender: str = "",
                              duration: str = "", medical_history: str = "") -> Dict[str, Any]:
@@ -292,53 +500,16 @@ class MLSymptomAnalyzer:
                     "example": "Try: 'fever, headache, cough' or 'stomach pain and nausea'"
                 }
             
-            # Get ML predictions
-            ml_results = self.get_ml_prediction(symptom_list)
-            
-            # Assess urgency
-            urgency_info = self.assess_urgency(symptom_list, age, gender, duration, medical_history)
-            
-            # Generate recommendations  
-            recommendations = self.generate_recommendations(
-                symptom_list, urgency_info['level'], age, ml_results
-            )
-            
-            # Extract possible causes
-            possible_causes = []
-            if not ml_results.get('error') and ml_results.get('top_predictions'):
-                possible_causes = [pred['disease'] for pred in ml_results['top_predictions'][:5]]
-            
-            # Fallback causes if ML fails
-            if not possible_causes:
-                possible_causes = [
-                    "Viral infection",
-                    "Bacterial infection", 
-                    "Stress-related symptoms",
-                    "Dietary factors",
-                    "Environmental factors"
-                ]
-            
-            # Generate clarifying questions
-            questions = self.generate_questions(symptom_list, age, duration)
-            
-            return {
-                "input_symptoms": symptom_list,
-                "possible_causes": possible_causes,
-                "urgency_level": urgency_info['level'],
-                "urgency_color": urgency_info['color'],
-                "urgency_action": urgency_info['action'],
-                "urgency_description": urgency_info['description'],
-                "recommendations": recommendations,
-                "clarifying_questions": questions,
-                "ml_analysis": ml_results if not ml_results.get('error') else None,
-                "patient_info": {
-                    "age": age,
-                    "gender": gender,
-                    "duration": duration,
-                    "has_medical_history": bool(medical_history.strip())
-                },
-                "disclaimer": "⚠️ This analysis is for informational purposes only. Always consult healthcare professionals for medical advice, diagnosis, and treatment."
+            # Repeated inputs reuse the analysis; only patient_info depends on the rest
+            analysis = dict(self._cached_analysis(tuple(symptom_list), age, gender, duration))
+            analysis["patient_info"] = {
+                "age": age,
+                "gender": gender,
+                "duration": duration,
+                "has_medical_history": bool(medical_history.strip())
             }
+            analysis["disclaimer"] = "⚠️ This analysis is for informational purposes only. Always consult healthcare professionals for medical advice, diagnosis, and treatment."
+            return analysis
             
         except Exception as e:
             logging.error(f"Analysis error: {str(e)}")
@@ -347,6 +518,52 @@ class MLSymptomAnalyzer:
                 "disclaimer": "Please consult a healthcare professional for medical advice."
             }
     
+    def _analyze_symptom_list(self, symptoms: Tuple[str, ...], age: str, gender: str,
+                              duration: str) -> Dict[str, Any]:
+        """Predictions, urgency, recommendations and questions for preprocessed symptoms"""
+        symptom_list = list(symptoms)
+        
+        # Get ML predictions
+        ml_results = self.get_ml_prediction(symptom_list)
+        
+        # Assess urgency
+        urgency_info = self.assess_urgency(symptom_list, age, gender, duration)
+        
+        # Generate recommendations  
+        recommendations = self.generate_recommendations(
+            symptom_list, urgency_info['level'], age, ml_results
+        )
+        
+        # Extract possible causes
+        possible_causes = []
+        if not ml_results.get('error') and ml_results.get('top_predictions'):
+            possible_causes = [pred['disease'] for pred in ml_results['top_predictions'][:5]]
+        
+        # Fallback causes if ML fails
+        if not possible_causes:
+            possible_causes = [
+                "Viral infection",
+                "Bacterial infection", 
+                "Stress-related symptoms",
+                "Dietary factors",
+                "Environmental factors"
+            ]
+        
+        # Generate clarifying questions
+        questions = self.generate_questions(symptom_list, age, duration)
+        
+        return {
+            "input_symptoms": symptom_list,
+            "possible_causes": possible_causes,
+            "urgency_level": urgency_info['level'],
+            "urgency_color": urgency_info['color'],
+            "urgency_action": urgency_info['action'],
+            "urgency_description": urgency_info['description'],
+            "recommendations": recommendations,
+            "clarifying_questions": questions,
+            "ml_analysis": ml_results if not ml_results.get('error') else None
+        }
+    
     def generate_questions(self, symptoms: List[str], age: str, duration: str) -> List[str]:
         """Generate relevant follow-up questions"""
         questions = []
@@ -357,7 +574,7 @@ class MLSymptomAnalyzer:
             questions.append("When did these symptoms first start?")
         
         # Severity questions
-        if any(term in symptoms_text for term in ['pain', 'ache']):
+        if PAIN_TERMS_RE.search(symptoms_text):
             questions.append("On a scale of 1-10, how severe is the pain?")
         
         # Fever questions
@@ -3,16 +3,31 @@ import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.svm import SVC
-from sklearn.naive_bayes import GaussianNB
+from sklearn.naive_bayes import BernoulliNB
 from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.base import clone
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
-import json
+import orjson
 import os
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import warnings
 warnings.filterwarnings('ignore')
 
+# Concurrent file writes in save_models
+SAVE_WORKERS = 4
+
+# Screening in train_models: every model is fitted and scored on the held-out split once,
+# and only the best few also go through the 5-fold cross-validation, which costs 5 more fits each
+SCREEN_FINALISTS = 2
+
+def write_json(path, data, indent=False):
+    """Write data as JSON; numpy values from the pandas-built dicts are encoded natively"""
+    option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+    with open(path, 'wb') as f:
+        f.write(orjson.dumps(data, option=option))
+
 class MedicalModelTrainer:
     def __init__(self, data_dir='database'):
         self.data_dir = data_dir
@@ -29,8 +44,12 @@ class MedicalModelTrainer:
         
         # Training and testing data
         try:
-            self.train_df = pd.read_csv(f'{self.data_dir}/Training.csv')
-            self.test_df = pd.read_csv(f'{self.data_dir}/Testing.csv')
+            # Symptom columns hold 0/1 flags and fit in a byte; diseases repeat across rows
+            train_path = f'{self.data_dir}/Training.csv'
+            dtypes = {column: np.uint8 for column in pd.read_csv(train_path, nrows=0).columns}
+            dtypes['prognosis'] = 'category'
+            self.train_df = pd.read_csv(train_path, dtype=dtypes)
+            self.test_df = pd.read_csv(f'{self.data_dir}/Testing.csv', dtype=dtypes)
             print(f"✅ Loaded training data: {self.train_df.shape}")
             print(f"✅ Loaded testing data: {self.test_df.shape}")
         except FileNotFoundError as e:
@@ -95,11 +114,12 @@ class MedicalModelTrainer:
         """Prepare data for training"""
         print("\n🔄 Preparing data for training...")
         
-        # Features (symptoms) and target (disease)
-        X_train = self.train_df[self.symptom_columns]
+        # Features (symptoms) and target (disease); symptoms are 0/1 flags, so one byte
+        # each instead of the int64 columns read_csv produces
+        X_train = self.train_df[self.symptom_columns].to_numpy(dtype=np.uint8)
         y_train = self.train_df['prognosis']
         
-        X_test = self.test_df[self.symptom_columns]
+        X_test = self.test_df[self.symptom_columns].to_numpy(dtype=np.uint8)
         y_test = self.test_df['prognosis']
         
         print(f"Training features shape: {X_train.shape}")
@@ -109,8 +129,8 @@ class MedicalModelTrainer:
         
         return X_train, X_test, y_train, y_test
     
-    def train_models(self):
-        """Train multiple machine learning models"""
+    def train_models(self, fast_screen=True):
+        """Train multiple machine learning models, cross-validating only the strongest if fast_screen"""
         print("\n🤖 Training machine learning models...")
         
         X_train, X_test, y_train, y_test = self.prepare_data()
@@ -120,17 +140,20 @@ class MedicalModelTrainer:
             'Random Forest': RandomForestClassifier(
                 n_estimators=100, 
                 random_state=42, 
-                max_depth=10
+                max_depth=10,
+                n_jobs=-1  # Trees are built independently, one per core
             ),
             'K-Nearest Neighbors': KNeighborsClassifier(
                 n_neighbors=5
             ),
+            # Platt scaling refits the SVM on internal folds and only matters if it is picked,
+            # so it is left off here; a larger kernel cache saves recomputing kernel rows
             'Support Vector Machine': SVC(
                 kernel='rbf', 
-                probability=True, 
-                random_state=42
+                random_state=42,
+                cache_size=1024
             ),
-            'Naive Bayes': GaussianNB()
+            'Naive Bayes': BernoulliNB(alpha=1.0, binarize=None)  # Features are 0/1 flags
         }
         
         results = {}
@@ -145,24 +168,39 @@ class MedicalModelTrainer:
             y_pred = model.predict(X_test)
             accuracy = accuracy_score(y_test, y_pred)
             
-            # Cross-validation score
-            cv_scores = cross_val_score(model, X_train, y_train, cv=5)
-            
             results[name] = {
                 'model': model,
                 'accuracy': accuracy,
-                'cv_mean': cv_scores.mean(),
-                'cv_std': cv_scores.std()
+                'cv_mean': None,
+                'cv_std': None
             }
             
             print(f"✅ {name}:")
             print(f"   Accuracy: {accuracy:.4f}")
-            print(f"   CV Score: {cv_scores.mean():.4f} (±{cv_scores.std():.4f})")
+        
+        cv_names = self.screen_models(results) if fast_screen else list(results)
+        for name in cv_names:
+            # Cross-validation score, folds fitted in parallel on clones of the trained model
+            cv_scores = cross_val_score(results[name]['model'], X_train, y_train, cv=5, n_jobs=-1)
+            results[name]['cv_mean'] = cv_scores.mean()
+            results[name]['cv_std'] = cv_scores.std()
+            print(f"   {name} CV Score: {cv_scores.mean():.4f} (±{cv_scores.std():.4f})")
+        
+        # The saved models predict one request at a time inside server workers that
+        # already use every core; keep them from spawning a thread pool per call
+        for data in results.values():
+            if 'n_jobs' in data['model'].get_params():
+                data['model'].set_params(n_jobs=None)
         
         # Find best model
         best_model_name = max(results.keys(), key=lambda k: results[k]['accuracy'])
         best_model = results[best_model_name]['model']
         
+        # The API reports class probabilities, so a best model trained without them is refitted with them
+        if not hasattr(best_model, 'predict_proba'):
+            best_model = clone(best_model).set_params(probability=True).fit(X_train, y_train)
+            results[best_model_name]['model'] = best_model
+        
         print(f"\n🏆 Best model: {best_model_name} (Accuracy: {results[best_model_name]['accuracy']:.4f})")
         
         self.models = results
@@ -171,6 +209,17 @@ class MedicalModelTrainer:
         
         return results
     
+    def screen_models(self, results):
+        """Names of the models worth cross-validating: the best few by hold-out accuracy, in their original order"""
+        # Same criterion the best model is picked by, so screening never drops the winner;
+        # stable sort, so ties keep the config order
+        finalists = sorted(results, key=lambda name: results[name]['accuracy'], reverse=True)[:SCREEN_FINALISTS]
+        print(f"\n🔎 Cross-validating: {', '.join(name for name in results if name in finalists)}")
+        screened_out = [name for name in results if name not in finalists]
+        if screened_out:
+            print(f"   Screened out (saved, not cross-validated): {', '.join(screened_out)}")
+        return [name for name in results if name in finalists]
+    
     def save_models(self):
         """Save trained models and data"""
         print("\n💾 Saving models and data...")
@@ -178,70 +227,90 @@ class MedicalModelTrainer:
         # Create model directory
         os.makedirs('models', exist_ok=True)
         
-        # Save best model
-        joblib.dump(self.best_model, 'models/best_model.pkl')
-        print(f"✅ Saved best model: {self.best_model_name}")
-        
-        # Save all models
-        for name, data in self.models.items():
-            model_filename = f"models/{name.lower().replace(' ', '_')}.pkl"
-            joblib.dump(data['model'], model_filename)
-        
-        # Save symptom columns
-        with open('models/symptom_columns.json', 'w') as f:
-            json.dump(self.symptom_columns, f)
+        # Create disease-symptom mapping
+        symptom_columns = np.array(self.symptom_columns, dtype=object)
+        disease_symptom_map = {
+            disease: symptom_columns[present].tolist()
+            for disease, present in self.disease_symptom_presence().items()
+        }
         
-        # Save disease list
-        with open('models/disease_list.json', 'w') as f:
-            json.dump(self.disease_list, f)
+        # Files are independent, so their writes overlap; result() re-raises any failure
+        with ThreadPoolExecutor(max_workers=SAVE_WORKERS) as executor:
+            # Save best model uncompressed so the API can memory-map it
+            best_model_saved = executor.submit(joblib.dump, self.best_model, 'models/best_model.pkl', compress=0)
             
-        # Save additional data dictionaries
-        with open('models/symptom_descriptions.json', 'w') as f:
-            json.dump(self.symptom_desc_dict, f)
+            # Save all models
+            writes = [
+                executor.submit(joblib.dump, data['model'], f"models/{name.lower().replace(' ', '_')}.pkl", compress=0)
+                for name, data in self.models.items()
+            ]
             
-        with open('models/symptom_severity.json', 'w') as f:
-            json.dump(self.severity_dict, f)
+            # Save symptom columns, disease list, additional data dictionaries and the mapping
+            writes.extend(executor.submit(write_json, path, data) for path, data in (
+                ('models/symptom_columns.json', self.symptom_columns),
+                ('models/disease_list.json', self.disease_list),
+                ('models/symptom_descriptions.json', self.symptom_desc_dict),
+                ('models/symptom_severity.json', self.severity_dict),
+                ('models/precautions.json', self.precaution_dict),
+                ('models/disease_symptom_mapping.json', disease_symptom_map)
+            ))
             
-        with open('models/precautions.json', 'w') as f:
-            json.dump(self.precaution_dict, f)
-        
-        # Create disease-symptom mapping
-        disease_symptom_map = {}
-        for disease in self.disease_list:
-            disease_data = self.train_df[self.train_df['prognosis'] == disease]
-            symptoms = []
-            for _, row in disease_data.iterrows():
-                disease_symptoms = [col for col in self.symptom_columns if row[col] == 1]
-                symptoms.extend(disease_symptoms)
-            disease_symptom_map[disease] = list(set(symptoms))
-        
-        with open('models/disease_symptom_mapping.json', 'w') as f:
-            json.dump(disease_symptom_map, f)
+            best_model_saved.result()
+            print(f"✅ Saved best model: {self.best_model_name}")
+            # The API only serves an ONNX file written after the pickle, so export once it is saved
+            self.export_onnx('models/best_model.onnx')
+            
+            for write in writes:
+                write.result()
         
         print("✅ All models and data saved successfully!")
     
+    def disease_symptom_presence(self):
+        """Per disease, a boolean mask of the symptoms present (value = 1) in any of its training rows"""
+        presence = (
+            self.train_df[self.symptom_columns].eq(1)
+            .groupby(self.train_df['prognosis'], sort=False).any()
+            .reindex(self.disease_list, fill_value=False)
+        )
+        return dict(zip(presence.index, presence.to_numpy()))
+    
+    def export_onnx(self, path):
+        """Export the best model to ONNX, which the API serves with onnxruntime when available"""
+        try:
+            from skl2onnx import convert_sklearn
+            from skl2onnx.common.data_types import FloatTensorType
+        except ImportError:
+            print("⚠️ skl2onnx not installed, skipping ONNX export")
+            return
+        
+        try:
+            onnx_model = convert_sklearn(
+                self.best_model,
+                initial_types=[('features', FloatTensorType([None, len(self.symptom_columns)]))],
+                # Plain probability matrix instead of a list of per-class dicts
+                options={id(self.best_model): {'zipmap': False}}
+            )
+        except Exception as e:
+            print(f"⚠️ ONNX export failed for {self.best_model_name}: {e}")
+            return
+        
+        with open(path, 'wb') as f:
+            f.write(onnx_model.SerializeToString())
+        print(f"✅ Exported best model to {path}")
+    
     def create_symptom_dataset_json(self):
         """Create a JSON dataset compatible with your symptom checker"""
         print("\n📄 Creating JSON dataset...")
         
-        disease_symptom_dataset = {}
-        
-        for disease in self.disease_list:
-            # Get all rows for this disease
-            disease_data = self.train_df[self.train_df['prognosis'] == disease]
-            
-            # Find symptoms that are present (value = 1) for this disease
-            all_symptoms = set()
-            for _, row in disease_data.iterrows():
-                symptoms = [col.replace('_', ' ') for col in self.symptom_columns if row[col] == 1]
-                all_symptoms.update(symptoms)
-            
-            disease_symptom_dataset[disease] = sorted(list(all_symptoms))
+        cleaned_columns = np.array([col.replace('_', ' ') for col in self.symptom_columns], dtype=object)
+        disease_symptom_dataset = {
+            disease: sorted(set(cleaned_columns[present].tolist()))
+            for disease, present in self.disease_symptom_presence().items()
+        }
         
         # Save to database directory
         os.makedirs('database', exist_ok=True)
-        with open('database/disease-symptom_dataset.json', 'w') as f:
-            json.dump(disease_symptom_dataset, f, indent=2)
+        write_json('database/disease-symptom_dataset.json', disease_symptom_dataset, indent=True)
         
         print(f"✅ Created disease-symptom dataset with {len(disease_symptom_dataset)} diseases")
         return disease_symptom_dataset
@@ -260,14 +329,16 @@ class MedicalModelTrainer:
         }
         
         for name, data in self.models.items():
+            # Models screened out of cross-validation have null CV scores
+            cross_validated = data['cv_mean'] is not None
             info['model_performance'][name] = {
                 'accuracy': float(data['accuracy']),
-                'cv_mean': float(data['cv_mean']),
-                'cv_std': float(data['cv_std'])
+                'cv_mean': float(data['cv_mean']) if cross_validated else None,
+                'cv_std': float(data['cv_std']) if cross_validated else None,
+                'cross_validated': cross_validated
             }
         
-        with open('models/model_info.json', 'w') as f:
-            json.dump(info, f, indent=2)
+        write_json('models/model_info.json', info, indent=True)
         
         return info
 
@@ -1,13 +1,111 @@
 import re
-from typing import List, Dict, Any
+import functools
+from typing import List, Dict, Any, Set
 import json
 from difflib import SequenceMatcher
+import numpy as np
+import ahocorasick
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
+
+# Minimum similarity for a user symptom to match a disease symptom
+MATCH_THRESHOLD = 0.6
+# Distinct normalized symptom texts whose analyses are kept for repeated queries
+ANALYSIS_CACHE_SIZE = 4096
+
+def _phrase_pattern(phrases: List[str]) -> "re.Pattern":
+    """Regex finding any of the phrases (lowercased) in one pass; matches nothing for no phrases"""
+    return re.compile('|'.join(re.escape(phrase.lower()) for phrase in phrases) or r'(?!)')
+
+def _extend_unique(items: List[str], seen: Set[str], new_items: List[str]):
+    """Append the new items not already seen, keeping order, so no separate dedup pass is needed"""
+    for item in new_items:
+        if item not in seen:
+            seen.add(item)
+            items.append(item)
+
+# Symptom text splitting and cleanup patterns
+SYMPTOM_SPLIT_RE = re.compile(r'[,;]|(?:\s+and\s+)|(?:\s+&\s+)')
+SYMPTOM_PREFIX_RE = re.compile(r'^(?:have|having|experiencing|feel|feeling|got|get|i|my|the)\s+')
+SYMPTOM_SUFFIX_RE = re.compile(r'\s+(?:for|since|lasting).*$')
+
+# Conditions whose top match makes the urgency high
+HIGH_URGENCY_CONDITIONS_RE = _phrase_pattern([
+    'heart attack', 'stroke', 'pneumonia', 'appendicitis', 'meningitis',
+    'kidney stones', 'gallbladder', 'asthma', 'diabetes', 'hypertension'
+])
+
+# Keyword groups looked up in the lowercased input, alongside the urgency keyword lists
+INPUT_TERM_GROUPS = {
+    # Urgency
+    'severity': ['severe', 'intense', 'unbearable', 'weeks', 'persistent'],
+    'worsening': ['getting worse', 'worsening', 'not improving'],
+    # Clarifying questions
+    'pain': ['pain', 'ache', 'hurt'],
+    'fever': ['fever', 'temperature'],
+    'breathing': ['cough', 'breathing', 'chest'],
+    'head': ['headache', 'head'],
+    'stomach': ['stomach', 'nausea', 'abdominal'],
+    'duration': ['day', 'week', 'month', 'hour', 'ago', 'since']
+}
+
+def _keyword_automaton(groups: Dict[str, List[str]]) -> ahocorasick.Automaton:
+    """Aho-Corasick automaton mapping each keyword (lowercased) to the names of the groups listing it"""
+    keyword_groups = {}
+    for group, keywords in groups.items():
+        for keyword in keywords:
+            keyword_groups.setdefault(keyword.lower(), set()).add(group)
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, keyword_group_names in keyword_groups.items():
+        automaton.add_word(keyword, frozenset(keyword_group_names))
+    automaton.make_automaton()
+    return automaton
+
+def _matched_groups(automaton: ahocorasick.Automaton, text: str) -> Set[str]:
+    """Groups with at least one keyword occurring in text, found in a single pass"""
+    if automaton.kind != ahocorasick.AHOCORASICK:  # No keywords at all
+        return set()
+    return set().union(*(groups for _, groups in automaton.iter(text)))
+
+# Recommendation triggers looked up in the lowercased symptoms
+SYMPTOM_TERMS = _keyword_automaton({
+    'fever': ['fever', 'temperature', 'hot', 'chills'],
+    'throat': ['cough', 'throat', 'sore'],
+    'headache': ['headache', 'head pain', 'migraine'],
+    'digestive': ['nausea', 'stomach', 'abdominal', 'vomiting'],
+    'pain': ['pain', 'ache', 'sore']
+})
 
 class SymptomAnalyzer:
     """AI-powered symptom analysis engine using JSON dataset."""
     
     def __init__(self, dataset: Dict[str, List[str]]):
         self.dataset = dataset
+        # Per-instance and thread-safe, so a new analyzer starts with an empty cache
+        self._cached_analysis = functools.lru_cache(maxsize=ANALYSIS_CACHE_SIZE)(self._analyze_text)
+        
+        # Each distinct disease symptom is scored once per user symptom, however many
+        # diseases list it; diseases keep the positions of their symptoms in that vocabulary
+        vocabulary = {}
+        disease_symptom_ids = {}
+        for disease, disease_symptoms in dataset.items():
+            if isinstance(disease_symptoms, list):
+                disease_symptom_ids[disease] = [
+                    vocabulary.setdefault(s.lower().strip(), len(vocabulary)) for s in disease_symptoms
+                ]
+        self._symptom_vocabulary = list(vocabulary)
+        self._symptom_lengths = np.array([len(s) for s in self._symptom_vocabulary])
+        # Empty symptoms never count as a match
+        self._countable_symptoms = np.array([bool(s) for s in self._symptom_vocabulary] + [False])
+        
+        # Diseases x symptom positions, padded with an extra vocabulary slot that always scores 0,
+        # so every disease is scored against every user symptom in one gather
+        self._matched_diseases = list(disease_symptom_ids)
+        width = max(map(len, disease_symptom_ids.values()), default=0) or 1
+        self._disease_symptom_matrix = np.full((len(disease_symptom_ids), width), len(vocabulary), dtype=np.intp)
+        for row, symptom_ids in enumerate(disease_symptom_ids.values()):
+            self._disease_symptom_matrix[row, :len(symptom_ids)] = symptom_ids
         
         # Emergency keywords that indicate high urgency
         self.emergency_keywords = [
@@ -24,6 +122,13 @@ class SymptomAnalyzer:
             'rapid weight loss', 'persistent cough', 'severe diarrhea'
         ]
         
+        # Every keyword group checked against the user input, found in one pass over it
+        self._input_terms = _keyword_automaton({
+            'emergency': self.emergency_keywords,
+            'high_urgency': self.high_urgency_keywords,
+            **INPUT_TERM_GROUPS
+        })
+        
         # Common condition mappings for fallback
         self.condition_patterns = {
             'Common Cold': ['runny nose', 'sneezing', 'mild cough', 'sore throat'],
@@ -42,14 +147,14 @@ class SymptomAnalyzer:
         symptoms = []
         
         # Split by common separators
-        parts = re.split(r'[,;]|(?:\s+and\s+)|(?:\s+&\s+)', text)
+        parts = SYMPTOM_SPLIT_RE.split(text)
         
         for part in parts:
             part = part.strip()
             if part and len(part) > 2:
                 # Remove common prefixes
-                part = re.sub(r'^(?:have|having|experiencing|feel|feeling|got|get|i|my|the)\s+', '', part)
-                part = re.sub(r'\s+(?:for|since|lasting).*$', '', part)
+                part = SYMPTOM_PREFIX_RE.sub('', part)
+                part = SYMPTOM_SUFFIX_RE.sub('', part)
                 if part:
                     symptoms.append(part.strip())
         
@@ -59,56 +164,89 @@ class SymptomAnalyzer:
         """Calculate similarity between two strings."""
         return SequenceMatcher(None, a.lower(), b.lower()).ratio()
     
+    def _score_symptoms(self, user_symptoms: List[str], workers: int = 1) -> np.ndarray:
+        """
+        Match scores of each user symptom (rows) against every vocabulary symptom and the padding slot
+        (columns), 0 where below the threshold; workers are the threads for the distance matrix
+        """
+        vocabulary = self._symptom_vocabulary
+        scores = np.zeros((len(user_symptoms), len(vocabulary) + 1))
+        if not vocabulary:
+            return scores
+        
+        # SequenceMatcher's ratio never exceeds 2*LCS/(total length), and a substring match needs
+        # the whole shorter string as the LCS; one cdist call over all pairs leaves only those that can match
+        lowered = [user_symptom.lower() for user_symptom in user_symptoms]
+        user_lengths = np.array([len(user_symptom) for user_symptom in lowered])[:, None]
+        lengths = self._symptom_lengths
+        distances = process.cdist(lowered, vocabulary, scorer=Indel.distance, dtype=np.int32,
+                                  workers=workers)
+        shared = (lengths + user_lengths - distances) // 2
+        within_bound = 2 * shared >= MATCH_THRESHOLD * (lengths + user_lengths)
+        contained = (shared == lengths) | (shared == user_lengths)
+        
+        for row, i in zip(*(indices.tolist() for indices in np.nonzero(within_bound | contained))):
+            user_symptom = user_symptoms[row]
+            disease_symptom = vocabulary[i]
+            # Direct substring match
+            if user_symptom in disease_symptom or disease_symptom in user_symptom:
+                scores[row, i] = 1.0
+            else:
+                score = self.similarity_score(user_symptom, disease_symptom)
+                if score > MATCH_THRESHOLD:
+                    scores[row, i] = score
+        
+        return scores
+    
     def find_matching_diseases(self, user_symptoms: List[str]) -> List[Dict[str, Any]]:
         """Find diseases that match the user's symptoms."""
+        if not user_symptoms or not self._matched_diseases:
+            return []
+        return self._matches_from_scores(user_symptoms, self._score_symptoms(user_symptoms))
+    
+    def _matches_from_scores(self, user_symptoms: List[str], scores: np.ndarray) -> List[Dict[str, Any]]:
+        """Matching diseases given the _score_symptoms rows of the user's symptoms"""
         matches = []
-        
-        for disease, disease_symptoms in self.dataset.items():
-            if not isinstance(disease_symptoms, list):
-                continue
+        if not user_symptoms or not self._matched_diseases:
+            return matches
+        
+        # Best-scoring symptom of every disease for each user symptom, the first one on ties
+        disease_scores = scores[:, self._disease_symptom_matrix]
+        best = disease_scores.argmax(axis=2)
+        best_scores = np.take_along_axis(disease_scores, best[..., None], axis=2)[..., 0]
+        best_ids = self._disease_symptom_matrix[np.arange(len(self._matched_diseases)), best]
+        counted = (best_scores > 0) & self._countable_symptoms[best_ids]
+        
+        # Summed one user symptom at a time, in input order
+        match_scores = np.zeros(len(self._matched_diseases))
+        for user_counted, user_best_scores in zip(counted, best_scores):
+            match_scores += np.where(user_counted, user_best_scores, 0.0)
+        
+        for row in np.flatnonzero(match_scores > 0).tolist():
+            disease = self._matched_diseases[row]
+            disease_symptoms = self.dataset[disease]
+            match_score = float(match_scores[row])
+            matched_symptoms = [
+                self._symptom_vocabulary[symptom_id]
+                for symptom_id in best_ids[counted[:, row], row].tolist()
+            ]
             
-            disease_symptoms_lower = [s.lower().strip() for s in disease_symptoms]
-            match_score = 0
-            matched_symptoms = []
+            # Calculate match percentage
+            match_percentage = (match_score / len(user_symptoms)) * 100
+            symptom_coverage = (len(matched_symptoms) / len(disease_symptoms)) * 100
             
-            # Check each user symptom against disease symptoms
-            for user_symptom in user_symptoms:
-                best_match_score = 0
-                best_match = None
-                
-                for disease_symptom in disease_symptoms_lower:
-                    # Direct substring match
-                    if user_symptom in disease_symptom or disease_symptom in user_symptom:
-                        score = 1.0
-                    else:
-                        # Similarity score
-                        score = self.similarity_score(user_symptom, disease_symptom)
-                    
-                    if score > best_match_score and score > 0.6:  # Minimum similarity threshold
-                        best_match_score = score
-                        best_match = disease_symptom
-                
-                if best_match:
-                    match_score += best_match_score
-                    matched_symptoms.append(best_match)
+            # Combined score considering both user symptom coverage and disease symptom coverage
+            combined_score = (match_percentage + symptom_coverage) / 2
             
-            if match_score > 0:
-                # Calculate match percentage
-                match_percentage = (match_score / len(user_symptoms)) * 100
-                symptom_coverage = (len(matched_symptoms) / len(disease_symptoms)) * 100
-                
-                # Combined score considering both user symptom coverage and disease symptom coverage
-                combined_score = (match_percentage + symptom_coverage) / 2
-                
-                matches.append({
-                    'disease': disease,
-                    'all_symptoms': disease_symptoms,
-                    'matched_symptoms': matched_symptoms,
-                    'match_score': round(match_score, 2),
-                    'match_percentage': round(match_percentage, 2),
-                    'symptom_coverage': round(symptom_coverage, 2),
-                    'combined_score': round(combined_score, 2)
-                })
+            matches.append({
+                'disease': disease,
+                'all_symptoms': disease_symptoms,
+                'matched_symptoms': matched_symptoms,
+                'match_score': round(match_score, 2),
+                'match_percentage': round(match_percentage, 2),
+                'symptom_coverage': round(symptom_coverage, 2),
+                'combined_score': round(combined_score, 2)
+            })
         
         # Sort by combined score (descending)
         matches.sort(key=lambda x: x['combined_score'], reverse=True)
@@ -116,49 +254,41 @@ class SymptomAnalyzer:
     
     def calculate_urgency_level(self, symptoms: List[str], user_input: str, matched_diseases: List[Dict]) -> Dict[str, str]:
         """Calculate urgency level based on symptoms and matched diseases."""
-        user_input_lower = user_input.lower()
+        input_groups = _matched_groups(self._input_terms, user_input.lower())
         
         # Check for emergency symptoms
-        for keyword in self.emergency_keywords:
-            if keyword in user_input_lower:
-                return {
-                    "level": "High",
-                    "description": "Seek immediate medical attention. These symptoms may indicate a serious condition requiring urgent care."
-                }
+        if 'emergency' in input_groups:
+            return {
+                "level": "High",
+                "description": "Seek immediate medical attention. These symptoms may indicate a serious condition requiring urgent care."
+            }
         
         # Check for high urgency symptoms
-        for keyword in self.high_urgency_keywords:
-            if keyword in user_input_lower:
-                return {
-                    "level": "High", 
-                    "description": "Schedule a doctor visit as soon as possible. These symptoms warrant prompt medical evaluation."
-                }
+        if 'high_urgency' in input_groups:
+            return {
+                "level": "High", 
+                "description": "Schedule a doctor visit as soon as possible. These symptoms warrant prompt medical evaluation."
+            }
         
         # Check matched diseases for severity indicators
         if matched_diseases:
             top_disease = matched_diseases[0]['disease'].lower()
             
-            # High urgency conditions
-            high_urgency_conditions = [
-                'heart attack', 'stroke', 'pneumonia', 'appendicitis', 'meningitis',
-                'kidney stones', 'gallbladder', 'asthma', 'diabetes', 'hypertension'
-            ]
-            
-            if any(condition in top_disease for condition in high_urgency_conditions):
+            if HIGH_URGENCY_CONDITIONS_RE.search(top_disease):
                 return {
                     "level": "High",
                     "description": "These symptoms may indicate a serious condition. Please consult a healthcare provider promptly."
                 }
         
         # Check for duration and severity indicators
-        if any(term in user_input_lower for term in ['severe', 'intense', 'unbearable', 'weeks', 'persistent']):
+        if 'severity' in input_groups:
             return {
                 "level": "Medium",
                 "description": "Consider seeing a healthcare provider within the next few days for proper evaluation."
             }
         
         # Check for worsening symptoms
-        if any(term in user_input_lower for term in ['getting worse', 'worsening', 'not improving']):
+        if 'worsening' in input_groups:
             return {
                 "level": "Medium", 
                 "description": "If symptoms continue to worsen or don't improve, consult a healthcare provider."
@@ -172,61 +302,62 @@ class SymptomAnalyzer:
     def generate_recommendations(self, symptoms: List[str], urgency_level: str, matched_diseases: List[Dict]) -> List[str]:
         """Generate personalized recommendations based on symptoms and matched conditions."""
         recommendations = []
+        seen = set()
         
         # Urgency-based recommendations
         if urgency_level.lower() == 'high':
-            recommendations.extend([
+            _extend_unique(recommendations, seen, [
                 "Seek immediate medical attention",
                 "Call emergency services if symptoms are severe",
                 "Do not delay medical care",
                 "Have someone accompany you to the hospital if possible"
             ])
         elif urgency_level.lower() == 'medium':
-            recommendations.extend([
+            _extend_unique(recommendations, seen, [
                 "Schedule an appointment with your healthcare provider",
                 "Monitor symptoms closely and keep a symptom diary",
                 "Seek immediate care if symptoms worsen"
             ])
         else:
-            recommendations.extend([
+            _extend_unique(recommendations, seen, [
                 "Get adequate rest and sleep",
                 "Stay well hydrated with water and clear fluids", 
                 "Monitor symptoms and seek care if they worsen or persist"
             ])
         
         # Symptom-specific recommendations
-        user_symptoms_text = ' '.join(symptoms).lower()
+        symptom_groups = _matched_groups(SYMPTOM_TERMS, ' '.join(symptoms).lower())
         
-        if any(term in user_symptoms_text for term in ['fever', 'temperature', 'hot', 'chills']):
-            recommendations.extend([
+        if 'fever' in symptom_groups:
+            _extend_unique(recommendations, seen, [
                 "Monitor body temperature regularly",
                 "Use over-the-counter fever reducers as directed",
                 "Apply cool compresses to help reduce fever"
             ])
         
-        if any(term in user_symptoms_text for term in ['cough', 'throat', 'sore']):
-            recommendations.extend([
+        if 'throat' in symptom_groups:
+            _extend_unique(recommendations, seen, [
                 "Use throat lozenges or warm salt water gargle",
                 "Stay hydrated with warm liquids like tea with honey",
                 "Use a humidifier to add moisture to the air"
             ])
         
-        if any(term in user_symptoms_text for term in ['headache', 'head pain', 'migraine']):
-            recommendations.extend([
+        if 'headache' in symptom_groups:
+            _extend_unique(recommendations, seen, [
                 "Apply cold or warm compress to head or neck",
                 "Rest in a quiet, dark room",
                 "Ensure adequate sleep and manage stress levels"
             ])
         
-        if any(term in user_symptoms_text for term in ['nausea', 'stomach', 'abdominal', 'vomiting']):
-            recommendations.extend([
+        if 'digestive' in symptom_groups:
+            _extend_unique(recommendations, seen, [
                 "Try bland foods like crackers, toast, or rice",
                 "Avoid spicy, fatty, or dairy foods",
                 "Sip clear fluids slowly to prevent dehydration"
             ])
         
-        if any(term in user_symptoms_text for term in ['pain', 'ache', 'sore']):
-            recommendations.extend([
+        if 'pain' in symptom_groups:
+            _extend_unique(recommendations, seen, [
                 "Apply ice or heat as appropriate for pain relief",
                 "Consider over-the-counter pain relievers as directed",
                 "Avoid activities that worsen the pain"
@@ -237,91 +368,108 @@ class SymptomAnalyzer:
             top_disease = matched_diseases[0]['disease'].lower()
             
             if 'cold' in top_disease or 'flu' in top_disease:
-                recommendations.extend([
+                _extend_unique(recommendations, seen, [
                     "Increase vitamin C intake through citrus fruits",
                     "Wash hands frequently to prevent spread"
                 ])
             
             if 'allerg' in top_disease:
-                recommendations.extend([
+                _extend_unique(recommendations, seen, [
                     "Identify and avoid potential allergens",
                     "Consider antihistamines if appropriate"
                 ])
             
             if 'anxiety' in top_disease or 'stress' in top_disease:
-                recommendations.extend([
+                _extend_unique(recommendations, seen, [
                     "Practice deep breathing exercises",
                     "Try relaxation techniques or meditation"
                 ])
         
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_recommendations = []
-        for rec in recommendations:
-            if rec not in seen:
-                seen.add(rec)
-                unique_recommendations.append(rec)
-        
-        return unique_recommendations[:8]  # Limit to 8 recommendations
+        return recommendations[:8]  # Limit to 8 recommendations
     
     def generate_clarifying_questions(self, symptoms: List[str], user_input: str) -> List[str]:
         """Generate relevant clarifying questions."""
         questions = []
-        user_input_lower = user_input.lower()
+        seen = set()
+        input_groups = _matched_groups(self._input_terms, user_input.lower())
         
         # General clarifying questions based on symptoms
-        if any(term in user_input_lower for term in ['pain', 'ache', 'hurt']):
-            questions.extend([
+        if 'pain' in input_groups:
+            _extend_unique(questions, seen, [
                 "On a scale of 1-10, how would you rate the pain intensity?",
                 "Is the pain constant or does it come and go?",
                 "Does anything make the pain better or worse?"
             ])
         
-        if any(term in user_input_lower for term in ['fever', 'temperature']):
-            questions.extend([
+        if 'fever' in input_groups:
+            _extend_unique(questions, seen, [
                 "Have you measured your temperature? What was the reading?",
                 "Are you experiencing chills or night sweats?",
                 "How long have you had the fever?"
             ])
         
-        if any(term in user_input_lower for term in ['cough', 'breathing', 'chest']):
-            questions.extend([
+        if 'breathing' in input_groups:
+            _extend_unique(questions, seen, [
                 "Are you experiencing any difficulty breathing?",
                 "Is the cough producing any phlegm or blood?",
                 "Does the cough interfere with your sleep?"
             ])
         
-        if any(term in user_input_lower for term in ['headache', 'head']):
-            questions.extend([
+        if 'head' in input_groups:
+            _extend_unique(questions, seen, [
                 "Where exactly is the headache located?",
                 "Are you experiencing any vision changes or sensitivity to light?",
                 "Have you had similar headaches before?"
             ])
         
-        if any(term in user_input_lower for term in ['stomach', 'nausea', 'abdominal']):
-            questions.extend([
+        if 'stomach' in input_groups:
+            _extend_unique(questions, seen, [
                 "Have you had any recent changes in diet?",
                 "Are you experiencing any vomiting or diarrhea?",
                 "When did you last have a normal bowel movement?"
             ])
         
         # Duration questions if not mentioned
-        if not any(term in user_input_lower for term in ['day', 'week', 'month', 'hour', 'ago', 'since']):
-            questions.append("When did these symptoms first start?")
+        if 'duration' not in input_groups:
+            _extend_unique(questions, seen, ["When did these symptoms first start?"])
         
         # Context questions
-        questions.extend([
+        _extend_unique(questions, seen, [
             "Have you traveled recently or been exposed to anyone who was ill?",
             "Are you currently taking any medications or supplements?",
             "Do you have any known allergies or medical conditions?"
         ])
         
-        # Remove duplicates and limit
-        return list(dict.fromkeys(questions))[:5]
+        return questions[:5]
     
     def analyze_symptoms(self, symptoms: str, age: str = "", gender: str = "", 
                         duration: str = "", medical_history: str = "") -> Dict[str, Any]:
         """Main analysis function that processes symptoms and returns comprehensive analysis."""
+        # Every step lowercases the text, and no keyword starts or ends with whitespace, so
+        # inputs differing only in case or surrounding whitespace share one cached analysis
+        return dict(self._cached_analysis(symptoms.lower().strip()))
+    
+    def analyze_symptoms_batch(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """Analyses of many symptom texts, in order, matching all their symptoms in one scoring pass."""
+        texts = [query.lower().strip() for query in queries]
+        symptom_lists = {text: self.extract_symptoms_from_text(text) for text in texts}
+        
+        # Symptoms shared between queries are scored once, with the distance matrix on every core
+        all_symptoms = list(dict.fromkeys(s for symptom_list in symptom_lists.values() for s in symptom_list))
+        rows = {symptom: row for row, symptom in enumerate(all_symptoms)}
+        scores = self._score_symptoms(all_symptoms, workers=-1)
+        
+        analyses = {
+            text: self._compile_analysis(
+                text, symptom_list,
+                self._matches_from_scores(symptom_list, scores[[rows[s] for s in symptom_list]])
+            )
+            for text, symptom_list in symptom_lists.items()
+        }
+        return [dict(analyses[text]) for text in texts]
+    
+    def _analyze_text(self, symptoms: str) -> Dict[str, Any]:
+        """Analysis of normalized symptom text"""
         
         # Extract individual symptoms from text
         symptom_list = self.extract_symptoms_from_text(symptoms)
@@ -329,6 +477,12 @@ class SymptomAnalyzer:
         # Find matching diseases from dataset
         matched_diseases = self.find_matching_diseases(symptom_list)
         
+        return self._compile_analysis(symptoms, symptom_list, matched_diseases)
+    
+    def _compile_analysis(self, symptoms: str, symptom_list: List[str],
+                          matched_diseases: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Analysis of normalized symptom text from its extracted symptoms and matched diseases"""
+        
         # Extract possible causes from top matches
         possible_causes = []
         if matched_diseases:
@@ -337,9 +491,10 @@ class SymptomAnalyzer:
         
         # If no good matches from dataset, use fallback patterns
         if not possible_causes or (matched_diseases and matched_diseases[0]['combined_score'] < 30):
+            # Patterns are looked up in the whole input, lowercased once rather than per pattern
+            symptoms_lower = symptoms.lower() if symptom_list else ''
             for condition, patterns in self.condition_patterns.items():
-                pattern_matches = sum(1 for pattern in patterns 
-                                   if any(pattern in symptoms.lower() for symptom in symptom_list))
+                pattern_matches = sum(1 for pattern in patterns if pattern in symptoms_lower)
                 if pattern_matches >= 2:  # At least 2 pattern matches
                     possible_causes.append(condition)
             
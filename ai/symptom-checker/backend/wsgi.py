@@ -0,0 +1,22 @@
+"""
+WSGI entry point for serving the symptom checker API in production
+
+Run from the symptom-checker directory, since model and data paths are relative to it:
+    gunicorn -w 4 -k gthread --threads 8 --preload -b 0.0.0.0:5000 --pythonpath backend wsgi:app
+
+--preload loads the model and data once in the master process, so the forked workers
+share those pages instead of each loading its own copy. Threaded workers keep
+concurrent /predict and /analyze requests in one process, where the batch predictor
+folds them into a single model call; size -w to the number of cores.
+
+POST /reload (enabled by setting RELOAD_TOKEN) only reloads the worker that handles it;
+restart the server to load new model files in every worker.
+"""
+
+import gc
+
+from app import app, medical_system  # noqa: F401
+
+# Garbage collection writes to the header of every tracked object it visits, which would
+# copy the shared pages into each worker; freeze everything loaded so far out of its reach
+gc.freeze()
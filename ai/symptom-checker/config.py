@@ -1,4 +1,5 @@
 import os
+import re
 from pathlib import Path
 
 class Config:
@@ -23,26 +24,38 @@ class Config:
     LABEL_ENCODER_PATH = MODELS_DIR / 'label_encoder.pkl'
     MODEL_INFO_PATH = MODELS_DIR / 'model_info.json'
     
+    # Files a trained model needs
+    REQUIRED_MODEL_FILES = (BEST_MODEL_PATH, SYMPTOM_COLUMNS_PATH, DISEASE_LIST_PATH, MODEL_INFO_PATH)
+    
     # Dataset files
     TRAINING_DATA_PATH = DATABASE_DIR / 'Training.csv'
     TESTING_DATA_PATH = DATABASE_DIR / 'Testing.csv'
     DISEASE_DATASET_PATH = DATABASE_DIR / 'disease-symptom_dataset.json'
     
+    # Datasets training needs
+    REQUIRED_DATASET_FILES = (TRAINING_DATA_PATH, TESTING_DATA_PATH)
+    
     # API settings
     API_VERSION = "1.0"
     API_TITLE = "Medical Symptom Checker API"
     
-    # Medical safety settings
-    EMERGENCY_KEYWORDS = [
+    # Medical safety settings; the lists keep their order, the sets are for membership checks
+    EMERGENCY_KEYWORDS_LIST = (
         'chest pain', 'difficulty breathing', 'shortness of breath', 'severe pain',
         'heart attack', 'stroke', 'bleeding', 'unconscious', 'seizure',
         'severe headache', 'vision loss', 'paralysis', 'severe allergic reaction'
-    ]
+    )
+    EMERGENCY_KEYWORDS = frozenset(EMERGENCY_KEYWORDS_LIST)
     
-    HIGH_RISK_KEYWORDS = [
+    HIGH_RISK_KEYWORDS_LIST = (
         'persistent fever', 'severe fatigue', 'blood in stool', 'blood in urine',
         'severe vomiting', 'dehydration', 'fainting', 'rapid weight loss'
-    ]
+    )
+    HIGH_RISK_KEYWORDS = frozenset(HIGH_RISK_KEYWORDS_LIST)
+    
+    # Each keyword list compiled into one pattern, so text is scanned once rather than per keyword
+    EMERGENCY_RE = re.compile('|'.join(re.escape(k) for k in EMERGENCY_KEYWORDS_LIST), re.IGNORECASE)
+    HIGH_RISK_RE = re.compile('|'.join(re.escape(k) for k in HIGH_RISK_KEYWORDS_LIST), re.IGNORECASE)
     
     # Age-based risk factors
     ELDERLY_AGE_THRESHOLD = 65
@@ -57,21 +70,51 @@ class Config:
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     
+    # Names of the entries in each checked directory, shared by all configs until invalidate_file_cache()
+    _file_check_cache = {}
+    
+    # Set once the directories have been created, so later calls skip the syscalls
+    _dirs_ensured = False
+    
     @classmethod
     def ensure_directories(cls):
         """Create necessary directories if they don't exist"""
-        cls.DATABASE_DIR.mkdir(exist_ok=True)
-        cls.MODELS_DIR.mkdir(exist_ok=True)
+        if Config._dirs_ensured:
+            return
+        os.makedirs(cls.DATABASE_DIR, exist_ok=True)
+        os.makedirs(cls.MODELS_DIR, exist_ok=True)
+        Config._dirs_ensured = True
+    
+    @classmethod
+    def scan_emergency(cls, text):
+        """Emergency keywords found in text, lowercased, in order of appearance"""
+        return [match.lower() for match in cls.EMERGENCY_RE.findall(text)]
+    
+    @classmethod
+    def _dir_listing(cls, directory):
+        """Names in a directory, read in one scan on the first check; empty if it is missing"""
+        if directory not in cls._file_check_cache:
+            try:
+                with os.scandir(directory) as entries:
+                    cls._file_check_cache[directory] = {entry.name for entry in entries}
+            except FileNotFoundError:
+                cls._file_check_cache[directory] = set()
+        return cls._file_check_cache[directory]
+    
+    @classmethod
+    def file_exists(cls, path):
+        """Check if a file exists from the listing of its directory"""
+        return path.name in cls._dir_listing(path.parent)
+    
+    @staticmethod
+    def invalidate_file_cache():
+        """Forget file checks, after files have been written"""
+        Config._file_check_cache.clear()
     
     @classmethod
     def validate_required_files(cls):
         """Check if required files exist"""
-        required_files = [
-            cls.TRAINING_DATA_PATH,
-            cls.TESTING_DATA_PATH
-        ]
-        
-        missing_files = [f for f in required_files if not f.exists()]
+        missing_files = [f for f in cls.REQUIRED_DATASET_FILES if not cls.file_exists(f)]
         
         if missing_files:
             return False, missing_files
@@ -80,15 +123,8 @@ class Config:
     @classmethod
     def check_model_files(cls):
         """Check if trained model files exist"""
-        model_files = [
-            cls.BEST_MODEL_PATH,
-            cls.SYMPTOM_COLUMNS_PATH,
-            cls.DISEASE_LIST_PATH,
-            cls.MODEL_INFO_PATH
-        ]
-        
-        existing_files = [f for f in model_files if f.exists()]
-        return len(existing_files) == len(model_files), existing_files
+        existing_files = [f for f in cls.REQUIRED_MODEL_FILES if cls.file_exists(f)]
+        return len(existing_files) == len(cls.REQUIRED_MODEL_FILES), existing_files
 
 
 class DevelopmentConfig(Config):
@@ -6,24 +6,42 @@ This script handles the setup and running of the entire application.
 
 import os
 import sys
+import importlib.util
+import functools
+import hashlib
+import shutil
+import signal
 import subprocess
-import time
 import threading
+import asyncio
+import webbrowser
 from pathlib import Path
 from config import config
-import sys
-from pathlib import Path
 
 # Add backend folder to sys.path
 BASE_DIR = Path(__file__).resolve().parent
 sys.path.insert(0, str(BASE_DIR / "backend"))
+FRONTEND_DIR = BASE_DIR / 'frontend'
 
 
-from backend.model_trainer import MedicalModelTrainer
-
 Config = config['development']   # 👈 force dev locally
 
+# npm resolved on PATH once; Windows installs it as npm.cmd
+NPM = shutil.which('npm') or shutil.which('npm.cmd')
+
+# Packages the runner needs, by install name and import name
+REQUIRED_PACKAGES = {
+    'flask': 'flask',
+    'pandas': 'pandas',
+    'scikit-learn': 'sklearn',
+    'joblib': 'joblib',
+    'numpy': 'numpy'
+}
+
 
+# Environment checks give the same answer for the life of the process, so each runs once
+# (lru_cache rather than functools.cache, which needs Python 3.9)
+@functools.lru_cache(maxsize=None)
 def check_python_version():
     """Check if Python version is compatible"""
     if sys.version_info < (3, 8):
@@ -33,25 +51,18 @@ def check_python_version():
     print(f"✅ Python {sys.version.split()[0]} detected")
     return True
 
+@functools.lru_cache(maxsize=None)
 def check_dependencies():
     """Check if required dependencies are installed"""
     print("\n🔍 Checking dependencies...")
     
-    required_packages = {
-        'flask': 'flask',
-        'pandas': 'pandas',
-        'scikit-learn': 'sklearn',
-        'joblib': 'joblib',
-        'numpy': 'numpy'
-    }
-    
     missing_packages = []
     
-    for package, import_name in required_packages.items():
-        try:
-            __import__(import_name)
+    # Locate each package without importing it, which would run its top-level code
+    for package, import_name in REQUIRED_PACKAGES.items():
+        if importlib.util.find_spec(import_name) is not None:
             print(f"   ✅ {package}")
-        except ImportError:
+        else:
             print(f"   ❌ {package}")
             missing_packages.append(package)
     
@@ -111,10 +122,13 @@ def train_model():
     print("   This may take several minutes...")
     
     try:
-        # Import and run training
+        # Import and run training; pandas and sklearn are only loaded when a model must be trained
+        from backend.model_trainer import MedicalModelTrainer
         success = MedicalModelTrainer()
         
         if success:
+            # Training wrote the model files, so they must be checked again
+            Config.invalidate_file_cache()
             print("   ✅ Model training completed successfully")
             return True
         else:
@@ -130,74 +144,122 @@ def start_backend():
     print("\n🔧 Starting backend server...")
     
     try:
-        # Change to backend directory and start server
-        backend_dir = Path(__file__).parent
-        os.chdir(backend_dir)
+        # Model and data paths are relative to the project directory
+        os.chdir(BASE_DIR)
         
         # Import and start Flask app
         from app import app
         
         print("   🚀 Backend server starting on http://localhost:5000")
         app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False)
+        return True
         
     except Exception as e:
         print(f"   ❌ Error starting backend: {str(e)}")
         return False
 
+def lockfile_hash(frontend_dir):
+    """Hash of the frontend's package-lock.json, or None if it has none"""
+    try:
+        return hashlib.blake2b((frontend_dir / 'package-lock.json').read_bytes(), digest_size=16).hexdigest()
+    except FileNotFoundError:
+        return None
+
 def start_frontend():
-    """Start the React frontend server"""
+    """Start the React frontend server, returning its process (None if it was not started)"""
     print("\n⚛️  Starting frontend server...")
     
-    frontend_dir = Path(__file__).parent / 'frontend'
-    
-    if not frontend_dir.exists():
+    if not os.path.exists(FRONTEND_DIR):
         print("   ❌ Frontend directory not found")
-        return False
+        return None
+    
+    if NPM is None:
+        print("   ❌ npm not found. Please install Node.js and npm")
+        return None
     
     try:
-        # Use npm.cmd for Windows
-        npm_executable = "npm.cmd"  # works in Command Prompt / Git Bash
-
-        # Check if node_modules exists, if not install dependencies
-        node_modules = frontend_dir / 'node_modules'
-        if not node_modules.exists():
+        # Install dependencies if node_modules is missing or was installed from another lockfile
+        node_modules = FRONTEND_DIR / 'node_modules'
+        install_hash_path = node_modules / '.install-hash'
+        lock_hash = lockfile_hash(FRONTEND_DIR)
+        if not os.path.exists(node_modules):
+            needs_install = True
+        elif os.path.exists(install_hash_path):
+            needs_install = install_hash_path.read_text().strip() != lock_hash
+        else:
+            # Installed before hashes were recorded; assume it matches the current lockfile
+            needs_install = False
+        
+        if needs_install:
             print("   📦 Installing frontend dependencies...")
-            subprocess.run([npm_executable, 'install'], cwd=frontend_dir, check=True)
+            subprocess.run([NPM, 'install'], cwd=FRONTEND_DIR, check=True)
+        if lock_hash is not None:
+            install_hash_path.write_text(lock_hash)
         
         print("   🚀 Frontend server starting on http://localhost:3000")
-        subprocess.Popen(
-            [npm_executable, 'start'], 
-            cwd=frontend_dir,
+        # Own session, so Ctrl+C on the runner is not delivered to the npm process group;
+        # stop_frontend shuts the group down instead
+        return subprocess.Popen(
+            [NPM, 'start'], 
+            cwd=FRONTEND_DIR,
             stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
         )
         
-        return True
-        
     except subprocess.CalledProcessError:
-        print("   ❌ npm not found. Please install Node.js and npm")
-        return False
+        print("   ❌ npm install failed")
+        return None
     except Exception as e:
         print(f"   ❌ Error starting frontend: {str(e)}")
-        return False
+        return None
 
 
-import socket
+def stop_frontend(process):
+    """Stop the frontend server started by start_frontend, along with the processes npm started"""
+    if process.poll() is not None:
+        return
+    if hasattr(os, 'killpg'):
+        # start_new_session made npm the leader of its own process group
+        os.killpg(process.pid, signal.SIGTERM)
+    else:
+        process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
 
-def wait_for_port(host, port, timeout=30):
-    import time
-    start = time.time()
-    while time.time() - start < timeout:
+async def wait_for_port(host, port, timeout=30):
+    """Wait until host:port accepts connections, probing often at first and backing off"""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    delay = 0.05
+    while loop.time() - start < timeout:
         try:
-            with socket.create_connection((host, port), timeout=1):
-                return True
-        except:
-            time.sleep(1)
+            # A closed local port refuses at once; the short timeout only bounds unanswered probes
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=0.1)
+            writer.close()
+            await writer.wait_closed()
+            return True
+        except (OSError, asyncio.TimeoutError):
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.5, 0.5)
     return False
 
+async def wait_for_services(timeout=30):
+    """Wait for the backend and frontend together; True for each one that came up"""
+    return await asyncio.gather(
+        wait_for_port('localhost', 5000, timeout=timeout),
+        wait_for_port('localhost', 3000, timeout=timeout)
+    )
+
 def open_browser():
-    if wait_for_port('localhost', 3000, timeout=30):
-        import webbrowser
+    backend_ready, frontend_ready = asyncio.run(wait_for_services(timeout=30))
+    if not backend_ready:
+        print("   ⚠️ Backend did not start in time. Check the API at http://localhost:5000/health")
+    if frontend_ready:
         webbrowser.open('http://localhost:3000')
         print("   🌐 Opening application in browser...")
     else:
@@ -236,18 +298,11 @@ def main():
     print("\n" + "=" * 60)
     print("🎉 Setup completed successfully!")
     
-    # Start backend server in a separate thread
-    backend_thread = threading.Thread(target=start_backend, daemon=True)
-    backend_thread.start()
-    
-    # Wait a moment for backend to start
-    time.sleep(3)
-    
-    # Start frontend if available
-    frontend_started = start_frontend()
+    # Start frontend if available; the browser waits for both servers to accept connections
+    frontend_process = start_frontend()
     
     # Open browser
-    if frontend_started:
+    if frontend_process is not None:
         browser_thread = threading.Thread(target=open_browser, daemon=True)
         browser_thread.start()
     
@@ -265,12 +320,16 @@ def main():
     print("=" * 60)
     
     try:
-        # Keep the main thread alive
-        while True:
-            time.sleep(1)
+        # Serve the backend on the main thread until it is interrupted
+        if not start_backend():
+            return False
     except KeyboardInterrupt:
-        print("\n👋 Shutting down Medical Symptom Checker...")
-        return True
+        pass
+    finally:
+        if frontend_process is not None:
+            stop_frontend(frontend_process)
+    print("\n👋 Shutting down Medical Symptom Checker...")
+    return True
 
 if __name__ == "__main__":
     try:
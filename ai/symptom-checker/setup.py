@@ -1,4 +1,4 @@
-from setuptools import setup, find_packages
+from setuptools import setup
 
 with open("README.md", "r", encoding="utf-8") as fh:
     long_description = fh.read()
@@ -12,7 +12,9 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/yourusername/medical-symptom-checker",
-    packages=find_packages(),
+    # No directory here is a package (none has an __init__.py), which is all find_packages() would
+    # discover after walking the whole tree, frontend included
+    packages=[],
     classifiers=[
         "Development Status :: 4 - Beta",
         "Intended Audience :: Education",
@@ -37,6 +39,9 @@ setup(
         "python-Levenshtein>=0.21.0",
         "requests>=2.31.0",
         "python-dotenv>=1.0.0",
+        "orjson>=3.9.0",
+        "rapidfuzz>=3.5.0",
+        "pyahocorasick>=2.0.0",
     ],
     extras_require={
         "dev": [
@@ -49,6 +54,10 @@ setup(
         "prod": [
             "gunicorn>=21.0.0",
             "waitress>=2.1.0",
+        ],
+        "onnx": [
+            "skl2onnx>=1.16.0",
+            "onnxruntime>=1.16.0",
         ]
     },
     entry_points={